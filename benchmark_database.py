@@ -0,0 +1,351 @@
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from utils.database import MessageDatabase
+
+SNOWFLAKE_BASE = 1100000000000000000
+MODELS = ["model-a", "model-b", "model-c"]
+WORDS = ("pancake waffle syrup butter stack griddle batter crepe brunch maple berry cream "
+         "server channel voice ping meme build deploy patch update question answer thanks").split()
+
+# Share of replayed calls per operation; override with --mix name=weight,...
+DEFAULT_MIX = {
+    'log': 40,
+    'context': 20,
+    'settings_read': 15,
+    'settings_write': 2,
+    'guild_settings': 8,
+    'history': 5,
+    'search': 3,
+    'stats': 5,
+    'rollups': 1,
+    'cleanup': 1,
+}
+
+
+class SyntheticWorkload:
+    """Deterministic synthetic guilds, channels, users and their traffic"""
+
+    def __init__(self, guilds: int, channels_per_guild: int, users: int, days: int, seed: int):
+        self.rng = random.Random(seed)
+        self.guilds = guilds
+        self.channels = guilds * channels_per_guild
+        self.users = users
+        self.days = days
+        self.next_message = 0
+        self.now = datetime.utcnow()
+
+    @staticmethod
+    def user_id(user: int) -> int:
+        return SNOWFLAKE_BASE // 2 + user
+
+    @staticmethod
+    def channel_id(channel: int) -> int:
+        return SNOWFLAKE_BASE // 3 + channel
+
+    @staticmethod
+    def guild_id(guild: int) -> int:
+        return SNOWFLAKE_BASE // 4 + guild
+
+    def pick_user(self) -> int:
+        # Activity is skewed: a few users send most of the messages
+        return min(int(self.rng.paretovariate(1.2)) - 1, self.users - 1)
+
+    def text(self, words: int) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(words))
+
+    def message(self, timestamp: datetime) -> tuple:
+        """A message and its chunked reply as queue rows: (message_row, [response_rows])"""
+        index = self.next_message
+        self.next_message += 1
+        user = self.pick_user()
+        channel = (user * 7 + self.rng.randrange(3)) % self.channels
+        guild = channel % self.guilds
+        is_dm = self.rng.random() < 0.05
+        message_id = SNOWFLAKE_BASE + index * 4
+        stamp = MessageDatabase._pack_time(timestamp)
+        message_row = (
+            self.user_id(user), f"user{user}", f"User {user}", self.channel_id(channel),
+            None if is_dm else f"channel-{channel}", None if is_dm else self.guild_id(guild),
+            None if is_dm else f"guild-{guild}", message_id, self.text(self.rng.randrange(3, 40)),
+            'user', False, None, stamp
+        )
+        if self.rng.random() < 0.3:
+            return message_row, []
+
+        chunks = 1 if self.rng.random() < 0.8 else self.rng.randrange(2, 4)
+        processing_ms = self.rng.randrange(300, 8000)
+        model = self.rng.choice(MODELS)
+        response_rows = [
+            (message_id, message_id + chunk, self.text(self.rng.randrange(20, 300)), chunks, chunk,
+             processing_ms, model, self.rng.randrange(50, 1500), stamp + 1000 * chunk)
+            for chunk in range(1, chunks + 1)
+        ]
+        return message_row, response_rows
+
+    def history(self, count: int, batch_size: int):
+        """Yield (message_rows, response_rows) batches of count messages spread over the last days"""
+        span_ms = self.days * 86400000
+        for start in range(0, count, batch_size):
+            message_rows, response_rows = [], []
+            for index in range(start, min(start + batch_size, count)):
+                # Oldest first, so partitions fill in order
+                offset_ms = span_ms - span_ms * index // count
+                message_row, responses = self.message(self.now - timedelta(milliseconds=offset_ms))
+                message_rows.append(message_row)
+                response_rows.extend(responses)
+            yield message_rows, response_rows
+
+
+class Replay:
+    """Issues a weighted mix of MessageDatabase calls and records each call's latency"""
+
+    def __init__(self, db: MessageDatabase, workload: SyntheticWorkload, mix: dict):
+        self.db = db
+        self.workload = workload
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.latencies = {name: [] for name in self.operations}
+        self.errors = {name: 0 for name in self.operations}
+        self.cursors = {}
+
+    async def call(self, name: str):
+        db, workload, rng = self.db, self.workload, self.workload.rng
+        user = str(workload.user_id(workload.pick_user()))
+        guild = str(workload.guild_id(rng.randrange(workload.guilds)))
+
+        if name == 'log':
+            message_row, response_rows = workload.message(datetime.utcnow())
+            (user_id, username, display_name, channel_id, channel_name, guild_id, guild_name,
+             message_id, content) = message_row[:9]
+            await db.log_user_message(
+                str(user_id), username, display_name, str(channel_id), channel_name,
+                str(guild_id) if guild_id else None, guild_name, str(message_id), content
+            )
+            for row in response_rows:
+                await db.log_bot_response(str(row[0]), str(row[1]), *row[2:8])
+        elif name == 'context':
+            await db.get_conversation_context(user, 20)
+        elif name == 'settings_read':
+            await db.get_user_settings(user)
+        elif name == 'settings_write':
+            await db.update_user_settings(user, content_filter_level=rng.choice(['strict', 'moderate', 'off']))
+        elif name == 'guild_settings':
+            await db.get_guild_settings(guild)
+        elif name == 'history':
+            page = await db.get_user_message_page(user, 10, self.cursors.pop(user, None))
+            if page.get('next_cursor'):
+                self.cursors[user] = page['next_cursor']
+        elif name == 'search':
+            await db.search_messages(" ".join(rng.sample(WORDS, 2)), limit=10)
+        elif name == 'stats':
+            await db.get_conversation_stats(user if rng.random() < 0.5 else None)
+        elif name == 'rollups':
+            await db.get_top_rollups(rng.choice(['user', 'guild', 'model']))
+        elif name == 'cleanup':
+            await db.cleanup_old_messages(days_to_keep=max(workload.days - 1, 1))
+        else:
+            raise ValueError(f"Unknown operation: {name}")
+
+    async def timed(self, name: str, scheduled: float):
+        try:
+            await self.call(name)
+        except Exception as e:
+            self.errors[name] += 1
+            print(f"❌ {name} raised: {e}")
+        # Measured from when the call was due, so time spent waiting for a free worker counts
+        self.latencies[name].append((time.perf_counter() - scheduled) * 1000)
+
+    async def run(self, duration: float, rate: float, concurrency: int):
+        """Replay for duration seconds; rate calls per second (0 runs as fast as the workers allow)"""
+        slots = asyncio.Semaphore(concurrency)
+        pending = set()
+        rng = self.workload.rng
+        started = time.perf_counter()
+        issued = 0
+
+        async def worker(name: str, scheduled: float):
+            async with slots:
+                await self.timed(name, scheduled)
+
+        while True:
+            now = time.perf_counter()
+            if now - started >= duration:
+                break
+            if rate:
+                scheduled = started + issued / rate
+                if scheduled > now:
+                    await asyncio.sleep(scheduled - now)
+            else:
+                await slots.acquire()
+                slots.release()
+                scheduled = time.perf_counter()
+            name = rng.choices(self.operations, self.weights)[0]
+            task = asyncio.create_task(worker(name, scheduled))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            issued += 1
+            if not rate:
+                await asyncio.sleep(0)
+
+        if pending:
+            await asyncio.gather(*pending)
+        return time.perf_counter() - started
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(replay: Replay, elapsed: float) -> dict:
+    operations = {}
+    for name in replay.operations:
+        timings = sorted(replay.latencies[name])
+        if not timings:
+            continue
+        operations[name] = {
+            'calls': len(timings),
+            'errors': replay.errors[name],
+            'throughput_per_s': round(len(timings) / elapsed, 2),
+            'p50_ms': round(percentile(timings, 0.50), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'max_ms': round(timings[-1], 3),
+        }
+    calls = sum(stats['calls'] for stats in operations.values())
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'calls': calls,
+        'throughput_per_s': round(calls / elapsed, 2) if elapsed else 0,
+        'operations': operations,
+    }
+
+
+def parse_mix(value: str) -> dict:
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, value.split(',')):
+        name, _, weight = part.partition('=')
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown operation '{name}', expected one of {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+async def seed(db: MessageDatabase, workload: SyntheticWorkload, messages: int, batch_size: int) -> float:
+    """Fill the database with synthetic history and settings through the writer's own batch path"""
+    started = time.perf_counter()
+    written = 0
+    for message_rows, response_rows in workload.history(messages, batch_size):
+        await db._write_rows(message_rows, response_rows)
+        written += len(message_rows)
+        if written % (batch_size * 20) == 0:
+            print(f"   {written}/{messages} messages...")
+
+    for guild in range(workload.guilds):
+        await db.update_guild_settings(str(workload.guild_id(guild)), f"guild-{guild}",
+                                       random_messages_enabled=guild % 3 == 0)
+    for user in range(0, workload.users, 10):
+        await db.update_user_settings(str(workload.user_id(user)), username=f"user{user}",
+                                      content_filter_level='moderate')
+    db._conversation_cache.clear()
+    return time.perf_counter() - started
+
+
+def database_size(db: MessageDatabase) -> int:
+    paths = [db.db_path] + [db._partition_path(key) for key in db._partitions]
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+async def run_benchmark(args):
+    workdir = None
+    if args.postgres:
+        from utils.postgres_database import PostgresMessageDatabase
+        db = PostgresMessageDatabase(args.postgres)
+    else:
+        path = args.db
+        if not path:
+            workdir = tempfile.mkdtemp(prefix="gork-db-bench-")
+            path = os.path.join(workdir, "bench.db")
+        db = MessageDatabase(path, partition_months=args.partition_months)
+
+    workload = SyntheticWorkload(args.guilds, args.channels_per_guild, args.users, args.days, args.seed)
+    mix = args.mix or dict(DEFAULT_MIX)
+    report = {
+        'backend': 'postgresql' if args.postgres else 'sqlite',
+        'started_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'config': {key: value for key, value in vars(args).items() if key not in ('postgres', 'json', 'mix')},
+        'mix': mix,
+    }
+
+    try:
+        await db.initialize()
+        if args.messages:
+            print(f"🔧 Seeding {args.messages} messages from {args.users} users in {args.guilds} guilds...")
+            seed_s = await seed(db, workload, args.messages, args.batch_size)
+            report['seed'] = {'messages': args.messages, 'seconds': round(seed_s, 2),
+                              'messages_per_s': round(args.messages / seed_s, 1)}
+            print(f"✅ Seeded in {seed_s:.1f}s")
+
+        target = f"{args.rate:g} calls/s" if args.rate else "as fast as possible"
+        print(f"⏱️ Replaying for {args.duration:g}s at {target} with up to {args.concurrency} calls in flight...")
+        replay = Replay(db, workload, mix)
+        elapsed = await replay.run(args.duration, args.rate, args.concurrency)
+        await db.flush()
+
+        report['results'] = summarize(replay, elapsed)
+        report['write_queue'] = db.get_write_queue_stats()
+        report['conversation_cache'] = db.get_conversation_cache_stats()
+        report['snapshots'] = db.get_snapshot_stats()
+        if not args.postgres:
+            report['database_size_bytes'] = database_size(db)
+    finally:
+        await db.close()
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results = report['results']
+    print(f"\n📊 {results['calls']} calls in {results['elapsed_s']}s ({results['throughput_per_s']}/s):")
+    for name, stats in results['operations'].items():
+        print(f"   • {name}: {stats['calls']} calls, p50 {stats['p50_ms']:.2f} ms, "
+              f"p95 {stats['p95_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms"
+              + (f", {stats['errors']} errors" if stats['errors'] else ""))
+
+    if args.json == '-':
+        print(json.dumps(report, indent=2, default=str))
+    elif args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"📝 Wrote results to {args.json}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a synthetic workload against the message database and report per-call latency")
+    parser.add_argument("--messages", type=int, default=100000, help="synthetic messages to seed before replaying (0 to skip)")
+    parser.add_argument("--guilds", type=int, default=20)
+    parser.add_argument("--channels-per-guild", type=int, default=5)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=90, help="days the seeded messages are spread over")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to replay")
+    parser.add_argument("--rate", type=float, default=200, help="target calls per second (0 for as fast as possible)")
+    parser.add_argument("--concurrency", type=int, default=200, help="most calls in flight at once")
+    parser.add_argument("--mix", type=parse_mix, help="operation weights, e.g. log=60,search=0 "
+                                                      f"(operations: {', '.join(DEFAULT_MIX)})")
+    parser.add_argument("--batch-size", type=int, default=MessageDatabase.IMPORT_BATCH_ROWS, help="messages per seeding transaction")
+    parser.add_argument("--partition-months", type=int, default=0, help="partition the SQLite database by this many months")
+    parser.add_argument("--db", help="SQLite file to use instead of a temporary one")
+    parser.add_argument("--postgres", metavar="DSN", help="benchmark this PostgreSQL database instead; use a scratch database")
+    parser.add_argument("--json", metavar="PATH", help="write the results as JSON to PATH ('-' for stdout)")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run_benchmark(parser.parse_args()))
@@ -0,0 +1,204 @@
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from utils.database import MessageDatabase
+
+SNOWFLAKE_BASE = 1100000000000000000
+
+LEGACY_INSERT_MESSAGE = """
+    INSERT INTO messages
+    (user_id, username, user_display_name, channel_id, channel_name, guild_id, guild_name,
+     message_id, message_content, message_type, has_attachments, attachment_info, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'user', 0, NULL, ?)
+"""
+
+LEGACY_INSERT_RESPONSE = """
+    INSERT INTO responses
+    (original_message_id, response_message_id, response_content, response_chunks,
+     chunk_number, processing_time_ms, model_used, tokens_used, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# (name, SQL against the old layout, SQL against the compact layout); parameters
+# are (user_id, channel_id, day_start, day_end) in each layout's own types
+QUERIES = [
+    ("user history page", """
+        SELECT m.*,
+               (SELECT GROUP_CONCAT(r.response_content, ' ') FROM responses r
+                WHERE r.original_message_id = m.message_id) as bot_responses
+        FROM messages m WHERE m.user_id = :user
+        ORDER BY m.timestamp DESC, m.id DESC LIMIT 11
+    """, """
+        SELECT m.*,
+               (SELECT GROUP_CONCAT(r.response_content, ' ') FROM responses r
+                WHERE r.message_rowid = m.id) as bot_responses
+        FROM messages m WHERE m.user_id = :user
+        ORDER BY m.timestamp DESC, m.id DESC LIMIT 11
+    """),
+    ("conversation context", """
+        SELECT m.message_content, r.response_content
+        FROM (SELECT * FROM messages WHERE user_id = :user AND message_type = 'user'
+              ORDER BY timestamp DESC LIMIT 20) m
+        LEFT JOIN responses r ON r.original_message_id = m.message_id
+    """, """
+        SELECT m.message_content, r.response_content
+        FROM (SELECT * FROM messages WHERE user_id = :user AND message_type = 'user'
+              ORDER BY timestamp DESC LIMIT 20) m
+        LEFT JOIN responses r ON r.message_rowid = m.id
+    """),
+    ("channel messages", """
+        SELECT message_content FROM messages
+        WHERE channel_id = :channel AND message_type = 'user'
+        ORDER BY timestamp DESC LIMIT 50
+    """, """
+        SELECT message_content FROM messages
+        WHERE channel_id = :channel AND message_type = 'user'
+        ORDER BY timestamp DESC LIMIT 50
+    """),
+    ("one day's messages", """
+        SELECT COUNT(*) FROM messages WHERE timestamp >= :start AND timestamp < :end
+    """, """
+        SELECT COUNT(*) FROM messages WHERE timestamp >= :start AND timestamp < :end
+    """),
+    ("user's responses", """
+        SELECT COUNT(*) FROM messages m JOIN responses r ON r.original_message_id = m.message_id
+        WHERE m.user_id = :user
+    """, """
+        SELECT COUNT(*) FROM messages m JOIN responses r ON r.message_rowid = m.id
+        WHERE m.user_id = :user
+    """),
+]
+
+
+async def build_legacy_database(path: str, messages: int, users: int, channels: int, days: int, seed: int):
+    """Create a database in the layout before migration 6 and fill it with synthetic traffic"""
+    rng = random.Random(seed)
+    db = MessageDatabase(path)
+    conn = await db._open_connection()
+    await db._migrate(conn, target_version=5)
+
+    now = datetime.now(timezone.utc)
+    message_rows, response_rows = [], []
+    for i in range(messages):
+        user = rng.randrange(users)
+        channel = rng.randrange(channels)
+        timestamp = now - timedelta(seconds=rng.randrange(days * 86400))
+        message_id = str(SNOWFLAKE_BASE + i * 3)
+        message_rows.append((
+            str(SNOWFLAKE_BASE // 2 + user), f"user{user}", None,
+            str(SNOWFLAKE_BASE // 3 + channel), f"channel-{channel}",
+            str(SNOWFLAKE_BASE // 4 + channel % 5), f"guild-{channel % 5}",
+            message_id, f"message {i} about topic {rng.randrange(1000)}", timestamp
+        ))
+        chunks = 2 if rng.random() < 0.2 else 1
+        for chunk in range(1, chunks + 1):
+            response_rows.append((
+                message_id, str(SNOWFLAKE_BASE + i * 3 + chunk), f"reply {i} part {chunk}",
+                chunks, chunk, rng.randrange(100, 5000), "model-a", rng.randrange(50, 800),
+                timestamp + timedelta(seconds=2)
+            ))
+
+    await conn.executemany(LEGACY_INSERT_MESSAGE, message_rows)
+    await conn.executemany(LEGACY_INSERT_RESPONSE, response_rows)
+    await conn.commit()
+    await conn.close()
+
+
+def database_size(path: str) -> int:
+    """Size of the database once its free pages are reclaimed"""
+    conn = sqlite3.connect(path)
+    conn.execute("VACUUM")
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    conn.close()
+    return page_size * page_count
+
+
+def time_queries(path: str, params: list, compact: bool) -> dict:
+    """Median milliseconds per query over the same sequence of parameters"""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA cache_size = -16000")
+    results = {}
+    for name, legacy_sql, compact_sql in QUERIES:
+        sql = compact_sql if compact else legacy_sql
+        timings = []
+        for values in params:
+            started = time.perf_counter()
+            conn.execute(sql, values[compact]).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = statistics.median(timings)
+    conn.close()
+    return results
+
+
+def query_params(count: int, users: int, channels: int, days: int, seed: int) -> list:
+    """(legacy, compact) parameter pairs for the benchmark queries"""
+    rng = random.Random(seed + 1)
+    now = datetime.now(timezone.utc)
+    params = []
+    for _ in range(count):
+        user = SNOWFLAKE_BASE // 2 + rng.randrange(users)
+        channel = SNOWFLAKE_BASE // 3 + rng.randrange(channels)
+        start = (now - timedelta(days=rng.randrange(1, days))).replace(tzinfo=None)
+        end = start + timedelta(days=1)
+        legacy = {'user': str(user), 'channel': str(channel),
+                  'start': str(start.replace(tzinfo=timezone.utc)), 'end': str(end.replace(tzinfo=timezone.utc))}
+        compact = {'user': user, 'channel': channel,
+                   'start': MessageDatabase._pack_time(start), 'end': MessageDatabase._pack_time(end)}
+        params.append((legacy, compact))
+    return params
+
+
+async def run_benchmark(args):
+    workdir = tempfile.mkdtemp(prefix="gork-schema-bench-")
+    legacy_path = os.path.join(workdir, "legacy.db")
+    compact_path = os.path.join(workdir, "compact.db")
+
+    try:
+        print(f"🔧 Generating {args.messages} messages from {args.users} users in {args.channels} channels...")
+        await build_legacy_database(legacy_path, args.messages, args.users, args.channels, args.days, args.seed)
+        shutil.copy(legacy_path, compact_path)
+
+        print("🔄 Migrating a copy to the compact layout...")
+        started = time.perf_counter()
+        db = MessageDatabase(compact_path)
+        await db.initialize()
+        await db.close()
+        migration_s = time.perf_counter() - started
+
+        legacy_size = database_size(legacy_path)
+        compact_size = database_size(compact_path)
+
+        params = query_params(args.queries, args.users, args.channels, args.days, args.seed)
+        legacy_times = time_queries(legacy_path, params, compact=False)
+        compact_times = time_queries(compact_path, params, compact=True)
+
+        print(f"\n⏱️ Migration took {migration_s:.1f}s")
+        print(f"\n📁 Database size: {legacy_size / 1048576:.1f} MB -> {compact_size / 1048576:.1f} MB "
+              f"({(1 - compact_size / legacy_size) * 100:.0f}% smaller)")
+        print(f"\n📊 Median query time over {args.queries} runs (old -> compact):")
+        for name, _, _ in QUERIES:
+            old, new = legacy_times[name], compact_times[name]
+            print(f"   • {name}: {old:.3f} ms -> {new:.3f} ms ({old / new:.1f}x)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the old and compact message database layouts")
+    parser.add_argument("--messages", type=int, default=100000, help="synthetic messages to generate")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--channels", type=int, default=50)
+    parser.add_argument("--days", type=int, default=90, help="days the messages are spread over")
+    parser.add_argument("--queries", type=int, default=200, help="runs of each query")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run_benchmark(parser.parse_args()))
@@ -0,0 +1,270 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+from cogs.gork import Gork
+from utils.http_client import HttpClient
+
+SYSTEM_PROMPT = (
+    "You are Gork, a helpful AI assistant on Discord. Keep answers friendly and concise. "
+    "You can use tools by writing a line with the tool name and its argument:\n"
+    "GET_WEATHER: <location> - current weather for a place\n"
+    "WEB_SEARCH: <query> - search the web for recent information\n"
+    "VISIT_WEBSITE: <url> - read the text of a web page\n"
+    "EXECUTE_COMMAND: <command> - run a safe shell command such as date or uptime\n"
+    "Only call a tool when the answer depends on information you do not have. "
+    "When you call a tool, write nothing else on that line."
+)
+
+# User message, the reply that calls the tools (mock server only) and the canned tool outputs
+SCENARIOS = {
+    'weather': (
+        "What's the weather in London right now?",
+        "Let me check that for you.\nGET_WEATHER: London",
+        {'GET_WEATHER': "London, United Kingdom: 14°C, light rain, wind 18 km/h SW, humidity 82%. "
+                        "Feels like 12°C. Today's high 16°C, low 9°C, 80% chance of rain this evening."},
+    ),
+    'search': (
+        "Who won the most recent Tour de France?",
+        "WEB_SEARCH: most recent Tour de France winner",
+        {'WEB_SEARCH': "\n".join(
+            f"{i}. Tour de France results roundup part {i}: stage winners, general classification, "
+            f"jerseys, time gaps and team standings from the final week of the race."
+            for i in range(1, 9)
+        )},
+    ),
+    'website': (
+        "Can you summarize https://example.com/article for me?",
+        "VISIT_WEBSITE: https://example.com/article",
+        {'VISIT_WEBSITE': "Article text: " + " ".join(
+            "The city council approved a new plan for cycling lanes, parks and public transport."
+            for _ in range(30)
+        )},
+    ),
+    'two_tools': (
+        "What's the weather in Paris, and is the Louvre open today?",
+        "GET_WEATHER: Paris\nWEB_SEARCH: Louvre opening hours today",
+        {'GET_WEATHER': "Paris, France: 19°C, partly cloudy, wind 9 km/h NW.",
+         'WEB_SEARCH': "Louvre Museum: open 9:00-18:00 today, late opening until 21:45 on Fridays, closed Tuesdays."},
+    ),
+    'no_tool': (
+        "hi gork, how's it going?",
+        "Hey! Doing great, thanks for asking. What can I help you with today?",
+        {},
+    ),
+}
+
+# Mock completions: time to first token plus time per prompt and completion token
+MOCK_FIRST_TOKEN_MS = 350
+MOCK_PROMPT_TOKEN_MS = 0.05
+MOCK_COMPLETION_TOKEN_MS = 12
+MOCK_SUMMARY = "The tool results show " + "the details the user asked about, " * 12
+MOCK_ANSWER = "Here's what I found: " + "a clear answer built from the tool results, " * 20
+TOOL_DELAY_S = 0.2
+
+
+def estimate_tokens(text) -> int:
+    return max(1, len(text) // 4)
+
+
+async def start_mock_server(cog: Gork):
+    async def mock_completions(request):
+        """OpenRouter stand-in that answers each scenario and bills by estimated tokens.
+
+        When tools are offered, the scenario's tool calls come back as structured
+        tool_calls; otherwise as the text markers the system prompt teaches.
+        """
+        payload = await request.json()
+        messages = payload["messages"]
+        system, last = messages[0]["content"], messages[-1]
+        message = {"role": "assistant", "content": MOCK_ANSWER}
+
+        if system.startswith("You are an AI assistant processing tool outputs"):
+            message["content"] = MOCK_SUMMARY
+        elif last["role"] == "user" and not system.startswith("You are an AI assistant combining") \
+                and not last["content"].startswith("Tool outputs:"):
+            message["content"] = next((reply for prompt, reply, _ in SCENARIOS.values() if prompt == last["content"]), MOCK_ANSWER)
+            calls, remaining = cog.parse_tool_markers(message["content"])
+            if payload.get("tools") and calls:
+                message["content"] = remaining
+                message["tool_calls"] = [
+                    {"id": f"call_{i}", "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+                    for i, (name, arguments) in enumerate(calls)
+                ]
+
+        prompt_tokens = estimate_tokens(json.dumps(messages) + json.dumps(payload.get("tools", [])))
+        completion_tokens = estimate_tokens(json.dumps(message.get("tool_calls")) if "tool_calls" in message else message["content"])
+        await asyncio.sleep((MOCK_FIRST_TOKEN_MS + prompt_tokens * MOCK_PROMPT_TOKEN_MS
+                             + completion_tokens * MOCK_COMPLETION_TOKEN_MS) / 1000)
+        return web.json_response({
+            "choices": [{"message": message}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens},
+        })
+
+    app = web.Application()
+    app.router.add_post("/chat/completions", mock_completions)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/chat/completions"
+
+
+def make_cog(model: str, max_tool_rounds: int) -> Gork:
+    """A Gork cog with just the state call_ai and the tool rounds need, offering the benchmarked tools"""
+    cog = Gork.__new__(Gork)
+    benchmarked = ('get_weather', 'web_search', 'visit_website', 'execute_command')
+    cog.available_tools = lambda: [
+        {"type": "function", "function": {"name": name, "description": Gork.TOOLS[name]['description'],
+                                          "parameters": Gork.TOOLS[name]['parameters']}}
+        for name in benchmarked
+    ]
+    cog.http = HttpClient()
+    cog.model = model
+    cog.max_tool_rounds = max_tool_rounds
+    cog.ai_usage = {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+    return cog
+
+
+def use_canned_tools(cog: Gork, tool_outputs: dict):
+    """Replace the cog's tools with ones that return the scenario's outputs after TOOL_DELAY_S"""
+    def canned(tool_name):
+        async def tool(arg_text):
+            await asyncio.sleep(TOOL_DELAY_S)
+            return tool_outputs.get(tool_name, f"No results for '{arg_text}'")
+        return tool
+
+    cog.get_weather = canned('GET_WEATHER')
+    cog.web_search = canned('WEB_SEARCH')
+    cog.visit_website = canned('VISIT_WEBSITE')
+    cog.execute_safe_command = canned('EXECUTE_COMMAND')
+
+
+async def three_call_flow(cog: Gork, messages: list, user_content: str) -> str:
+    """The previous flow: answer, summarize the tool outputs, then combine the two"""
+    ai_response = await cog.call_ai(messages)
+    tool_outputs, initial_response, _ = await cog.extract_and_execute_tools(ai_response, None, "channel")
+    if not tool_outputs:
+        return initial_response
+
+    tool_outputs_text = "\n".join([f"{tool}: {output}" for tool, output in tool_outputs.items()])
+    second_messages = [
+        {"role": "system", "content": "You are an AI assistant processing tool outputs. Analyze and summarize the tool results in the context of the user's original request."},
+        {"role": "user", "content": f"Original user message: {user_content}\n\nTool outputs:\n{tool_outputs_text}\n\nPlease summarize what these tool results mean in the context of the user's request."}
+    ]
+    processed_tool_summary = await cog.call_ai(second_messages, max_tokens=1000)
+
+    third_messages = [
+        {"role": "system", "content": "You are an AI assistant combining initial analysis with tool results. Create a coherent final response."},
+        {"role": "user", "content": f"Initial AI response: {initial_response}\n\nProcessed tool summary: {processed_tool_summary}\n\nCombine these into a final, coherent response to the user."}
+    ]
+    return await cog.call_ai(third_messages, max_tokens=1500)
+
+
+async def tool_rounds_flow(cog: Gork, messages: list, user_content: str) -> str:
+    """The current flow: structured tool calls run concurrently and their outputs go back into the conversation"""
+    ai_message = await cog.call_ai_with_tools(messages, tools=cog.available_tools())
+    final_response, _ = await cog.run_tool_rounds(messages, ai_message, None, "channel")
+    return final_response
+
+
+FLOWS = {'three_call': three_call_flow, 'tool_rounds': tool_rounds_flow}
+
+
+def conversation(user_content: str, history: int) -> list:
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    for i in range(history):
+        messages.append({"role": "user", "content": f"Earlier question {i} about the server's pancake night plans?"})
+        messages.append({"role": "assistant", "content": f"Earlier answer {i}: pancake night is on Friday at 8pm in the voice channel."})
+    messages.append({"role": "user", "content": user_content})
+    return messages
+
+
+async def run_benchmark(args):
+    runner = None
+    cog = make_cog(args.model, args.max_tool_rounds)
+    if args.live:
+        load_dotenv("ai.env")
+        api_key = os.getenv("OPENROUTER_API_KEY")
+        if not api_key:
+            print("❌ --live needs OPENROUTER_API_KEY in the environment or ai.env")
+            return
+        cog.openrouter_url = "https://openrouter.ai/api/v1/chat/completions"
+        cog.openrouter_api_key = api_key
+        print(f"🌐 Calling OpenRouter with {args.model}")
+    else:
+        runner, cog.openrouter_url = await start_mock_server(cog)
+        cog.openrouter_api_key = "mock"
+        print(f"🧪 Using a mock completion server at {cog.openrouter_url}")
+
+    scenarios = args.scenarios or list(SCENARIOS)
+    report = {'mode': 'live' if args.live else 'mock', 'model': args.model, 'runs': args.runs, 'scenarios': {}}
+
+    try:
+        for name in scenarios:
+            user_content, _, tool_outputs = SCENARIOS[name]
+            use_canned_tools(cog, tool_outputs)
+            messages = conversation(user_content, args.history)
+            report['scenarios'][name] = {}
+
+            for flow_name, flow in FLOWS.items():
+                latencies = []
+                cog.ai_usage = {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+                for _ in range(args.runs):
+                    started = time.perf_counter()
+                    await flow(cog, list(messages), user_content)
+                    latencies.append((time.perf_counter() - started) * 1000)
+
+                report['scenarios'][name][flow_name] = {
+                    'median_ms': statistics.median(latencies),
+                    'max_ms': max(latencies),
+                    'calls': cog.ai_usage['calls'] / args.runs,
+                    'prompt_tokens': cog.ai_usage['prompt_tokens'] / args.runs,
+                    'completion_tokens': cog.ai_usage['completion_tokens'] / args.runs,
+                }
+    finally:
+        await cog.http.close()
+        if runner:
+            await runner.cleanup()
+
+    print(f"\n{'scenario':<10} {'flow':<12} {'median ms':>10} {'calls':>6} {'prompt tok':>11} {'completion tok':>15}")
+    for name, flows in report['scenarios'].items():
+        for flow_name, stats in flows.items():
+            print(f"{name:<10} {flow_name:<12} {stats['median_ms']:>10.0f} {stats['calls']:>6.1f} "
+                  f"{stats['prompt_tokens']:>11.0f} {stats['completion_tokens']:>15.0f}")
+
+    def total(flow_name, key):
+        return sum(flows[flow_name][key] for flows in report['scenarios'].values())
+
+    print()
+    for key, label in (('median_ms', 'latency'), ('prompt_tokens', 'prompt tokens'), ('completion_tokens', 'completion tokens')):
+        before, after = total('three_call', key), total('tool_rounds', key)
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"📊 Total {label}: {before:.0f} -> {after:.0f} ({change:+.1f}%)")
+
+    if args.json == '-':
+        print(json.dumps(report, indent=2))
+    elif args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Wrote results to {args.json}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare end-to-end latency and token use of the three-call tool flow "
+                                                 "against feeding tool outputs back as one follow-up turn")
+    parser.add_argument("--live", action="store_true", help="call OpenRouter instead of the mock server (uses OPENROUTER_API_KEY)")
+    parser.add_argument("--model", default="google/gemini-2.5-flash")
+    parser.add_argument("--runs", type=int, default=5, help="requests per scenario and flow")
+    parser.add_argument("--history", type=int, default=5, help="earlier exchanges in each conversation")
+    parser.add_argument("--max-tool-rounds", type=int, default=2)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), help="scenarios to run (default: all)")
+    parser.add_argument("--json", metavar="PATH", help="write the results as JSON to PATH ('-' for stdout)")
+    asyncio.run(run_benchmark(parser.parse_args()))
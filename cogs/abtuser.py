@@ -6,14 +6,14 @@ from typing import Optional
 from datetime import datetime, timezone
 
 
-from utils.database import MessageDatabase
+from utils.database import get_message_database
 from lists import config
 
 
 class UserInfoCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.db = MessageDatabase("data/bot_messages.db") 
+        self.db = get_message_database(bot)
         self.developer_badges = {
             config.Owners.ILIKEPANCAKES: f"{config.CustomEmoji.STAFF_BLUE}OpenGuard Developer",
             config.Owners.SLIPSTREAM: f"{config.CustomEmoji.STAFF_PINK}OpenGuard Developer",
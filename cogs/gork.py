@@ -50,15 +50,118 @@ import time
 import random
 from datetime import datetime
 from utils.content_filter import ContentFilter
-from utils.database import MessageDatabase 
+from utils.database import MessageDatabase, get_message_database
+from utils.http_client import get_http_client
+from utils.response_cache import get_response_cache
+from utils.streaming_reply import StreamingReply
 
 class Gork(commands.Cog):
+    # Tools offered to the model as functions, with the text marker the system
+    # prompt teaches for models that write tool calls instead of making them
+    TOOLS = {
+        'execute_command': {
+            'marker': 'EXECUTE_COMMAND',
+            'description': "Run one of the bot's safe system commands (such as fastfetch or uptime) and return its output",
+            'parameters': {
+                'type': 'object',
+                'properties': {'command': {'type': 'string', 'description': 'Name of the safe command to run'}},
+                'required': ['command'],
+            },
+            'timeout': 30,
+        },
+        'get_weather': {
+            'marker': 'GET_WEATHER',
+            'description': "Get the current weather for a location",
+            'parameters': {
+                'type': 'object',
+                'properties': {'location': {'type': 'string', 'description': 'City or place name'}},
+                'required': ['location'],
+            },
+            'timeout': 15,
+        },
+        'web_search': {
+            'marker': 'WEB_SEARCH',
+            'description': "Search the web for current or real-time information",
+            'parameters': {
+                'type': 'object',
+                'properties': {'query': {'type': 'string', 'description': 'Search query'}},
+                'required': ['query'],
+            },
+            'timeout': 20,
+        },
+        'visit_website': {
+            'marker': 'VISIT_WEBSITE',
+            'description': "Read the text content of a web page",
+            'parameters': {
+                'type': 'object',
+                'properties': {'url': {'type': 'string', 'description': 'Full URL of the page'}},
+                'required': ['url'],
+            },
+            'timeout': 35,
+        },
+        'steam_search': {
+            'marker': 'STEAM_SEARCH',
+            'description': "Look up a game on Steam and show its store card (price, reviews, description) in the chat",
+            'parameters': {
+                'type': 'object',
+                'properties': {'game_name': {'type': 'string', 'description': 'Title of the game'}},
+                'required': ['game_name'],
+            },
+            'timeout': 20,
+        },
+        'spotify_search': {
+            'marker': 'SPOTIFY_SEARCH',
+            'description': "Search Spotify for a song and show it in the chat",
+            'parameters': {
+                'type': 'object',
+                'properties': {'query': {'type': 'string', 'description': 'Song title, optionally with the artist'}},
+                'required': ['query'],
+            },
+            'timeout': 15,
+        },
+        'steam_user': {
+            'marker': 'STEAM_USER',
+            'description': "Look up a Discord user's linked Steam account, profile or owned games, or resolve a Steam vanity URL",
+            'parameters': {
+                'type': 'object',
+                'properties': {
+                    'function': {
+                        'type': 'string',
+                        'enum': ['get_steam_id', 'get_steam_profile_summary', 'get_user_owned_games', 'resolve_steam_vanity_url'],
+                    },
+                    'discord_user_id': {'type': 'string', 'description': 'Discord user ID, for every function except resolve_steam_vanity_url'},
+                    'vanity_url': {'type': 'string', 'description': 'Steam custom URL name, for resolve_steam_vanity_url'},
+                },
+                'required': ['function'],
+            },
+            'timeout': 20,
+        },
+    }
+    TOOL_MARKERS = {tool['marker']: name for name, tool in TOOLS.items()}
+
+    # Tools whose output can be reused in a cached reply, and the TTL category they give it
+    CACHE_TOOL_CATEGORIES = {'get_weather': 'weather', 'web_search': 'search', 'visit_website': 'link'}
+
+    # Prompts about the asker, which must not be answered from another user's reply
+    PERSONAL_PATTERN = re.compile(r"\b(i|i'm|im|i've|my|mine|myself|remember|you said)\b|<@[!&]?\d+>", re.IGNORECASE)
+
+    # One scan finds every text marker; group 1 is the marker, group 2 the argument
+    TOOL_MARKER_PATTERN = re.compile(
+        r'\*?\*?((?:EXECUTE_COMMAND|GET_WEATHER|WEB_SEARCH|VISIT_WEBSITE|SPOTIFY_SEARCH|STEAM_USER):|STEAM_SEARCH:?)\*?\*?(.+?)(?:\n|$)',
+        re.MULTILINE | re.IGNORECASE
+    )
+
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         load_dotenv("ai.env")
         self.openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
         self.openrouter_url = "https://openrouter.ai/api/v1/chat/completions"
+        self.http = get_http_client(bot)
         self.model = "google/gemini-2.5-flash"
+        self.stream_responses = os.getenv("STREAM_RESPONSES", "1").lower() in ("1", "true", "yes", "on")
+        self.max_tool_rounds = int(os.getenv("MAX_TOOL_ROUNDS", "2"))
+        self.ai_usage = {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+        self.response_cache = get_response_cache(bot)
 
         self.processing_messages = set()
 
@@ -144,133 +247,250 @@ class Gork(commands.Cog):
             self.whisper_model = None
 
 
-    async def extract_and_execute_tools(self, ai_response: str, channel_or_interaction, context: str) -> tuple[dict, str, bool]:
-        """Extract and execute tool calls from AI response using robust regex patterns"""
-        import re
-
-        self.tool_patterns = {
-            'EXECUTE_COMMAND': re.compile(r'\*?\*?EXECUTE_COMMAND:\*?\*?(.+?)(?:\n|$)', re.MULTILINE | re.IGNORECASE),
-            'GET_WEATHER': re.compile(r'\*?\*?GET_WEATHER:\*?\*?(.+?)(?:\n|$)', re.MULTILINE | re.IGNORECASE),
-            'WEB_SEARCH': re.compile(r'\*?\*?WEB_SEARCH:\*?\*?(.+?)(?:\n|$)', re.MULTILINE | re.IGNORECASE),
-            'VISIT_WEBSITE': re.compile(r'\*?\*?VISIT_WEBSITE:\*?\*?(.+?)(?:\n|$)', re.MULTILINE | re.IGNORECASE),
-            'STEAM_SEARCH': re.compile(r'\*?STEAM_SEARCH:?\*?(.+?)(?:\n|$)', re.MULTILINE | re.IGNORECASE),
-            'SPOTIFY_SEARCH': re.compile(r'\*?\*?SPOTIFY_SEARCH:\*?\*?(.+?)(?:\n|$)', re.MULTILINE | re.IGNORECASE),
-            'STEAM_USER': re.compile(r'\*?\*?STEAM_USER:\*?\*?(.+?)(?:\n|$)', re.MULTILINE | re.IGNORECASE),
-        }
-
-        processed_response = ai_response
-        tool_outputs = {}
-
-        tool_order = ['STEAM_USER', 'SPOTIFY_SEARCH', 'STEAM_SEARCH', 'WEB_SEARCH', 'VISIT_WEBSITE', 'GET_WEATHER', 'EXECUTE_COMMAND']
+    def available_tools(self) -> list:
+        """Registry tools that can run right now, as OpenAI-style function definitions"""
+        enabled = {'execute_command', 'steam_search'}
+        if self.searchapi_key:
+            enabled.update(('web_search', 'visit_website'))
+        if self.bot.get_cog('Weather') is not None:
+            enabled.add('get_weather')
+        if self.spotify_client:
+            enabled.add('spotify_search')
+        if self.bot.get_cog('SteamUserTool') is not None:
+            enabled.add('steam_user')
+
+        return [
+            {"type": "function", "function": {"name": name, "description": tool['description'], "parameters": tool['parameters']}}
+            for name, tool in self.TOOLS.items() if name in enabled
+        ]
 
-        for tool_name in tool_order:
-            pattern = self.tool_patterns[tool_name]
-            matches = list(pattern.finditer(processed_response))
+    async def run_tool(self, name: str, arguments: dict, channel_or_interaction, context: str) -> str:
+        """Run one registry tool and return its output for the model"""
+        if name == 'execute_command':
+            return await self.execute_safe_command(arguments.get('command', ''))
 
-            for match in matches:
-                tool_call_text = match.group(0).strip()
-                arg_text = match.group(1).strip() if match.groups() else ""
-                print(f"DEBUG: Detected tool call - {tool_name}: '{arg_text}'")
+        elif name == 'get_weather':
+            return await self.get_weather(arguments.get('location', ''))
 
-                try:
+        elif name == 'web_search':
+            return await self.web_search(arguments.get('query', ''))
 
-                    if tool_name == 'EXECUTE_COMMAND':
-                        result = await self.execute_safe_command(arg_text)
-                        tool_outputs[tool_name] = result
-                        processed_response = processed_response.replace(tool_call_text, "", 1)
-
-                    elif tool_name == 'GET_WEATHER':
-                        result = await self.get_weather(arg_text)
-                        tool_outputs[tool_name] = result
-                        processed_response = processed_response.replace(tool_call_text, "", 1)
-
-                    elif tool_name == 'WEB_SEARCH':
-                        result = await self.web_search(arg_text)
-                        tool_outputs[tool_name] = result
-                        processed_response = processed_response.replace(tool_call_text, "", 1)
-
-                    elif tool_name == 'VISIT_WEBSITE':
-                        result = await self.visit_website(arg_text)
-                        tool_outputs[tool_name] = result
-                        processed_response = processed_response.replace(tool_call_text, "", 1)
-
-                    elif tool_name == 'STEAM_SEARCH':
-                        embed = await self.search_steam_game(arg_text)
-                        if context == "channel":
-                            await channel_or_interaction.reply(embed=embed)
-                        else:
-                            await channel_or_interaction.followup.send(embed=embed)
+        elif name == 'visit_website':
+            return await self.visit_website(arguments.get('url', ''))
 
-                        tool_outputs[tool_name] = f"Steam game search embed sent for '{arg_text}'"
-                        processed_response = processed_response.replace(tool_call_text, "", 1)
+        elif name in ('steam_search', 'spotify_search'):
+            if name == 'steam_search':
+                query = arguments.get('game_name', '')
+                embed = await self.search_steam_game(query)
+            else:
+                query = arguments.get('query', '')
+                embed = await self.search_spotify_song(query)
 
-                    elif tool_name == 'SPOTIFY_SEARCH':
-                        embed = await self.search_spotify_song(arg_text)
-                        if context == "channel":
-                            await channel_or_interaction.reply(embed=embed)
+            if context == "channel":
+                await channel_or_interaction.reply(embed=embed)
+            else:
+                await channel_or_interaction.followup.send(embed=embed)
+
+            if name == 'steam_search':
+                return f"Steam game search embed sent for '{query}'"
+            return f"Spotify song search embed sent for '{query}'"
+
+        elif name == 'steam_user':
+            return await self.run_steam_user_tool(arguments)
+
+        return f"❌ Unknown tool: {name}"
+
+    async def run_steam_user_tool(self, arguments: dict) -> str:
+        steam_user_cog = self.bot.get_cog('SteamUserTool')
+        if not steam_user_cog:
+            return "❌ Steam User Tool cog is not loaded."
+
+        kwargs = dict(arguments)
+        func_name = kwargs.pop('function', None)
+        if not func_name:
+            return f"❌ Steam User Tool: Could not parse tool call: {kwargs.get('call', arguments)}"
+        if func_name not in self.TOOLS['steam_user']['parameters']['properties']['function']['enum'] or not hasattr(steam_user_cog, func_name):
+            return f"❌ Steam User Tool: Function '{func_name}' not found."
+
+        tool_output = await getattr(steam_user_cog, func_name)(**kwargs)
+
+        if tool_output is None:
+            return f"Steam User Tool: {func_name} returned no data."
+        elif isinstance(tool_output, (dict, list)):
+            return f"Steam User Tool: {func_name} result:\n```json\n{json.dumps(tool_output, indent=2)}\n```"
+        return f"Steam User Tool: {func_name} result: {tool_output}"
+
+    async def execute_tool_calls(self, calls: list, channel_or_interaction, context: str) -> list:
+        """Run (name, arguments) tool calls concurrently, each under its registry timeout, and return their outputs in order"""
+        async def run_one(name, arguments):
+            timeout = self.TOOLS[name]['timeout'] if name in self.TOOLS else 30
+            print(f"DEBUG: Detected tool call - {name}: {arguments}")
+            try:
+                return str(await asyncio.wait_for(self.run_tool(name, arguments, channel_or_interaction, context), timeout))
+            except asyncio.TimeoutError:
+                print(f"⏱️ Tool {name} timed out after {timeout}s")
+                return f"❌ {name} timed out after {timeout} seconds"
+            except Exception as e:
+                print(f"Error processing tool {name} with {arguments}: {e}")
+                return f"❌ Error executing {name}: {str(e)}"
+
+        return await asyncio.gather(*(run_one(name, arguments) for name, arguments in calls))
+
+    def parse_tool_markers(self, ai_response: str) -> tuple[list, str]:
+        """Tool calls written as text markers, as (name, arguments), and the response without them"""
+        calls = []
+        for match in self.TOOL_MARKER_PATTERN.finditer(ai_response):
+            name = self.TOOL_MARKERS[match.group(1).rstrip(':').upper()]
+            arg_text = match.group(2).strip()
+
+            if name == 'steam_user':
+                arguments = {'call': arg_text}
+                call_match = re.match(r"(\w+)\((.*)\)", arg_text)
+                if call_match:
+                    func_name, args_str = call_match.groups()
+                    arguments = {'function': func_name}
+                    for arg_pair in [arg.strip() for arg in args_str.split(',') if arg.strip()]:
+                        if '=' in arg_pair:
+                            key, value = arg_pair.split('=', 1)
+                            arguments[key.strip()] = value.strip().strip("'\"")
+                        elif "resolve_steam_vanity_url" in func_name:
+                            arguments['vanity_url'] = arg_pair.strip("'\"")
                         else:
-                            await channel_or_interaction.followup.send(embed=embed)
+                            arguments['discord_user_id'] = arg_pair.strip("'\"")
+            else:
+                first_parameter = next(iter(self.TOOLS[name]['parameters']['properties']))
+                arguments = {first_parameter: arg_text}
 
-                        tool_outputs[tool_name] = f"Spotify song search embed sent for '{arg_text}'"
-                        processed_response = processed_response.replace(tool_call_text, "", 1)
+            calls.append((name, arguments))
 
-                    elif tool_name == 'STEAM_USER':
-                        steam_user_cog = self.bot.get_cog('SteamUserTool')
-                        if steam_user_cog:
+        remaining = self.TOOL_MARKER_PATTERN.sub("", ai_response)
+        return calls, re.sub(r'\n{3,}', '\n\n', remaining).strip()
 
-                            try:
-                                match = re.match(r"(\w+)\((.*)\)", arg_text.strip())
-                                if match:
-                                    func_name = match.group(1)
-                                    args_str = match.group(2)
-
-                                    kwargs = {}
-                                    if args_str:
-                                        arg_pairs = [arg.strip() for arg in args_str.split(',')]
-                                        for arg_pair in arg_pairs:
-                                            if '=' in arg_pair:
-                                                key, value = arg_pair.split('=', 1)
-                                                kwargs[key.strip()] = value.strip().strip("'\"")
-                                            else:
-                                                if "resolve_steam_vanity_url" in func_name:
-                                                    kwargs['vanity_url'] = arg_pair.strip().strip("'\"")
-                                                elif func_name in ["get_steam_id", "get_steam_profile_summary", "get_user_owned_games"]:
-                                                    kwargs['discord_user_id'] = arg_pair.strip().strip("'\"")
-
-                                    if hasattr(steam_user_cog, func_name):
-                                        tool_func = getattr(steam_user_cog, func_name)
-                                        tool_output = await tool_func(**kwargs)
-
-                                        if tool_output is None:
-                                            formatted_output = f"Steam User Tool: {func_name} returned no data."
-                                        elif isinstance(tool_output, dict):
-                                            formatted_output = f"Steam User Tool: {func_name} result:\n```json\n{json.dumps(tool_output, indent=2)}\n```"
-                                        elif isinstance(tool_output, list):
-                                            formatted_output = f"Steam User Tool: {func_name} result:\n```json\n{json.dumps(tool_output, indent=2)}\n```"
-                                        else:
-                                            formatted_output = f"Steam User Tool: {func_name} result: {tool_output}"
-                                    else:
-                                        formatted_output = f"❌ Steam User Tool: Function '{func_name}' not found."
-                                else:
-                                    formatted_output = f"❌ Steam User Tool: Could not parse tool call: {arg_text}"
-                            except Exception as e:
-                                formatted_output = f"❌ Error executing Steam User Tool '{arg_text}': {str(e)}"
-                        else:
-                            formatted_output = "❌ Steam User Tool cog is not loaded."
-
-                        tool_outputs[tool_name] = formatted_output
-                        processed_response = processed_response.replace(tool_call_text, "", 1)
+    async def extract_and_execute_tools(self, ai_response: str, channel_or_interaction, context: str) -> tuple[dict, str, bool]:
+        """Run the tool calls a model wrote as text markers; used when it doesn't make structured calls"""
+        calls, processed_response = self.parse_tool_markers(ai_response)
+        outputs = await self.execute_tool_calls(calls, channel_or_interaction, context)
 
-                except Exception as e:
-                    print(f"Error processing tool {tool_name} with arg '{arg_text}': {e}")
-                    error_output = f"❌ Error executing {tool_name}: {str(e)}"
-                    tool_outputs[tool_name] = error_output
-                    processed_response = processed_response.replace(tool_call_text, "", 1)
+        tool_outputs = {}
+        for (name, _), output in zip(calls, outputs):
+            marker = self.TOOLS[name]['marker']
+            tool_outputs[marker] = f"{tool_outputs[marker]}\n{output}" if marker in tool_outputs else output
 
-        processed_response = re.sub(r'\n{3,}', '\n\n', processed_response).strip()
         tools_used = len(tool_outputs) > 0
         return tool_outputs, processed_response, tools_used
 
+    def tool_results_turn(self, tool_outputs: dict, last_round: bool) -> dict:
+        """The follow-up user turn that hands text-marker tool outputs back to the model"""
+        tool_outputs_text = "\n".join([f"{tool}: {output}" for tool, output in tool_outputs.items()])
+        if last_round:
+            instruction = "Answer my previous message using these results. Do not call any more tools."
+        else:
+            instruction = "Answer my previous message using these results. Only call another tool if they are not enough."
+        return {"role": "user", "content": f"Tool outputs:\n{tool_outputs_text}\n\n{instruction}"}
+
+    async def run_tool_rounds(self, messages, ai_message: dict, channel_or_interaction, context: str, stream=None) -> tuple[str, set]:
+        """Run the tool calls in ai_message and continue the conversation with their outputs.
+
+        Structured tool_calls are answered with one tool message each; calls
+        written as text markers get one follow-up user turn. Either way each
+        round makes a single request. Rounds repeat while the model asks for
+        more tools, up to max_tool_rounds; the last request can't call tools.
+        Returns the answer and the names of the tools that ran.
+        """
+        conversation = list(messages)
+        tools = self.available_tools()
+        tools_used = set()
+
+        for round_number in range(1, self.max_tool_rounds + 1):
+            last_round = round_number == self.max_tool_rounds
+            tool_calls = ai_message.get("tool_calls")
+
+            if tool_calls:
+                calls = []
+                for call in tool_calls:
+                    try:
+                        arguments = json.loads(call["function"]["arguments"] or "{}")
+                    except json.JSONDecodeError:
+                        arguments = {}
+                    calls.append((call["function"]["name"], arguments))
+
+                outputs = await self.execute_tool_calls(calls, channel_or_interaction, context)
+                tools_used.update(name for name, _ in calls)
+                conversation.append(ai_message)
+                for call, output in zip(tool_calls, outputs):
+                    conversation.append({"role": "tool", "tool_call_id": call["id"], "content": output})
+            else:
+                tool_outputs, processed_response, round_used = await self.extract_and_execute_tools(ai_message["content"], channel_or_interaction, context)
+                if not round_used:
+                    return processed_response, tools_used
+
+                tools_used.update(self.TOOL_MARKERS[marker] for marker in tool_outputs)
+                conversation.append({"role": "assistant", "content": ai_message["content"]})
+                conversation.append(self.tool_results_turn(tool_outputs, last_round))
+
+            if stream:
+                stream.restart()
+            ai_message = await self.call_ai_with_tools(conversation, 1500, stream, tools, "none" if last_round else "auto")
+
+        _, final_response = self.parse_tool_markers(ai_message["content"])
+        return final_response, tools_used
+
+    async def cog_load(self):
+        # Open the OpenRouter connection before the first message needs it
+        asyncio.create_task(self.http.warm_up(self.openrouter_url))
+
+    @commands.command(name="http_stats", hidden=True)
+    @commands.is_owner()
+    async def http_stats(self, ctx):
+        """Show connection reuse and latency per host for outbound HTTP calls (owner only)"""
+        stats = self.http.get_stats()
+        if not stats:
+            await ctx.send("📭 No outbound HTTP requests yet.")
+            return
+
+        embed = discord.Embed(title="🌐 Outbound HTTP", color=discord.Color.blue())
+        for host, host_stats in sorted(stats.items(), key=lambda item: -item[1]['requests'])[:25]:
+            embed.add_field(
+                name=host,
+                value=f"{host_stats['requests']} requests, {host_stats['errors']} errors, {host_stats['in_flight']} in flight\n"
+                      f"p50 {host_stats['p50_ms']:.0f} ms, p95 {host_stats['p95_ms']:.0f} ms, max {host_stats['max_ms']:.0f} ms\n"
+                      f"{host_stats['reuse_ratio'] * 100:.0f}% pooled connections reused, "
+                      f"{host_stats['dns_cache_hits']} DNS cache hits",
+                inline=False
+            )
+        await ctx.send(embed=embed)
+
+    @commands.command(name="ai_cache_stats", hidden=True)
+    @commands.is_owner()
+    async def ai_cache_stats(self, ctx):
+        """Show AI response cache hit rates (owner only)"""
+        stats = self.response_cache.get_stats()
+        embed = discord.Embed(title="🧠 AI Response Cache", color=discord.Color.blue())
+        embed.add_field(
+            name="Hit Rate",
+            value=f"{stats['hit_rate'] * 100:.1f}% of {stats['lookups']} lookups\n"
+                  f"{stats['overall_hit_rate'] * 100:.1f}% of all requests ({stats['bypassed']} bypassed)",
+            inline=False
+        )
+        embed.add_field(
+            name="Hits",
+            value=f"{stats['memory_hits']} memory, {stats['db_hits']} database, "
+                  f"{stats['near_duplicate_hits']} near-duplicate",
+            inline=False
+        )
+        if stats['hits_by_category']:
+            embed.add_field(
+                name="Hits by Category",
+                value=", ".join(f"{category}: {hits}" for category, hits in sorted(stats['hits_by_category'].items())),
+                inline=False
+            )
+        embed.add_field(
+            name="Entries",
+            value=f"{stats['size']}/{stats['maxsize']} in memory, {stats['stores']} stored, {stats['evictions']} evicted",
+            inline=False
+        )
+        await ctx.send(embed=embed)
+
     def get_message_logger(self):
         if self.message_logger is None:
             self.message_logger = self.bot.get_cog('MessageLogger')
@@ -278,9 +498,7 @@ class Gork(commands.Cog):
 
     def get_content_filter(self):
         if self.content_filter is None:
-            message_logger = self.get_message_logger()
-            if message_logger and message_logger.db:
-                self.content_filter = ContentFilter(message_logger.db)
+            self.content_filter = ContentFilter(get_message_database(self.bot))
         return self.content_filter
 
     async def check_and_delete_duplicate(self, message, content: str):
@@ -319,14 +537,12 @@ class Gork(commands.Cog):
                 continue
 
             
-            for tool_name, pattern in self.tool_patterns.items():
-                if pattern.search(msg_content):
-                    try:
-                        await msg_obj.delete()
-                        print(f"Deleted tool call message: {msg_content[:50]}...")
-                    except Exception as e:
-                        print(f"Failed to delete tool message: {e}")
-                    break  
+            if self.TOOL_MARKER_PATTERN.search(msg_content):
+                try:
+                    await msg_obj.delete()
+                    print(f"Deleted tool call message: {msg_content[:50]}...")
+                except Exception as e:
+                    print(f"Failed to delete tool message: {e}")
 
     async def get_gif_info(self, image_data: bytes, filename: str) -> str:
         """Get enhanced GIF information using Pillow if available"""
@@ -502,7 +718,7 @@ class Gork(commands.Cog):
 
                 if is_image_by_content_type or is_image_by_extension:
                     
-                    async with aiohttp.ClientSession() as session:
+                    async with self.http.session() as session:
                         async with session.get(attachment.url) as response:
                             if response.status == 200:
                                 image_data = await response.read()
@@ -559,7 +775,7 @@ class Gork(commands.Cog):
                 
                 elif any(attachment.filename.lower().endswith(ext) for ext in text_extensions):
                     
-                    async with aiohttp.ClientSession() as session:
+                    async with self.http.session() as session:
                         async with session.get(attachment.url) as response:
                             if response.status == 200:
                                 
@@ -583,7 +799,7 @@ class Gork(commands.Cog):
                 
                 elif any(attachment.filename.lower().endswith(ext) for ext in binary_extensions):
                     
-                    async with aiohttp.ClientSession() as session:
+                    async with self.http.session() as session:
                         async with session.get(attachment.url) as response:
                             if response.status == 200:
                                 binary_data = await response.read()
@@ -609,7 +825,7 @@ class Gork(commands.Cog):
                 
                 elif any(attachment.filename.lower().endswith(ext) for ext in audio_video_extensions):
                     
-                    async with aiohttp.ClientSession() as session:
+                    async with self.http.session() as session:
                         async with session.get(attachment.url) as response:
                             if response.status == 200:
                                 audio_data = await response.read()
@@ -638,7 +854,7 @@ class Gork(commands.Cog):
         for embed in message.embeds:
             if embed.image and embed.image.url:
                 try:
-                    async with aiohttp.ClientSession() as session:
+                    async with self.http.session() as session:
                         async with session.get(embed.image.url) as response:
                             if response.status == 200:
                                 content_type = response.headers.get('content-type', 'image/png')
@@ -730,7 +946,7 @@ class Gork(commands.Cog):
                 'num': min(num_results, 10)  
             }
 
-            async with aiohttp.ClientSession() as session:
+            async with self.http.session() as session:
                 async with session.get(self.searchapi_url, params=params) as response:
                     if response.status == 200:
                         data = await response.json()
@@ -785,7 +1001,7 @@ class Gork(commands.Cog):
                 'cc': 'US'
             }
 
-            async with aiohttp.ClientSession() as session:
+            async with self.http.session() as session:
                 
                 async with session.get(self.steam_search_url, params=search_params) as response:
                     if response.status == 200:
@@ -1322,8 +1538,8 @@ Summary:"""
                 'Upgrade-Insecure-Requests': '1',
             }
 
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
-                async with session.get(url, headers=headers) as response:
+            async with self.http.session() as session:
+                async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as response:
                     if response.status == 200:
                         
                         content_type = response.headers.get('content-type', '').lower()
@@ -1415,36 +1631,186 @@ Summary:"""
         except Exception as e:
             return f"🌐 **Website:** {url}\n❌ Error visiting website: {str(e)}"
 
-    async def call_ai(self, messages, max_tokens=1000):
-        """Make a call to OpenRouter API with the Llama model"""
+    async def call_ai(self, messages, max_tokens=1000, stream=None):
+        """Make a call to OpenRouter API with the Llama model.
+
+        With a StreamingReply as stream, tokens are shown in Discord as they
+        arrive; the full response text is still returned.
+        """
+        reply = await self.call_ai_with_tools(messages, max_tokens, stream)
+        return reply["content"]
+
+    async def call_ai_with_tools(self, messages, max_tokens=1000, stream=None, tools=None, tool_choice=None) -> dict:
+        """Make a call to OpenRouter API, offering tools as functions the model can call.
+
+        Returns the assistant message: its content and, when the model called
+        functions, the OpenAI-style tool_calls.
+        """
         if not self.openrouter_api_key:
-            return "Error: OpenRouter API key not configured"
+            return {"role": "assistant", "content": "Error: OpenRouter API key not configured"}
+
+        if stream is not None:
+            response_text = ""
+            tool_calls = []
+            async for token in self.stream_ai(messages, max_tokens, tools, tool_choice, tool_calls):
+                response_text += token
+                await stream.feed(token)
+            reply = {"role": "assistant", "content": response_text}
+            if tool_calls:
+                reply["tool_calls"] = tool_calls
+            return reply
 
-        headers = {
+        try:
+            async with self.http.session() as session:
+                async with session.post(self.openrouter_url, headers=self.openrouter_headers(),
+                                        json=self.openrouter_payload(messages, max_tokens, tools, tool_choice)) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        self.record_usage(data.get("usage"))
+                        message = data["choices"][0]["message"]
+                        reply = {"role": "assistant", "content": message.get("content") or ""}
+                        if message.get("tool_calls"):
+                            reply["tool_calls"] = message["tool_calls"]
+                        return reply
+                    else:
+                        error_text = await response.text()
+                        return {"role": "assistant", "content": f"Error: API request failed with status {response.status}: {error_text}"}
+        except Exception as e:
+            return {"role": "assistant", "content": f"Error: Failed to call AI API: {str(e)}"}
+
+    def openrouter_headers(self) -> dict:
+        return {
             "Authorization": f"Bearer {self.openrouter_api_key}",
             "Content-Type": "application/json",
             "HTTP-Referer": "https://discordbot.learnhelp.cc",
             "X-Title": "Gork"
         }
 
+    def openrouter_payload(self, messages, max_tokens, tools=None, tool_choice=None, stream=False) -> dict:
         payload = {
             "model": self.model,
             "messages": messages,
             "max_tokens": max_tokens,
             "temperature": 0.7
         }
+        if tools:
+            payload["tools"] = tools
+            payload["tool_choice"] = tool_choice or "auto"
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def record_usage(self, usage):
+        """Add one completion's token counts to the running totals"""
+        self.ai_usage['calls'] += 1
+        if usage:
+            self.ai_usage['prompt_tokens'] += usage.get("prompt_tokens") or 0
+            self.ai_usage['completion_tokens'] += usage.get("completion_tokens") or 0
+
+    async def stream_ai(self, messages, max_tokens=1000, tools=None, tool_choice=None, tool_calls=None):
+        """Stream a completion from OpenRouter, yielding text as it arrives (server-sent events).
+
+        Function calls arrive in fragments; they are assembled into tool_calls
+        when a list is passed.
+        """
+        start_time = time.perf_counter()
+        first_token_ms = None
+        received = False
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.openrouter_url, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data["choices"][0]["message"]["content"]
-                    else:
+            async with self.http.session() as session:
+                async with session.post(self.openrouter_url, headers=self.openrouter_headers(),
+                                        json=self.openrouter_payload(messages, max_tokens, tools, tool_choice, stream=True)) as response:
+                    if response.status != 200:
                         error_text = await response.text()
-                        return f"Error: API request failed with status {response.status}: {error_text}"
+                        yield f"Error: API request failed with status {response.status}: {error_text}"
+                        return
+
+                    # Lines starting with ':' are keep-alive comments
+                    async for raw_line in response.content:
+                        line = raw_line.decode("utf-8").strip()
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+
+                        event = json.loads(data)
+                        if "error" in event:
+                            raise RuntimeError(event["error"].get("message", event["error"]))
+                        if event.get("usage"):
+                            self.record_usage(event["usage"])
+
+                        choices = event.get("choices") or [{}]
+                        delta = choices[0].get("delta") or {}
+
+                        for call_delta in delta.get("tool_calls") or []:
+                            if tool_calls is None:
+                                break
+                            index = call_delta.get("index", len(tool_calls))
+                            while len(tool_calls) <= index:
+                                tool_calls.append({"id": "", "type": "function", "function": {"name": "", "arguments": ""}})
+                            call = tool_calls[index]
+                            if call_delta.get("id"):
+                                call["id"] = call_delta["id"]
+                            function = call_delta.get("function") or {}
+                            call["function"]["name"] += function.get("name") or ""
+                            call["function"]["arguments"] += function.get("arguments") or ""
+                            received = True
+
+                        token = delta.get("content")
+                        if token:
+                            if first_token_ms is None:
+                                first_token_ms = (time.perf_counter() - start_time) * 1000
+                            received = True
+                            yield token
         except Exception as e:
-            return f"Error: Failed to call AI API: {str(e)}"
+            print(f"❌ Streaming AI call failed: {e}")
+            if not received:
+                yield f"Error: Failed to call AI API: {str(e)}"
+            else:
+                yield f"\n\n❌ Response cut off: {str(e)}"
+            return
+
+        total_ms = (time.perf_counter() - start_time) * 1000
+        if first_token_ms is None:
+            print(f"⏱️ AI stream finished in {total_ms:.0f}ms without any text")
+        else:
+            print(f"⏱️ AI stream: first token after {first_token_ms:.0f}ms, complete after {total_ms:.0f}ms")
+
+    async def get_content_warning(self, user_id) -> str:
+        """Warning to show above a reply for users with relaxed content settings"""
+        content_filter = self.get_content_filter()
+        if not content_filter:
+            return ""
+        try:
+            user_content_settings = await content_filter.get_user_content_settings(str(user_id))
+            return content_filter.get_content_warning_message(user_content_settings) or ""
+        except Exception as e:
+            print(f"Error adding content warning: {e}")
+            return ""
+
+    def response_cache_key(self, messages, channel, content_warning: str):
+        """Response cache key for a request, or None when its reply must not be shared.
+
+        NSFW-scoped requests, prompts about the asker or other people, and
+        messages with files bypass the cache.
+        """
+        user_content = messages[-1]["content"]
+        nsfw_channel = getattr(channel, 'is_nsfw', None) is not None and channel.is_nsfw()
+        if content_warning or nsfw_channel or not isinstance(user_content, str) or self.PERSONAL_PATTERN.search(user_content):
+            self.response_cache.record_bypass()
+            return None
+        return self.response_cache.make_key(messages, self.model)
+
+    async def store_cached_response(self, cache_key, final_response: str, tools_used: set):
+        """Cache a finished reply unless it is an error or used a tool with side effects or live data"""
+        if cache_key is None or not final_response.strip() or "❌" in final_response or final_response.startswith("Error:"):
+            return
+        if any(tool not in self.CACHE_TOOL_CATEGORIES for tool in tools_used):
+            return
+        category = self.response_cache.category_for(cache_key['content'], {self.CACHE_TOOL_CATEGORIES[tool] for tool in tools_used})
+        await self.response_cache.set(cache_key, final_response, category)
 
     @commands.Cog.listener()
     async def on_message(self, message):
@@ -1638,6 +2004,7 @@ Summary:"""
                 if steam_user_tool_status == "enabled":
                     system_content += f"\n\nYou have access to the **STEAM_USER** tool to retrieve information about Steam users. Use this tool when users ask about their Steam ID, profile summary, owned games, or to resolve a Steam vanity URL.\n\n**Tool: STEAM_USER**\n  - **get_steam_id(discord_user_id: str)**: Retrieves the linked Steam ID for a given Discord user ID.\n    - Example: **STEAM_USER: get_steam_id(discord_user_id='1234567890')**\n  - **get_steam_profile_summary(discord_user_id: str)**: Fetches the Steam profile summary for a given Discord user ID. Requires a linked Steam ID.\n    - Example: **STEAM_USER: get_steam_profile_summary(discord_user_id='1234567890')**\n  - **get_user_owned_games(discord_user_id: str)**: Fetches the list of games owned by the Steam user linked to the given Discord user ID. Requires a linked Steam ID.\n    - Example: **STEAM_USER: get_user_owned_games(discord_user_id='1234567890')**\n  - **resolve_steam_vanity_url(vanity_url: str)**: Resolves a Steam custom URL (vanity URL) to a 64-bit Steam ID.\n    - Example: **STEAM_USER: resolve_steam_vanity_url(vanity_url='gabelogannewell')**\n\nIMPORTANT: When using STEAM_USER, you CAN add info or summarize something about it but DO NOT repeat anything copyrighted. Just respond with the STEAM_USER command only. The results will be automatically formatted and displayed. REMEMBER ONLY RESPOND ONCE TO REQUESTS NO EXCEPTIONS."
 
+                system_content += "\n\nWhen a tool is also offered to you as a function, call the function instead of writing its command format. Independent tools can be called together in one turn."
                 system_content += "\n\nKeep responses under 2000 characters to fit Discord's message limit."
 
                 
@@ -1769,58 +2136,51 @@ Summary:"""
                         "content": user_content
                     })
 
-                async with message.channel.typing():
-
-                    ai_response = await self.call_ai(messages)
-                    print(f"DEBUG: AI response received: '{ai_response}' (length: {len(ai_response) if ai_response else 0})")
-
-                    if "steam" in ai_response.lower() or "game" in ai_response.lower():
-                        print(f"DEBUG: Game/Steam related response detected, checking for STEAM_SEARCH pattern")
-                        print(f"DEBUG: Contains STEAM_SEARCH:: {'STEAM_SEARCH:' in ai_response}")
-                        print(f"DEBUG: Full response for analysis: {repr(ai_response)}")
-
-                        if "STEAM_SEARCH:" not in ai_response:
+                content_warning = await self.get_content_warning(message.author.id)
+                cache_key = self.response_cache_key(messages, message.channel, content_warning)
+                cached_response = await self.response_cache.get(cache_key)
 
-                            user_message_text = user_content.lower()
-                            game_keywords = ["tell me about", "what's the price of", "show me", "search for", "information about", "details about"]
+                reply = None
+                if self.stream_responses and cached_response is None:
+                    reply = StreamingReply(message.reply, prefix=content_warning,
+                                           hidden_pattern=self.TOOL_MARKER_PATTERN, hidden_markers=self.TOOL_MARKERS)
 
-                            for keyword in game_keywords:
-                                if keyword in user_message_text:
+                async with message.channel.typing():
 
-                                    parts = user_message_text.split(keyword)
-                                    if len(parts) > 1:
-                                        potential_game = parts[1].strip().split()[0:3]
-                                        game_name = " ".join(potential_game).strip("?.,!").title()
-                                        if game_name and len(game_name) > 2:
-                                            print(f"DEBUG: Fallback detected potential game name: '{game_name}'")
+                    if cached_response is not None:
+                        final_response, tools_used = cached_response, set()
+                    else:
+                        ai_message = await self.call_ai_with_tools(messages, stream=reply, tools=self.available_tools())
+                        ai_response = ai_message["content"]
+                        print(f"DEBUG: AI response received: '{ai_response}' (length: {len(ai_response) if ai_response else 0}, tool calls: {len(ai_message.get('tool_calls', []))})")
 
-                                            steam_embed = await self.search_steam_game(game_name)
-                                            await message.channel.send(embed=steam_embed)
-                                            ai_response = ""
-                                            break
+                        if not ai_message.get("tool_calls") and ("steam" in ai_response.lower() or "game" in ai_response.lower()):
+                            print(f"DEBUG: Game/Steam related response detected, checking for STEAM_SEARCH pattern")
+                            print(f"DEBUG: Contains STEAM_SEARCH:: {'STEAM_SEARCH:' in ai_response}")
+                            print(f"DEBUG: Full response for analysis: {repr(ai_response)}")
 
-                    tool_outputs, initial_response, tools_used = await self.extract_and_execute_tools(ai_response, message, "channel")
+                            if "STEAM_SEARCH:" not in ai_response:
 
-                    if tool_outputs:
-                        # Process tool outputs through AI with original prompt
-                        tool_outputs_text = "\n".join([f"{tool}: {output}" for tool, output in tool_outputs.items()])
+                                user_message_text = user_content.lower()
+                                game_keywords = ["tell me about", "what's the price of", "show me", "search for", "information about", "details about"]
 
-                        second_messages = [
-                            {"role": "system", "content": "You are an AI assistant processing tool outputs. Analyze and summarize the tool results in the context of the user's original request."},
-                            {"role": "user", "content": f"Original user message: {user_content}\n\nTool outputs:\n{tool_outputs_text}\n\nPlease summarize what these tool results mean in the context of the user's request."}
-                        ]
+                                for keyword in game_keywords:
+                                    if keyword in user_message_text:
 
-                        processed_tool_summary = await self.call_ai(second_messages, max_tokens=1000)
+                                        parts = user_message_text.split(keyword)
+                                        if len(parts) > 1:
+                                            potential_game = parts[1].strip().split()[0:3]
+                                            game_name = " ".join(potential_game).strip("?.,!").title()
+                                            if game_name and len(game_name) > 2:
+                                                print(f"DEBUG: Fallback detected potential game name: '{game_name}'")
 
-                        # Combine initial response + processed tool summary
-                        third_messages = [
-                            {"role": "system", "content": "You are an AI assistant combining initial analysis with tool results. Create a coherent final response."},
-                            {"role": "user", "content": f"Initial AI response: {initial_response}\n\nProcessed tool summary: {processed_tool_summary}\n\nCombine these into a final, coherent response to the user."}
-                        ]
+                                                steam_embed = await self.search_steam_game(game_name)
+                                                await message.channel.send(embed=steam_embed)
+                                                ai_message["content"] = ""
+                                                break
 
-                        final_response = await self.call_ai(third_messages, max_tokens=1500)
-                    else:
-                        final_response = initial_response
+                        final_response, tools_used = await self.run_tool_rounds(messages, ai_message, message, "channel", stream=reply)
+                        await self.store_cached_response(cache_key, final_response, tools_used)
 
                     
                     processing_time_ms = int((time.time() - processing_start_time) * 1000)
@@ -1828,46 +2188,27 @@ Summary:"""
                     if not final_response or not final_response.strip():
                         final_response = "❌ I received an empty response from the AI. Please try again."
 
-                    content_filter = self.get_content_filter()
-                    if content_filter:
-                        try:
-                            user_content_settings = await content_filter.get_user_content_settings(str(message.author.id))
-                            content_warning = content_filter.get_content_warning_message(user_content_settings)
-                            if content_warning:
-                                final_response = content_warning + final_response
-                        except Exception as e:
-                            print(f"Error adding content warning: {e}")
-
-                    if final_response.strip():
-                        if len(final_response) > 2000:
-
-                            chunks = [final_response[i:i+2000] for i in range(0, len(final_response), 2000)]
-                            total_chunks = len(chunks)
-                            for i, chunk in enumerate(chunks, 1):
-                                sent_message = await message.reply(chunk)
+                    final_response = content_warning + final_response
 
-                                await self.track_sent_message(sent_message, chunk)
-
-                                if message_logger:
-                                    asyncio.create_task(message_logger.log_bot_response(
-                                        message, sent_message, chunk, processing_time_ms,
-                                        self.model, (total_chunks, i)
-                                    ))
-
-                            if tools_used:
-                                await self.cleanup_tool_messages(message.channel.id)
-                        else:
-                            sent_message = await message.reply(final_response)
+                    if reply:
+                        sent = await reply.finish(final_response)
+                    else:
+                        sent = []
+                        for i in range(0, len(final_response), 2000):
+                            chunk = final_response[i:i+2000]
+                            sent.append((await message.reply(chunk), chunk))
 
-                            await self.track_sent_message(sent_message, final_response)
+                    for i, (sent_message, chunk) in enumerate(sent, 1):
+                        await self.track_sent_message(sent_message, chunk)
 
-                            if message_logger:
-                                asyncio.create_task(message_logger.log_bot_response(
-                                    message, sent_message, final_response, processing_time_ms, self.model
-                                ))
+                        if message_logger:
+                            asyncio.create_task(message_logger.log_bot_response(
+                                message, sent_message, chunk, processing_time_ms,
+                                self.model, (len(sent), i)
+                            ))
 
-                            if tools_used:
-                                await self.cleanup_tool_messages(message.channel.id)
+                    if tools_used:
+                        await self.cleanup_tool_messages(message.channel.id)
 
             except Exception as e:
                 
@@ -1942,6 +2283,7 @@ Summary:"""
         if steam_user_tool_status == "enabled":
             system_content += f"\n\nYou have access to the **STEAM_USER** tool to retrieve information about Steam users. Use this tool when users ask about their Steam ID, profile summary, owned games, or to resolve a Steam vanity URL.\n\n**Tool: STEAM_USER**\n  - **get_steam_id(discord_user_id: str)**: Retrieves the linked Steam ID for a given Discord user ID.\n    - Example: **STEAM_USER: get_steam_id(discord_user_id='1234567890')**\n  - **get_steam_profile_summary(discord_user_id: str)**: Fetches the Steam profile summary for a given Discord user ID. Requires a linked Steam ID.\n    - Example: **STEAM_USER: get_steam_profile_summary(discord_user_id='1234567890')**\n  - **get_user_owned_games(discord_user_id: str)**: Fetches the list of games owned by the Steam user linked to the given Discord user ID. Requires a linked Steam ID.\n    - Example: **STEAM_USER: get_user_owned_games(discord_user_id='1234567890')**\n  - **resolve_steam_vanity_url(vanity_url: str)**: Resolves a Steam custom URL (vanity URL) to a 64-bit Steam ID.\n    - Example: **STEAM_USER: resolve_steam_vanity_url(vanity_url='gabelogannewell')**\n\nIMPORTANT: When using STEAM_USER, you CAN add info or summarize something about it but DO NOT repeat anything copyrighted. Just respond with the STEAM_USER command only. The results will be automatically formatted and displayed. REMEMBER ONLY RESPOND ONCE TO REQUESTS NO EXCEPTIONS."
 
+        system_content += "\n\nWhen a tool is also offered to you as a function, call the function instead of writing its command format. Independent tools can be called together in one turn."
         system_content += "\n\nKeep responses under 2000 characters to fit Discord's message limit."
 
         
@@ -2023,62 +2365,40 @@ Summary:"""
                 "content": message
             })
 
-        ai_response = await self.call_ai(messages)
+        content_warning = await self.get_content_warning(interaction.user.id)
+        cache_key = self.response_cache_key(messages, interaction.channel, content_warning)
+        cached_response = await self.response_cache.get(cache_key)
 
-        tool_outputs, initial_response, tools_used = await self.extract_and_execute_tools(ai_response, interaction, "interaction")
+        reply = None
+        if self.stream_responses and cached_response is None:
+            reply = StreamingReply(interaction.followup.send, hidden_pattern=self.TOOL_MARKER_PATTERN, hidden_markers=self.TOOL_MARKERS)
 
-        if tool_outputs:
-            # Process tool outputs through AI with original prompt
-            tool_outputs_text = "\n".join([f"{tool}: {output}" for tool, output in tool_outputs.items()])
-
-            second_messages = [
-                {"role": "system", "content": "You are an AI assistant processing tool outputs. Analyze and summarize the tool results in the context of the user's original request."},
-                {"role": "user", "content": f"Original user message: {message}\n\nTool outputs:\n{tool_outputs_text}\n\nPlease summarize what these tool results mean in the context of the user's request."}
-            ]
-
-            processed_tool_summary = await self.call_ai(second_messages, max_tokens=1000)
-
-            # Combine initial response + processed tool summary
-            third_messages = [
-                {"role": "system", "content": "You are an AI assistant combining initial analysis with tool results. Create a coherent final response."},
-                {"role": "user", "content": f"Initial AI response: {initial_response}\n\nProcessed tool summary: {processed_tool_summary}\n\nCombine these into a final, coherent response to the user."}
-            ]
-
-            final_response = await self.call_ai(third_messages, max_tokens=1500)
+        if cached_response is not None:
+            final_response, tools_used = cached_response, set()
         else:
-            final_response = initial_response
+            ai_message = await self.call_ai_with_tools(messages, stream=reply, tools=self.available_tools())
+
+            final_response, tools_used = await self.run_tool_rounds(messages, ai_message, interaction, "interaction", stream=reply)
+            await self.store_cached_response(cache_key, final_response, tools_used)
 
         
         processing_time_ms = int((time.time() - processing_start_time) * 1000)
 
-        if len(final_response) > 2000:
-
-            chunks = [final_response[i:i+2000] for i in range(0, len(final_response), 2000)]
-            total_chunks = len(chunks)
-            sent_message = await interaction.followup.send(chunks[0])
-            await self.track_sent_message(sent_message, chunks[0])
-
-            if message_logger:
-                asyncio.create_task(message_logger.log_bot_response_from_interaction(
-                    interaction, sent_message, chunks[0], processing_time_ms,
-                    self.model, (total_chunks, 1)
-                ))
-            for i, chunk in enumerate(chunks[1:], 2):
-                sent_message = await interaction.followup.send(chunk)
-                await self.track_sent_message(sent_message, chunk)
-
-                if message_logger:
-                    asyncio.create_task(message_logger.log_bot_response_from_interaction(
-                        interaction, sent_message, chunk, processing_time_ms,
-                        self.model, (total_chunks, i)
-                    ))
+        if reply:
+            sent = await reply.finish(final_response)
         else:
-            sent_message = await interaction.followup.send(final_response)
-            await self.track_sent_message(sent_message, final_response)
+            sent = []
+            for i in range(0, len(final_response), 2000):
+                chunk = final_response[i:i+2000]
+                sent.append((await interaction.followup.send(chunk), chunk))
+
+        for i, (sent_message, chunk) in enumerate(sent, 1):
+            await self.track_sent_message(sent_message, chunk)
 
             if message_logger:
                 asyncio.create_task(message_logger.log_bot_response_from_interaction(
-                    interaction, sent_message, final_response, processing_time_ms, self.model
+                    interaction, sent_message, chunk, processing_time_ms,
+                    self.model, (len(sent), i)
                 ))
 
     @app_commands.command(name="gork_status", description="Check Gork AI status")
@@ -9,17 +9,17 @@ from typing import Optional
 
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.database import MessageDatabase
+from utils.database import get_message_database
 
 class MessageLogger(commands.Cog):
     """Cog for logging messages and responses to database"""
     
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.db = MessageDatabase("data/bot_messages.db")
+        self.db = get_message_database(bot)
         self.cleanup_task.start()  
     
-    def cog_unload(self):
+    async def cog_unload(self):
         """Clean up when cog is unloaded"""
         self.cleanup_task.cancel()
     
@@ -30,6 +30,8 @@ class MessageLogger(commands.Cog):
             deleted_count = await self.db.cleanup_old_messages(days_to_keep=90)  
             if deleted_count > 0:
                 print(f"🧹 Daily cleanup: Removed {deleted_count} old database entries")
+            if self.db.compress_content:
+                await self.db.compress_stored_content()
         except Exception as e:
             print(f"❌ Error in daily cleanup task: {e}")
     
@@ -230,27 +232,29 @@ class MessageLogger(commands.Cog):
             await interaction.followup.send(f"❌ Error retrieving statistics: {str(e)}")
     
     @app_commands.command(name="message_history", description="Get your recent message history")
+    @app_commands.describe(limit="Messages per page (max 10)", cursor="Cursor from a previous page to continue from")
     @app_commands.allowed_installs(guilds=True, users=True)
     @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
-    async def message_history(self, interaction: discord.Interaction, limit: int = 10):
+    async def message_history(self, interaction: discord.Interaction, limit: int = 10, cursor: Optional[str] = None):
         """Get recent message history for the user"""
         await interaction.response.defer(ephemeral=True)  
         
-        if limit > 50:
-            limit = 50
+        if limit > 10:
+            limit = 10
         elif limit < 1:
             limit = 1
         
         try:
             user_id = str(interaction.user.id)
-            history = await self.db.get_user_message_history(user_id, limit)
+            page = await self.db.get_user_message_page(user_id, limit, cursor)
+            history = page['messages']
             
             if not history:
                 await interaction.followup.send("No message history found.", ephemeral=True)
                 return
             
             embed = discord.Embed(
-                title=f"📝 Your Recent Messages (Last {len(history)})",
+                title=f"📝 Your {'Older' if cursor else 'Recent'} Messages ({len(history)})",
                 color=discord.Color.green(),
                 timestamp=datetime.utcnow()
             )
@@ -272,12 +276,61 @@ class MessageLogger(commands.Cog):
                     value=content or "*[No text content]*",
                     inline=False
                 )
+
+            if page['next_cursor']:
+                embed.set_footer(text=f"Older messages: /message_history cursor:{page['next_cursor']}")
             
             await interaction.followup.send(embed=embed, ephemeral=True)
             
         except Exception as e:
             await interaction.followup.send(f"❌ Error retrieving message history: {str(e)}", ephemeral=True)
-    
+
+    @app_commands.command(name="message_search", description="Search your logged messages")
+    @app_commands.describe(query="Words to search for", page="Page of results to show")
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    async def message_search(self, interaction: discord.Interaction, query: str, page: int = 1):
+        """Full-text search over the user's own logged messages"""
+        await interaction.response.defer(ephemeral=True)
+
+        per_page = 10
+        page = max(1, page)
+
+        try:
+            user_id = str(interaction.user.id)
+            found = await self.db.search_messages(query, user_id=user_id, limit=per_page, offset=(page - 1) * per_page)
+
+            if not found['results']:
+                await interaction.followup.send("No matching messages found.", ephemeral=True)
+                return
+
+            pages = (found['total'] + per_page - 1) // per_page
+            embed = discord.Embed(
+                title=f"🔎 Search results for \"{query[:100]}\"",
+                description=f"Page {page} of {pages} ({found['total']} match{'es' if found['total'] != 1 else ''})",
+                color=discord.Color.green(),
+                timestamp=datetime.utcnow()
+            )
+
+            for i, msg in enumerate(found['results'], (page - 1) * per_page + 1):
+                timestamp = datetime.fromisoformat(str(msg['timestamp']).replace('Z', '+00:00'))
+                formatted_time = timestamp.strftime("%m/%d %H:%M")
+
+                snippet = msg['snippet']
+                if len(snippet) > 200:
+                    snippet = snippet[:197] + "..."
+
+                embed.add_field(
+                    name=f"{i}. {formatted_time}",
+                    value=snippet or "*[No text content]*",
+                    inline=False
+                )
+
+            await interaction.followup.send(embed=embed, ephemeral=True)
+
+        except Exception as e:
+            await interaction.followup.send(f"❌ Error searching messages: {str(e)}", ephemeral=True)
+
     @commands.command(name="cleanup_messages", hidden=True)
     @commands.is_owner()
     async def cleanup_messages(self, ctx, days: int = 30):
@@ -287,7 +340,20 @@ class MessageLogger(commands.Cog):
             await ctx.send(f"🧹 Cleaned up {deleted_count} database entries older than {days} days.")
         except Exception as e:
             await ctx.send(f"❌ Error during cleanup: {str(e)}")
-    
+
+    @commands.command(name="rebuild_counters", hidden=True)
+    @commands.is_owner()
+    async def rebuild_counters(self, ctx):
+        """Rebuild the message counters from the message tables (owner only)"""
+        if await self.db.rebuild_message_counters():
+            stats = await self.db.get_conversation_stats()
+            await ctx.send(
+                f"🔢 Rebuilt message counters: {stats.get('total_messages', 0)} messages, "
+                f"{stats.get('total_responses', 0)} responses, {stats.get('unique_users', 0)} users."
+            )
+        else:
+            await ctx.send("❌ Error rebuilding message counters.")
+
     @commands.command(name="db_stats", hidden=True)
     @commands.is_owner()
     async def db_stats(self, ctx):
@@ -304,8 +370,86 @@ class MessageLogger(commands.Cog):
             embed.add_field(name="Total Messages", value=stats.get('total_messages', 0), inline=True)
             embed.add_field(name="Total Responses", value=stats.get('total_responses', 0), inline=True)
             embed.add_field(name="Unique Users", value=stats.get('unique_users', 0), inline=True)
-            
-            
+
+            since = (datetime.utcnow() - timedelta(hours=24)).strftime("%Y-%m-%d %H:00")
+            hours = await self.db.get_rollups(period='hour', since=since)
+            timed = sum(h['processing_ms_count'] for h in hours)
+            embed.add_field(
+                name="Last 24 Hours",
+                value=f"Messages: {sum(h['message_count'] for h in hours)}\n"
+                      f"Responses: {sum(h['response_count'] for h in hours)}\n"
+                      f"Avg response: {sum(h['processing_ms_sum'] for h in hours) / timed if timed else 0:.0f} ms",
+                inline=True
+            )
+
+            queue_stats = self.db.get_write_queue_stats()
+            embed.add_field(
+                name="Write Queue",
+                value=f"Depth: {queue_stats['queue_depth']}/{queue_stats['queue_capacity']}\n"
+                      f"Flushed: {queue_stats['rows_flushed']} rows in {queue_stats['batches_flushed']} batches\n"
+                      f"Failed: {queue_stats['rows_failed']} rows",
+                inline=True
+            )
+            embed.add_field(
+                name="Flush Latency",
+                value=f"Last: {queue_stats['last_flush_ms']:.1f} ms\n"
+                      f"Avg: {queue_stats['avg_flush_ms']:.1f} ms\n"
+                      f"Max: {queue_stats['max_flush_ms']:.1f} ms",
+                inline=True
+            )
+
+            cache_stats = self.db.get_settings_cache_stats()
+            embed.add_field(
+                name="Settings Cache",
+                value="\n".join(
+                    f"{scope.title()}: {s['hits']} hits / {s['misses']} misses ({s['hit_rate']:.0%})"
+                    for scope, s in cache_stats.items()
+                ),
+                inline=False
+            )
+
+            conversation_stats = self.db.get_conversation_cache_stats()
+            embed.add_field(
+                name="Conversation Cache",
+                value=f"{conversation_stats['buffers']} buffers, "
+                      f"{conversation_stats['size_bytes'] / 1024:.0f}/{conversation_stats['max_bytes'] / 1024:.0f} KB\n"
+                      f"{conversation_stats['hits']} hits / {conversation_stats['misses']} misses "
+                      f"({conversation_stats['hit_rate']:.0%}), {conversation_stats['evictions']} evicted",
+                inline=False
+            )
+
+            snapshot_stats = self.db.get_snapshot_stats()
+            embed.add_field(
+                name="Read Snapshots",
+                value=f"{snapshot_stats['in_use']}/{snapshot_stats['pool_size']} in use, "
+                      f"{snapshot_stats['snapshots']} taken\n"
+                      f"Hold avg {snapshot_stats['avg_hold_ms']:.1f} ms, max {snapshot_stats['max_hold_ms']:.1f} ms, "
+                      f"{snapshot_stats['long_snapshots']} over {self.db.SNAPSHOT_WARN_MS / 1000:.0f}s",
+                inline=False
+            )
+
+            contention_stats = self.db.get_contention_stats()
+            busiest = sorted(contention_stats['methods'].items(), key=lambda item: -item[1]['retries'])[:3]
+            embed.add_field(
+                name="Write Contention",
+                value=f"{contention_stats['retries']} busy retries, {contention_stats['drops']} writes dropped\n"
+                      f"Write lock wait avg {contention_stats['avg_write_lock_wait_ms']:.1f} ms, "
+                      f"max {contention_stats['max_write_lock_wait_ms']:.1f} ms"
+                      + "".join(f"\n• {method}: {stats['retries']} retries, {stats['drops']} dropped"
+                                for method, stats in busiest if stats['retries']),
+                inline=False
+            )
+
+            compression_stats = await self.db.get_compression_stats()
+            if compression_stats.get('rows_compressed'):
+                embed.add_field(
+                    name="Compression",
+                    value=f"{compression_stats['rows_compressed']} bodies at {compression_stats['ratio']:.1f}x, "
+                          f"{compression_stats['saved_bytes'] / (1024 * 1024):.1f} MB saved\n"
+                          f"{compression_stats['reads']} reads, avg {compression_stats['avg_read_us']:.0f} µs to decompress",
+                    inline=False
+                )
+
             try:
                 import os
                 db_size = os.path.getsize(self.db.db_path)
@@ -319,6 +463,86 @@ class MessageLogger(commands.Cog):
         except Exception as e:
             await ctx.send(f"❌ Error retrieving database statistics: {str(e)}")
 
+    @commands.command(name="db_health", hidden=True)
+    @commands.is_owner()
+    async def db_health(self, ctx):
+        """Get database file, free space, WAL and cleanup status (owner only)"""
+        health = await self.db.get_database_health()
+        if not health:
+            await ctx.send("❌ Error retrieving database health.")
+            return
+
+        mb = 1024 * 1024
+        embed = discord.Embed(
+            title="🩺 Database Health",
+            color=discord.Color.teal(),
+            timestamp=datetime.utcnow()
+        )
+
+        embed.add_field(name="Database Size", value=f"{health['db_size_bytes'] / mb:.2f} MB", inline=True)
+        if health['backend'] == 'postgresql':
+            embed.add_field(name="Dead Rows", value=f"{health['dead_rows']} of {health['live_rows']}", inline=True)
+        else:
+            embed.add_field(
+                name="Free Pages",
+                value=f"{health['free_pages']} ({health['free_bytes'] / mb:.2f} MB)",
+                inline=True
+            )
+            embed.add_field(name="WAL Size", value=f"{health['wal_size_bytes'] / mb:.2f} MB", inline=True)
+        embed.add_field(name="Auto Vacuum", value=health['auto_vacuum'], inline=True)
+        if health['partitions']:
+            embed.add_field(
+                name="Partitions",
+                value=f"{health['partitions']} files ({health['partition_size_bytes'] / mb:.2f} MB)",
+                inline=True
+            )
+
+        cleanup = health['last_cleanup']
+        if cleanup:
+            embed.add_field(
+                name="Last Cleanup",
+                value=f"{cleanup['last_cleanup_at'][:19]} UTC\n"
+                      f"{cleanup['rows_deleted']} rows in {cleanup['batches']} batches\n"
+                      f"{cleanup['rows_per_second']:.0f} rows/s, {cleanup['pages_freed']} pages freed",
+                inline=False
+            )
+        else:
+            embed.add_field(name="Last Cleanup", value="Not run since startup", inline=False)
+
+        if health['auto_vacuum'] in ('none', 'full'):
+            embed.set_footer(text="Run db_vacuum once to enable incremental vacuum for this database")
+
+        await ctx.send(embed=embed)
+
+    @commands.command(name="db_vacuum", hidden=True)
+    @commands.is_owner()
+    async def db_vacuum(self, ctx):
+        """Rebuild the database file and enable incremental vacuum (owner only)"""
+        await ctx.send("🧽 Vacuuming database, logging is paused until this finishes...")
+        if await self.db.vacuum_database():
+            await ctx.send("✅ Database vacuumed.")
+        else:
+            await ctx.send("❌ Error vacuuming database.")
+
+    @commands.command(name="db_export", hidden=True)
+    @commands.is_owner()
+    async def db_export(self, ctx, file_format: str = "jsonl", days: Optional[int] = None):
+        """Export logged messages and responses to data/exports (owner only)"""
+        if file_format not in ("jsonl", "parquet"):
+            await ctx.send("❌ Format must be jsonl or parquet.")
+            return
+
+        since = datetime.utcnow() - timedelta(days=days) if days else None
+        directory = os.path.join("data", "exports", datetime.utcnow().strftime("%Y%m%d-%H%M%S"))
+        os.makedirs(directory, exist_ok=True)
+        await ctx.send(f"📦 Exporting to `{directory}`...")
+
+        counts = []
+        for kind in ("messages", "responses"):
+            path = os.path.join(directory, f"{kind}.{file_format}")
+            counts.append(await self.db.export_rows(path, kind, file_format, since=since))
+        await ctx.send(f"✅ Exported {counts[0]} messages and {counts[1]} responses to `{directory}`.")
+
     @app_commands.command(name="logs", description="Get conversation logs for a user (Admin only)")
     @app_commands.describe(user="The user to get logs for")
     async def logs_slash(self, interaction: discord.Interaction, user: discord.User):
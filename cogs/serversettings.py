@@ -8,14 +8,14 @@ import os
 # Add the parent directory to sys.path to allow importing utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.database import MessageDatabase
+from utils.database import get_message_database
 
 class ServerSettings(commands.Cog):
     """Cog for managing server-specific settings including random messages"""
     
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.db = MessageDatabase("data/bot_messages.db")
+        self.db = get_message_database(bot)
 
     gorksettings = app_commands.Group(name="gorksettings", description="Manage Gork AI server settings")
 
@@ -270,5 +270,5 @@ class ServerSettings(commands.Cog):
 
 async def setup(bot: commands.Bot):
     cog = ServerSettings(bot)
-    await cog.db.initialize() 
+    await cog.db.initialize()
     await bot.add_cog(cog)
@@ -1,6 +1,6 @@
 import os
 import sys
-import httpx
+import aiohttp
 import discord
 from discord.ext import commands
 from typing import Optional, List, Dict, Any
@@ -8,13 +8,15 @@ from typing import Optional, List, Dict, Any
 # Add the parent directory to sys.path to allow importing utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.database import MessageDatabase
+from utils.database import MessageDatabase, get_message_database
+from utils.http_client import get_http_client
 from utils.steam_api import resolve_vanity_url as steam_resolve_vanity_url
 
 class SteamUserTool(commands.Cog):
     def __init__(self, bot: commands.Bot, db: MessageDatabase):
         self.bot = bot
         self.db = db
+        self.http = get_http_client(bot)
         self.steam_web_api_key = os.getenv("STEAM_WEB")
         if not self.steam_web_api_key:
             print("WARNING: STEAM_WEB environment variable not set. Steam API tools may not function.")
@@ -65,20 +67,20 @@ class SteamUserTool(commands.Cog):
         }
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(api_url, params=params)
-                response.raise_for_status()
-                data = response.json()
+            async with self.http.session() as session:
+                async with session.get(api_url, params=params) as response:
+                    response.raise_for_status()
+                    data = await response.json()
 
                 players = data.get("response", {}).get("players")
                 if players:
                     return players[0]
                 return None
-        except httpx.RequestError as e:
-            print(f"❌ HTTP request error for Steam profile summary: {e}")
+        except aiohttp.ClientResponseError as e:
+            print(f"❌ HTTP status error for Steam profile summary ({e.status}): {e}")
             return None
-        except httpx.HTTPStatusError as e:
-            print(f"❌ HTTP status error for Steam profile summary ({e.response.status_code}): {e}")
+        except aiohttp.ClientError as e:
+            print(f"❌ HTTP request error for Steam profile summary: {e}")
             return None
         except Exception as e:
             print(f"❌ An unexpected error occurred while fetching Steam profile summary: {e}")
@@ -114,18 +116,18 @@ class SteamUserTool(commands.Cog):
         }
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(api_url, params=params)
-                response.raise_for_status()
-                data = response.json()
+            async with self.http.session() as session:
+                async with session.get(api_url, params=params) as response:
+                    response.raise_for_status()
+                    data = await response.json()
 
                 games = data.get("response", {}).get("games")
                 return games if games else []
-        except httpx.RequestError as e:
-            print(f"❌ HTTP request error for user owned games: {e}")
+        except aiohttp.ClientResponseError as e:
+            print(f"❌ HTTP status error for user owned games ({e.status}): {e}")
             return None
-        except httpx.HTTPStatusError as e:
-            print(f"❌ HTTP status error for user owned games ({e.response.status_code}): {e}")
+        except aiohttp.ClientError as e:
+            print(f"❌ HTTP request error for user owned games: {e}")
             return None
         except Exception as e:
             print(f"❌ An unexpected error occurred while fetching user owned games: {e}")
@@ -144,13 +146,12 @@ class SteamUserTool(commands.Cog):
                            or None if the vanity URL cannot be resolved or an error occurs.
         """
         try:
-            return await steam_resolve_vanity_url(vanity_url)
+            return await steam_resolve_vanity_url(vanity_url, self.http)
         except Exception as e:
             print(f"❌ Error resolving Steam vanity URL '{vanity_url}': {e}")
             return None
 
 async def setup(bot: commands.Bot):
-    db_path = os.getenv("DB_PATH", "bot_messages.db")
-    db = MessageDatabase(db_path)
+    db = get_message_database(bot)
     await db.initialize()
     await bot.add_cog(SteamUserTool(bot, db))
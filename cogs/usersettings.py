@@ -8,7 +8,8 @@ import sys
 # Add the parent directory to sys.path to allow importing utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.database import MessageDatabase
+from utils.database import get_message_database
+from utils.http_client import get_http_client
 from utils.steam_api import resolve_vanity_url
 
 class UserSettings(commands.Cog):
@@ -16,8 +17,8 @@ class UserSettings(commands.Cog):
     
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.db = MessageDatabase("data/bot_messages.db")
-    
+        self.db = get_message_database(bot)
+
     @app_commands.command(name="nsfw_mode", description="Enable or disable NSFW content mode")
     @app_commands.describe(
         enabled="Enable (True) or disable (False) NSFW content mode"
@@ -311,7 +312,7 @@ class UserSettings(commands.Cog):
         try:
             if customurl:
                 await interaction.followup.send(f"Resolving Steam custom URL: `{customurl}`...", ephemeral=True)
-                resolved_steam_id = await resolve_vanity_url(customurl)
+                resolved_steam_id = await resolve_vanity_url(customurl, get_http_client(self.bot))
                 if not resolved_steam_id:
                     embed = discord.Embed(
                         title="❌ Steam Link Failed",
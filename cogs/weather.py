@@ -2,10 +2,13 @@ import os
 import discord
 from discord.ext import commands
 from discord import app_commands
-import aiohttp
 from dotenv import load_dotenv
 import json
 from typing import Optional
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.http_client import get_http_client
 
 class Weather(commands.Cog):
     def __init__(self, bot: commands.Bot):
@@ -13,6 +16,7 @@ class Weather(commands.Cog):
         load_dotenv("ai.env")
         self.weatherapi_key = os.getenv("WEATHERAPI_KEY")
         self.base_url = "http://api.weatherapi.com/v1"
+        self.http = get_http_client(bot)
     
     async def get_weather_data(self, location: str, days: int = 1) -> dict:
         """Get weather data from WeatherAPI"""
@@ -30,7 +34,7 @@ class Weather(commands.Cog):
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
+            async with self.http.session() as session:
                 async with session.get(url, params=params) as response:
                     if response.status == 200:
                         return await response.json()
@@ -13,6 +13,10 @@ discord_token = os.getenv("DISCORD_TOKEN")
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from utils.database import get_message_database
+from utils.http_client import get_http_client
+from utils.response_cache import get_response_cache
+
 if not discord_token:
     raise ValueError("Missing DISCORD_TOKEN environment variable.")
 
@@ -47,8 +51,19 @@ async def on_ready():
 
 async def main():
     async with bot:
-        await load_cogs()
-        await bot.start(discord_token)
+        # One database, HTTP client and response cache for every cog, opened before
+        # they load and closed after the bot stops, so reloading a cog keeps them
+        message_db = get_message_database(bot)
+        http_client = get_http_client(bot)
+        response_cache = get_response_cache(bot)
+        await message_db.initialize()
+        try:
+            await load_cogs()
+            await bot.start(discord_token)
+        finally:
+            await http_client.close()
+            await response_cache.close()
+            await message_db.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
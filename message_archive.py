@@ -0,0 +1,53 @@
+
+import argparse
+import asyncio
+import os
+
+from utils.database import create_message_database
+
+KINDS = ('messages', 'responses')
+
+
+async def export_archive(args):
+    db = create_message_database(args.db)
+    await db.initialize()
+    os.makedirs(args.directory, exist_ok=True)
+    filters = {'since': args.since, 'until': args.until, 'guild_id': args.guild, 'user_id': args.user}
+    try:
+        for kind in KINDS:
+            path = os.path.join(args.directory, f"{kind}.{args.format}")
+            await db.export_rows(path, kind, args.format, **filters)
+    finally:
+        await db.close()
+
+
+async def import_archive(args):
+    db = create_message_database(args.db)
+    await db.initialize()
+    try:
+        # Messages go first so each response finds its original message
+        for kind in KINDS:
+            path = os.path.join(args.directory, f"{kind}.{args.format}")
+            if not os.path.exists(path):
+                print(f"⚠️ No {kind} file at {path}, skipping")
+                continue
+            await db.import_rows(path, kind, args.format)
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export the message log to JSONL or Parquet files, or import them into the "
+                    "configured database (set MESSAGE_DATABASE_URL to target PostgreSQL)"
+    )
+    parser.add_argument("action", choices=("export", "import"))
+    parser.add_argument("directory", help="directory holding messages.<format> and responses.<format>")
+    parser.add_argument("--db", default="data/bot_messages.db", help="SQLite file, when MESSAGE_DATABASE_URL is unset")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), default="jsonl")
+    parser.add_argument("--since", help="export rows at or after this ISO timestamp (UTC)")
+    parser.add_argument("--until", help="export rows before this ISO timestamp (UTC)")
+    parser.add_argument("--guild", help="export only this guild's messages and their responses")
+    parser.add_argument("--user", help="export only this user's messages and their responses")
+    args = parser.parse_args()
+    asyncio.run(export_archive(args) if args.action == "export" else import_archive(args))
@@ -0,0 +1,68 @@
+import asyncio
+import os
+import shutil
+import tempfile
+
+from utils.response_cache import ResponseCache
+
+SYSTEM_PROMPT = "You are Gork, a helpful AI assistant on Discord."
+MODEL = "check-model"
+
+# (stored prompt, lookup prompt, whether the lookup should reuse the stored reply)
+NEAR_DUPLICATE_CASES = [
+    ("tell me a joke about cats please", "Tell me a joke about cats please!", True),
+    ("tell me a joke about cats please", "tell me a joke abotu cats please", True),
+    ("what's the weather in london", "whats the weather like in london", True),
+    ("tell me a joke about cats please", "tell me a joke about dogs please", False),
+    ("tell me a long funny joke about cats right now", "tell me a long funny joke about dogs right now", False),
+    ("what is 12345 plus 678 exactly", "what is 12345 plus 679 exactly", False),
+    ("what's the weather in london", "what's the weather in paris", False),
+]
+
+
+def messages(prompt: str) -> list:
+    return [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}]
+
+
+async def store_all(cache: ResponseCache):
+    for index, (stored, _, _) in enumerate(NEAR_DUPLICATE_CASES):
+        await cache.set(cache.make_key(messages(stored), f"{MODEL}-{index}"), f"reply {index}", 'general')
+
+
+async def lookup_all(cache: ResponseCache, tier: str) -> list:
+    """Look up every case, each under its own model so the cases cannot answer each other"""
+    failures = []
+    for index, (stored, lookup, should_hit) in enumerate(NEAR_DUPLICATE_CASES):
+        reply = await cache.get(cache.make_key(messages(lookup), f"{MODEL}-{index}"))
+        if (reply == f"reply {index}") != should_hit:
+            failures.append(f"{tier}: {lookup!r} {'missed' if should_hit else 'reused the reply to'} {stored!r}")
+    return failures
+
+
+async def run_checks():
+    workdir = tempfile.mkdtemp(prefix="gork-response-cache-")
+    try:
+        cache = ResponseCache(near_duplicates=True)
+        await store_all(cache)
+        failures = await lookup_all(cache, "memory")
+
+        # Look up from a fresh cache, so every answer comes from the SQLite tier
+        path = os.path.join(workdir, "response_cache.db")
+        writer = ResponseCache(db_path=path, near_duplicates=True)
+        await store_all(writer)
+        await writer.close()
+        reader = ResponseCache(db_path=path, near_duplicates=True)
+        failures += await lookup_all(reader, "sqlite")
+        await reader.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        raise SystemExit(1)
+    print(f"✅ {len(NEAR_DUPLICATE_CASES) * 2} near-duplicate checks passed on the memory and SQLite tiers")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_checks())
@@ -1,7 +1,7 @@
 
 import os
 import asyncio
-from utils.database import MessageDatabase
+from utils.database import create_message_database
 
 async def setup_database():
     print("🔧 Setting up message logging database...")
@@ -9,16 +9,30 @@ async def setup_database():
     os.makedirs("data", exist_ok=True)
     print("✅ Created data directory")
 
-    db = MessageDatabase("data/bot_messages.db")
+    db = create_message_database("data/bot_messages.db")
     await db.initialize()
     
     print("✅ Database setup complete!")
-    print(f"📁 Database location: {os.path.abspath(db.db_path)}")
+    if os.getenv("MESSAGE_DATABASE_URL"):
+        print("📁 Database location: PostgreSQL (MESSAGE_DATABASE_URL)")
+    else:
+        print(f"📁 Database location: {os.path.abspath(db.db_path)}")
 
     print("\n🧪 Testing database operations...")
 
     stats = await db.get_conversation_stats()
     print(f"📊 Initial stats: {stats}")
+
+    scans = await db.check_query_plans()
+    await db.close()
+
+    if scans:
+        print("\n❌ These queries scan or sort a whole table instead of using an index:")
+        for method, details in scans.items():
+            for detail in details:
+                print(f"   • {method}: {detail}")
+        raise SystemExit(1)
+    print("✅ Every query method is served from an index")
     
     print("\n✅ All tests passed! The message logging system is ready to use.")
     print("\n📝 The bot will now automatically log:")
@@ -29,6 +43,7 @@ async def setup_database():
     print("\n🔍 Use the following commands to view data:")
     print("   • /message_stats - View your message statistics")
     print("   • /message_history - View your recent message history")
+    print("   • /message_search - Search your logged messages")
 
 if __name__ == "__main__":
     asyncio.run(setup_database())
@@ -0,0 +1,260 @@
+
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+from utils.database import MessageDatabase
+
+SNOWFLAKE_BASE = 1100000000000000000
+USERS = [str(SNOWFLAKE_BASE + 100 + i) for i in range(3)]
+CHANNELS = [str(SNOWFLAKE_BASE + 200 + i) for i in range(2)]
+GUILD = str(SNOWFLAKE_BASE + 300)
+STEAM_ID = "76561197960287930"
+
+# Keys whose values depend on the backend or the wall clock rather than on the data
+VOLATILE_KEYS = {'id', 'created_at', 'updated_at', 'steam_linked_at', 'last_updated',
+                 'rank', 'snippet', 'next_cursor', 'read_ms', 'avg_read_us'}
+
+POSTGRES_OBJECTS = """
+    DROP VIEW IF EXISTS all_messages, all_responses;
+    DROP TABLE IF EXISTS responses, messages, user_settings, guild_settings, channel_settings,
+        user_summaries, message_counters, message_rollups, compression_dictionaries, schema_version;
+    DROP AGGREGATE IF EXISTS group_concat(TEXT, TEXT);
+    DROP FUNCTION IF EXISTS group_concat_step(TEXT, TEXT, TEXT);
+    DROP FUNCTION IF EXISTS content_text(INTEGER, TEXT);
+"""
+
+
+def message_id(index: int) -> str:
+    return str(SNOWFLAKE_BASE + 1000 + index * 10)
+
+
+def response_id(index: int, chunk: int = 1) -> str:
+    return str(SNOWFLAKE_BASE + 1000 + index * 10 + chunk)
+
+
+class Scenario:
+    """Runs the same calls against one backend, checking each result and keeping it for comparison"""
+
+    def __init__(self, db: MessageDatabase, now: datetime, old: datetime):
+        self.db = db
+        self.now = now
+        self.old = old
+        self.results = []
+        self.failures = []
+
+    def check(self, name: str, value, condition: bool = True):
+        self.results.append((name, value))
+        if not condition:
+            self.failures.append(f"{name}: {value!r}")
+        return value
+
+    def expect(self, name: str, value, expected):
+        return self.check(name, value, value == expected)
+
+    async def run(self):
+        db = self.db
+        await db.initialize()
+        now, old = self.now, self.old
+
+        # 12 messages: four per user over two channels, the first three old
+        # enough for cleanup and the last one a DM
+        for index in range(12):
+            timestamp = old if index < 3 else now - timedelta(minutes=60 - index)
+            is_dm = index == 11
+            await db.log_user_message(
+                USERS[index % 3], f"user{index % 3}", f"User {index % 3}",
+                CHANNELS[index % 2], None if is_dm else f"channel-{index % 2}",
+                None if is_dm else GUILD, None if is_dm else "Pancake Guild",
+                message_id(index), f"message {index} about pancakes and syrup number{index}",
+                has_attachments=index == 4, attachment_info={'files': 1} if index == 4 else None,
+                timestamp=timestamp, wait=False
+            )
+        for index in range(0, 12, 2):
+            chunks = 2 if index == 6 else 1
+            for chunk in range(1, chunks + 1):
+                await db.log_bot_response(
+                    message_id(index), response_id(index, chunk), f"reply {index} part {chunk} with waffles",
+                    chunks, chunk, 100 * (index + 1), "model-a" if index % 4 else "model-b", 10 * (index + 1),
+                    timestamp=(old if index < 3 else now) + timedelta(seconds=chunk)
+                )
+        # Logging a message again updates it in place
+        await db.log_user_message(
+            USERS[0], "user0", "User 0", CHANNELS[1], "channel-1", GUILD, "Pancake Guild",
+            message_id(9), "message 9 edited to mention crepes", timestamp=now - timedelta(minutes=51)
+        )
+        await db.flush()
+
+        queue = db.get_write_queue_stats()
+        self.check("write queue", {'failed': queue['rows_failed']}, queue['rows_failed'] == 0)
+
+        history = self.check("history", await db.get_user_message_history(USERS[0]))
+        self.check("history size", len(history), len(history) == 4)
+        self.check("history order", [row['message_id'] for row in history],
+                   [row['message_id'] for row in history] == [message_id(i) for i in (9, 6, 3, 0)])
+
+        chunked = next(row for row in history if row['message_id'] == message_id(6))
+        self.check("history chunked reply", (chunked['response_count'], chunked['response_message_ids']),
+                   chunked['response_count'] == 1
+                   and chunked['response_message_ids'] == [response_id(6, 1), response_id(6, 2)]
+                   and chunked['bot_responses'] == "reply 6 part 1 with waffles" + "reply 6 part 2 with waffles")
+
+        first = self.check("first page", await db.get_user_message_page(USERS[0], 2))
+        second = self.check("second page", await db.get_user_message_page(USERS[0], 2, first['next_cursor']))
+        self.check("pages", [row['message_id'] for row in first['messages'] + second['messages']],
+                   first['next_cursor'] and second['next_cursor'] is None
+                   and [row['message_id'] for row in first['messages'] + second['messages']]
+                   == [row['message_id'] for row in history])
+
+        context = self.check("context", await db.get_conversation_context(USERS[0]))
+        self.check("context channel", await db.get_conversation_context(USERS[0], 10, CHANNELS[0]))
+        self.check("context turns", len(context), len(context) == 6
+                   and context[-1]['content'] == "message 9 edited to mention crepes"
+                   and context[-2]['content'].count("waffles") == 2)
+
+        replies = [turn for turn in context if turn['role'] == 'assistant']
+        self.check("context replies", [turn['response_message_ids'] for turn in replies],
+                   [turn['response_message_ids'] for turn in replies] == [[response_id(0)], [response_id(6, 1), response_id(6, 2)]])
+
+        search = self.check("search", await db.search_messages("pancakes syr"))
+        self.check("search total", search['total'], search['total'] == 11)
+        self.check("search snippet", all('**' in row['snippet'] for row in search['results']),
+                   all('**' in row['snippet'] for row in search['results']))
+        by_user = self.check("search user", await db.search_messages("crepes", user_id=USERS[0]))
+        self.check("search user total", by_user['total'], by_user['total'] == 1)
+        responses = self.check("search responses", await db.search_messages("waffles", 'responses', limit=3))
+        self.check("search responses total", responses['total'], responses['total'] == 7)
+
+        before = self.check("global counters", await db.get_message_counters())
+        self.check("global counts", before, before == {'message_count': 12, 'response_count': 7, 'user_count': 3})
+        self.check("user counters", await db.get_message_counters('user', USERS[0]))
+        self.check("guild counters", await db.get_message_counters('guild', GUILD))
+        self.check("stats", await db.get_conversation_stats())
+        self.check("user stats", await db.get_conversation_stats(USERS[1]))
+
+        days = self.check("day rollups", await db.get_rollups('global', '', 'day'))
+        self.check("day rollup totals", sum(row['message_count'] for row in days),
+                   sum(row['message_count'] for row in days) == 12)
+        self.check("hour rollups", await db.get_rollups('user', USERS[0], 'hour'))
+        self.check("top users", await db.get_top_rollups('user'))
+        models = self.check("top models", await db.get_top_rollups('model', 10, 'response_count'))
+        self.check("model rollups", [(row['scope_id'], row['processing_ms_min'], row['processing_ms_max']) for row in models],
+                   [row['response_count'] for row in models] == [4, 3])
+
+        self.check("default user settings", await db.get_user_settings(USERS[0]))
+        self.expect("update user settings", await db.update_user_settings(
+            USERS[0], username="user0", nsfw_mode=True, content_filter_level='moderate',
+            steam_id=STEAM_ID, steam_username="pancake"), True)
+        settings = self.check("user settings", await db.get_user_settings(USERS[0]))
+        self.check("user settings saved", (settings['nsfw_mode'], settings['steam_id']),
+                   settings['nsfw_mode'] is True and settings['steam_id'] == STEAM_ID)
+        self.check("nsfw users", [row['user_id'] for row in await db.get_users_with_nsfw_enabled()])
+        self.check("steam link taken", await db.validate_steam_id_link(STEAM_ID, USERS[1]))
+        self.check("steam link own", await db.validate_steam_id_link(STEAM_ID, USERS[0]))
+        self.expect("delete user settings", await db.delete_user_settings(USERS[0]), True)
+        self.check("user settings after delete", (await db.get_user_settings(USERS[0]))['nsfw_mode'])
+
+        self.check("default guild settings", await db.get_guild_settings(GUILD))
+        self.expect("update guild settings", await db.update_guild_settings(
+            GUILD, "Pancake Guild", random_messages_enabled=True, bot_reply_enabled=False), True)
+        self.check("guild settings", await db.get_guild_settings(GUILD))
+        self.check("default channel settings", await db.get_channel_settings(CHANNELS[0], GUILD))
+        self.expect("update channel settings", await db.update_channel_settings(CHANNELS[0], GUILD, True), True)
+        self.check("channel settings", await db.get_channel_settings(CHANNELS[0], GUILD))
+
+        self.check("channel messages", await db.get_channel_messages(CHANNELS[0]))
+        self.expect("no summary", await db.get_user_summary(USERS[1]), None)
+        self.expect("update summary", await db.update_user_summary(USERS[1], "likes pancakes", 4), True)
+        self.check("summary", await db.get_user_summary(USERS[1]))
+        self.check("message count", await db.get_message_count_for_user(USERS[1]))
+        self.check("summary messages", await db.get_recent_user_messages_for_summary(USERS[1], 3))
+
+        self.expect("rebuild counters", await db.rebuild_message_counters(), True)
+        rebuilt = self.check("rebuilt counters", await db.get_message_counters())
+        self.check("rebuild keeps counts", rebuilt == before)
+
+        deleted = self.check("cleanup", await db.cleanup_old_messages(days_to_keep=30))
+        self.check("cleanup deleted", deleted, deleted == 5)
+        after = self.check("counters after cleanup", await db.get_message_counters())
+        self.check("cleanup counts", after, after == {'message_count': 9, 'response_count': 5, 'user_count': 3})
+        self.check("history after cleanup", len(await db.get_user_message_history(USERS[0])))
+
+        compression = await db.get_compression_stats()
+        self.check("compression stats", {key: compression.get(key) for key in ('dictionaries', 'rows_compressed')})
+        health = await db.get_database_health()
+        self.check("health", sorted(key for key in health if key in ('db_size_bytes', 'auto_vacuum', 'last_cleanup')))
+        self.expect("query plans", await db.check_query_plans(), {})
+        self.expect("vacuum", await db.vacuum_database(), True)
+
+        await db.close()
+
+
+def normalized(value):
+    """Drop volatile keys so results from different backends compare equal"""
+    if isinstance(value, dict):
+        return {key: normalized(item) for key, item in value.items() if key not in VOLATILE_KEYS}
+    if isinstance(value, (list, tuple)):
+        return [normalized(item) for item in value]
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+async def reset_postgres(dsn: str):
+    import asyncpg
+
+    connection = await asyncpg.connect(dsn)
+    try:
+        await connection.execute(POSTGRES_OBJECTS)
+    finally:
+        await connection.close()
+
+
+async def run_conformance(args):
+    workdir = tempfile.mkdtemp(prefix="gork-conformance-")
+    backends = [("sqlite", MessageDatabase(os.path.join(workdir, "conformance.db"), partition_months=args.partition_months))]
+    if args.postgres:
+        from utils.postgres_database import PostgresMessageDatabase
+        await reset_postgres(args.postgres)
+        backends.append(("postgresql", PostgresMessageDatabase(args.postgres)))
+
+    # Every backend logs the same timestamps, however long the runs before it took.
+    # Retention drops whole partitions, so the old rows sit a full partition past the cutoff
+    now = datetime.utcnow().replace(microsecond=0)
+    old = now - timedelta(days=40 + 31 * max(db.partition_months for _, db in backends))
+    results = {}
+    failed = False
+    try:
+        for name, db in backends:
+            print(f"🔧 Running the storage scenario against {name}...")
+            scenario = Scenario(db, now, old)
+            await scenario.run()
+            results[name] = scenario.results
+            for failure in scenario.failures:
+                print(f"❌ {name}: {failure}")
+            failed = failed or bool(scenario.failures)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    reference_name, reference = backends[0][0], results[backends[0][0]]
+    for name, _ in backends[1:]:
+        for (step, expected), (_, actual) in zip(reference, results[name]):
+            if normalized(expected) != normalized(actual):
+                failed = True
+                print(f"❌ {name} differs from {reference_name} at '{step}':\n   {expected!r}\n   {actual!r}")
+
+    if failed:
+        raise SystemExit(1)
+    print(f"✅ {len(reference)} checks passed on {', '.join(name for name, _ in backends)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the message database conformance scenario against each storage backend")
+    parser.add_argument("--postgres", metavar="DSN",
+                        help="also run against this PostgreSQL database; its message tables are dropped first")
+    parser.add_argument("--partition-months", type=int, metavar="MONTHS",
+                        help="partition the SQLite database by this many months (defaults to MESSAGE_PARTITION_MONTHS)")
+    asyncio.run(run_conformance(parser.parse_args()))
@@ -0,0 +1,251 @@
+"""
+Small in-process caches used by the database layer
+"""
+
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after a fixed time-to-live"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 300.0):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, count: bool = True) -> Optional[Any]:
+        """Return the cached value, or None if it is missing or expired"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at is None or expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return value
+            del self._entries[key]
+
+        if count:
+            self.misses += 1
+        return None
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        """Store a value.
+
+        Passing the generation read before a lookup makes the store a no-op if
+        anything was invalidated in the meantime, so a slow read cannot put a
+        stale value back after a write.
+        """
+        if generation is not None and generation != self.generation:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        """Drop a single key"""
+        self.generation += 1
+        self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop every entry"""
+        self.generation += 1
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters for this cache"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class ConversationCache:
+    """Per-user ring buffers of recent conversation turns, LRU-evicted under a memory budget.
+
+    A buffer is keyed by (user_id, channel_id), channel_id None meaning every
+    channel. Turns are dicts holding the user message and a 'responses' dict
+    of reply chunks keyed by response id. A buffer marked complete holds the
+    user's whole history, so it can answer requests for more turns than it has.
+
+    Every write ticks a clock. Users with a loaded buffer keep the tick of their
+    last write; everyone else shares one, so tracking writes costs no memory
+    beyond the buffers themselves.
+    """
+
+    TURN_OVERHEAD = 256
+    RESPONSE_OVERHEAD = 96
+
+    def __init__(self, turns_per_user: int = 20, max_bytes: int = 16 * 1024 * 1024, ttl: Optional[float] = 900.0):
+        self.turns_per_user = max(1, turns_per_user)
+        self.max_bytes = max(1, max_bytes)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size_bytes = 0
+        self._epoch = 0
+        self._clock = 0
+        self._unloaded_generation = 0
+        self._generations: Dict[str, int] = {}
+        self._user_buffers: Dict[str, int] = {}
+        self._buffers: "OrderedDict[tuple, dict]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buffers)
+
+    def _turn_size(self, turn: dict) -> int:
+        return self.TURN_OVERHEAD + len(turn.get('content') or '') + sum(
+            self.RESPONSE_OVERHEAD + len(response.get('content') or '') for response in turn['responses'].values()
+        )
+
+    def _resize(self, key: tuple, buffer: dict):
+        size = sum(self._turn_size(turn) for turn in buffer['turns'])
+        self.size_bytes += size - buffer['size']
+        buffer['size'] = size
+
+        while self.size_bytes > self.max_bytes and len(self._buffers) > 1:
+            oldest = next(iter(self._buffers))
+            if oldest == key:
+                self._buffers.move_to_end(key)
+                continue
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, key: tuple):
+        buffer = self._buffers.pop(key, None)
+        if buffer is not None:
+            self.size_bytes -= buffer['size']
+            user_id = key[0]
+            self._user_buffers[user_id] -= 1
+            if not self._user_buffers[user_id]:
+                del self._user_buffers[user_id]
+                # The user's writes now count against the shared generation
+                generation = self._generations.pop(user_id, None)
+                if generation is not None:
+                    self._unloaded_generation = max(self._unloaded_generation, generation)
+
+    def _touch(self, user_id: str):
+        """Record a write by a user, so loads that started before it are discarded"""
+        self._clock += 1
+        if user_id in self._user_buffers:
+            self._generations[user_id] = self._clock
+        else:
+            self._unloaded_generation = self._clock
+
+    def generation(self, user_id: str) -> tuple:
+        """Token to pass to set() so a load that raced with a write is discarded"""
+        return self._epoch, self._generations.get(user_id, self._unloaded_generation)
+
+    def get(self, user_id: str, channel_id: Optional[str] = None) -> Optional[tuple]:
+        """Return (turns oldest first, complete), or None if the buffer is missing or expired"""
+        key = (user_id, channel_id)
+        buffer = self._buffers.get(key)
+        if buffer is not None:
+            if buffer['expires_at'] is None or buffer['expires_at'] > time.monotonic():
+                self._buffers.move_to_end(key)
+                self.hits += 1
+                return list(buffer['turns']), buffer['complete']
+            self._drop(key)
+
+        self.misses += 1
+        return None
+
+    def set(self, user_id: str, channel_id: Optional[str], turns: list, complete: bool,
+            generation: Optional[tuple] = None):
+        """Store a buffer loaded from the database, turns oldest first"""
+        if generation is not None and generation != self.generation(user_id):
+            return
+
+        key = (user_id, channel_id)
+        self._drop(key)
+        buffer = {
+            'turns': deque(turns[-self.turns_per_user:], maxlen=self.turns_per_user),
+            'complete': complete and len(turns) <= self.turns_per_user,
+            'expires_at': time.monotonic() + self.ttl if self.ttl else None,
+            'size': 0,
+        }
+        self._buffers[key] = buffer
+        self._user_buffers[user_id] = self._user_buffers.get(user_id, 0) + 1
+        self._resize(key, buffer)
+
+    def add_message(self, user_id: str, channel_id: Optional[str], turn: dict):
+        """Append (or replace, by message_id) a user message in the buffers that are loaded"""
+        self._touch(user_id)
+
+        for key in {(user_id, None), (user_id, channel_id)}:
+            buffer = self._buffers.get(key)
+            if buffer is None:
+                continue
+
+            for index, existing in enumerate(buffer['turns']):
+                if existing['message_id'] == turn['message_id']:
+                    buffer['turns'][index] = dict(turn, responses=existing['responses'])
+                    break
+            else:
+                if len(buffer['turns']) == buffer['turns'].maxlen:
+                    buffer['complete'] = False
+                buffer['turns'].append(dict(turn, responses={}))
+            self._resize(key, buffer)
+
+    def add_response(self, user_id: str, channel_id: Optional[str], message_id: str,
+                     response_id: str, response: dict):
+        """Attach a reply chunk to its user message in the buffers that are loaded"""
+        self._touch(user_id)
+
+        for key in {(user_id, None), (user_id, channel_id)}:
+            buffer = self._buffers.get(key)
+            if buffer is None:
+                continue
+
+            for turn in reversed(buffer['turns']):
+                if turn['message_id'] == message_id:
+                    turn['responses'][response_id] = response
+                    self._resize(key, buffer)
+                    break
+
+    def invalidate(self, user_id: str):
+        """Drop every buffer of one user"""
+        self._touch(user_id)
+        for key in [key for key in self._buffers if key[0] == user_id]:
+            self._drop(key)
+
+    def clear(self):
+        """Drop every buffer"""
+        self._epoch += 1
+        self._generations.clear()
+        self._user_buffers.clear()
+        self._buffers.clear()
+        self.size_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and memory use for this cache"""
+        lookups = self.hits + self.misses
+        return {
+            'buffers': len(self._buffers),
+            'size_bytes': self.size_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,154 @@
+"""
+Dictionary compression for stored message and response bodies
+"""
+
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+class ContentCodec:
+    """Raw deflate against trained preset dictionaries.
+
+    A row's content_codec column holds the id of the dictionary its body was
+    compressed with, or PLAIN when the body is stored as text. Dictionaries are
+    never changed once written, so retraining only affects new rows.
+    """
+
+    PLAIN = 0
+
+    # Deflate only looks 32 KB back, so a longer dictionary would never be used
+    MAX_DICTIONARY_BYTES = 32768
+    WBITS = -15
+
+    # Bytes of sample text scanned and candidate phrases considered while training
+    TRAINING_BYTES = 512 * 1024
+    TRAINING_CANDIDATES = 20000
+
+    def __init__(self, db_path: str, min_bytes: int = 128, level: int = 6):
+        self.db_path = db_path
+        self.min_bytes = min_bytes
+        self.level = level
+        self.current_id: Optional[int] = None
+        self._dictionaries: Dict[int, bytes] = {}
+        self._lock = threading.Lock()
+        self.rows_compressed = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.reads = 0
+        self.read_ms = 0.0
+
+    def add_dictionary(self, dictionary_id: int, dictionary: bytes, current: bool = True):
+        self._dictionaries[dictionary_id] = dictionary
+        if current and (self.current_id is None or dictionary_id > self.current_id):
+            self.current_id = dictionary_id
+
+    def _dictionary(self, dictionary_id: int) -> bytes:
+        """Get a dictionary, loading it from the database if another process trained it"""
+        dictionary = self._dictionaries.get(dictionary_id)
+        if dictionary is None:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                row = conn.execute(
+                    "SELECT dictionary FROM compression_dictionaries WHERE id = ?", (dictionary_id,)
+                ).fetchone()
+            finally:
+                conn.close()
+            if row is None:
+                raise KeyError(f"Unknown compression dictionary {dictionary_id}")
+            dictionary = self._dictionaries[dictionary_id] = row[0]
+        return dictionary
+
+    def compress(self, text: Optional[str]) -> Tuple[int, Any]:
+        """Get (codec, value) to store for a body; short or incompressible bodies stay plain"""
+        if text is None or self.current_id is None:
+            return self.PLAIN, text
+
+        raw = text.encode('utf-8')
+        if len(raw) < self.min_bytes:
+            return self.PLAIN, text
+
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, self.WBITS,
+                                      zdict=self._dictionary(self.current_id))
+        stored = compressor.compress(raw) + compressor.flush()
+        if len(stored) >= len(raw):
+            return self.PLAIN, text
+
+        with self._lock:
+            self.rows_compressed += 1
+            self.raw_bytes += len(raw)
+            self.stored_bytes += len(stored)
+        return self.current_id, stored
+
+    def decompress(self, codec: Optional[int], value):
+        """Get the text of a stored body; registered as the content_text() SQL function"""
+        if not codec or value is None:
+            return value
+
+        started = time.perf_counter()
+        decompressor = zlib.decompressobj(self.WBITS, zdict=self._dictionary(codec))
+        text = (decompressor.decompress(value) + decompressor.flush()).decode('utf-8')
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        with self._lock:
+            self.reads += 1
+            self.read_ms += elapsed_ms
+        return text
+
+    @classmethod
+    def train(cls, samples: Iterable[str], size: int = MAX_DICTIONARY_BYTES) -> bytes:
+        """Build a preset dictionary from sample bodies.
+
+        Runs of one to four words are scored by the bytes they would save
+        across the samples and the best are packed in until the dictionary is
+        full. The best go last, where deflate reaches them with the shortest
+        distances.
+        """
+        size = min(size, cls.MAX_DICTIONARY_BYTES)
+        counts = Counter()
+        scanned = 0
+        for sample in samples:
+            words = re.findall(r"\S+\s*", sample)
+            for n in range(1, 5):
+                for i in range(len(words) - n + 1):
+                    phrase = "".join(words[i:i + n])
+                    if len(phrase) >= 4:
+                        counts[phrase] += 1
+            scanned += len(sample)
+            if scanned >= cls.TRAINING_BYTES:
+                break
+
+        ranked = sorted(
+            ((count - 1) * len(phrase.encode('utf-8')), phrase) for phrase, count in counts.items() if count > 1
+        )
+        chosen, chosen_text, used = [], "", 0
+        for _, phrase in reversed(ranked[-cls.TRAINING_CANDIDATES:]):
+            encoded = len(phrase.encode('utf-8'))
+            if used + encoded > size:
+                continue
+            if phrase in chosen_text:
+                continue
+            chosen.append(phrase)
+            chosen_text += phrase
+            used += encoded
+            if used >= size - 4:
+                break
+
+        return "".join(reversed(chosen)).encode('utf-8')
+
+    def stats(self) -> Dict[str, Any]:
+        """Get compression and decompression counters for this process"""
+        return {
+            'current_dictionary': self.current_id,
+            'rows_compressed': self.rows_compressed,
+            'raw_bytes': self.raw_bytes,
+            'stored_bytes': self.stored_bytes,
+            'ratio': self.raw_bytes / self.stored_bytes if self.stored_bytes else 0.0,
+            'reads': self.reads,
+            'read_ms': self.read_ms,
+            'avg_read_us': self.read_ms * 1000 / self.reads if self.reads else 0.0,
+        }
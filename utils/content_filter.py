@@ -3,7 +3,7 @@ Content filtering utilities for NSFW mode and content safety
 """
 
 from typing import Dict, Any
-from utils.database import MessageDatabase
+from utils.database import MessageDatabase, create_message_database
 
 class ContentFilter:
     """Handles content filtering based on user settings"""
@@ -155,6 +155,6 @@ class ContentFilter:
 async def get_content_filter_for_user(user_id: str, db: MessageDatabase = None) -> ContentFilter:
     """Get a ContentFilter instance for a specific user"""
     if db is None:
-        db = MessageDatabase("data/bot_messages.db")
+        db = create_message_database("data/bot_messages.db")
     
     return ContentFilter(db)
@@ -1,133 +1,1879 @@
 import sqlite3
 import aiosqlite
 import asyncio
-from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+import base64
+import glob
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List, Dict, Any, AsyncIterator
 import json
 import os
+import random
+import re
+import itertools
+import time
+from urllib.parse import quote
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+from utils.cache import ConversationCache, TTLCache
+from utils.compression import ContentCodec
 
 class MessageDatabase:
     """Database handler for storing bot messages and responses"""
+
+    PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,
+        'mmap_size': 268435456,
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY',
+        # INSERT OR REPLACE only fires the delete triggers that keep the
+        # full-text indexes in sync when recursive triggers are enabled
+        'recursive_triggers': 'ON',
+    }
     
-    def __init__(self, db_path: str = "bot_messages.db"):
+    MESSAGE_COLUMNS = """
+        id, user_id, username, user_display_name, channel_id, channel_name,
+        guild_id, guild_name, message_id, message_content, message_type,
+        has_attachments, attachment_info, timestamp, created_at
+    """
+
+    RESPONSE_COLUMNS = """
+        id, original_message_id, response_message_id, response_content,
+        response_chunks, chunk_number, processing_time_ms, model_used,
+        tokens_used, timestamp, created_at
+    """
+
+    # Read snapshots held longer than this keep WAL checkpoints from completing
+    SNAPSHOT_WARN_MS = 10000
+
+    # Write transactions that fail because another connection holds a lock are
+    # retried with jittered exponential backoff until this many seconds have
+    # passed since the first attempt, and dropped after that
+    RETRY_DEADLINE_S = 10.0
+    RETRY_BASE_DELAY_S = 0.02
+    RETRY_MAX_DELAY_S = 1.0
+
+    # Schema holding the unpartitioned tables
+    MAIN_SCHEMA = 'main'
+
+    # SQLite allows 10 attached databases per connection by default
+    MAX_ATTACHED_PARTITIONS = 9
+
+    # An upsert rather than INSERT OR REPLACE keeps the rowid that responses link to
+    INSERT_MESSAGE_SQL = """
+        INSERT INTO {schema}.messages
+        (user_id, username, user_display_name, channel_id, channel_name,
+         guild_id, guild_name, message_id, message_content, message_type,
+         has_attachments, attachment_info, timestamp, content_codec)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (message_id) DO UPDATE SET
+            user_id = excluded.user_id, username = excluded.username,
+            user_display_name = excluded.user_display_name, channel_id = excluded.channel_id,
+            channel_name = excluded.channel_name, guild_id = excluded.guild_id,
+            guild_name = excluded.guild_name, message_content = excluded.message_content,
+            message_type = excluded.message_type, has_attachments = excluded.has_attachments,
+            attachment_info = excluded.attachment_info, timestamp = excluded.timestamp,
+            content_codec = excluded.content_codec
+    """
+
+    INSERT_RESPONSE_SQL = """
+        INSERT OR REPLACE INTO {schema}.responses
+        (original_message_id, message_rowid, response_message_id, response_content,
+         response_chunks, chunk_number, processing_time_ms, model_used,
+         tokens_used, timestamp, content_codec)
+        VALUES (?1, (SELECT id FROM {schema}.messages WHERE message_id = ?1),
+                ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9, ?10)
+    """
+
+    UPSERT_COUNTER_SQL = """
+        INSERT INTO message_counters (scope, scope_id, message_count, response_count, user_count)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (scope, scope_id) DO UPDATE SET
+            message_count = message_count + excluded.message_count,
+            response_count = response_count + excluded.response_count,
+            user_count = user_count + excluded.user_count
+    """
+
+    EPOCH = datetime(1970, 1, 1)
+
+    NOW_MS_SQL = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+
+    # Renders a timestamp column as 'YYYY-MM-DD HH:MM:SS.fff' whether it holds
+    # epoch milliseconds or, before migration 6 has run, the old text form
+    TIME_TEXT_SQL = """
+        CASE typeof({column}) WHEN 'integer'
+        THEN strftime('%Y-%m-%d %H:%M:%S', {column} / 1000, 'unixepoch') || printf('.%03d', {column} % 1000)
+        ELSE {column} END
+    """
+
+    # Columns returned to callers as strings, as they were before migration 6
+    ID_COLUMNS = ('user_id', 'channel_id', 'guild_id', 'message_id', 'original_message_id', 'response_message_id')
+    TIME_COLUMNS = ('timestamp', 'created_at', 'updated_at', 'steam_linked_at', 'last_updated')
+
+    # Rows copied per statement while migration 6 rebuilds a table
+    COMPACT_CHUNK_ROWS = 5000
+
+    # Analytics rollups: (period, bucket) pairs each row is added to
+    ROLLUP_PERIODS = {
+        'hour': "substr(CAST({column} AS TEXT), 1, 13) || ':00'",
+        'day': "substr(CAST({column} AS TEXT), 1, 10)",
+        'total': "''",
+    }
+
+    UPSERT_ROLLUP_SQL = """
+        INSERT INTO message_rollups
+        (period, bucket, scope, scope_id, label, message_count, response_count,
+         processing_ms_sum, processing_ms_count, processing_ms_min, processing_ms_max,
+         tokens_sum, first_at, last_at)
+        {source}
+        ON CONFLICT (period, scope, scope_id, bucket) DO UPDATE SET
+            label = COALESCE(excluded.label, label),
+            message_count = message_count + excluded.message_count,
+            response_count = response_count + excluded.response_count,
+            processing_ms_sum = processing_ms_sum + excluded.processing_ms_sum,
+            processing_ms_count = processing_ms_count + excluded.processing_ms_count,
+            processing_ms_min = MIN(COALESCE(processing_ms_min, excluded.processing_ms_min),
+                                    COALESCE(excluded.processing_ms_min, processing_ms_min)),
+            processing_ms_max = MAX(COALESCE(processing_ms_max, excluded.processing_ms_max),
+                                    COALESCE(excluded.processing_ms_max, processing_ms_max)),
+            tokens_sum = tokens_sum + excluded.tokens_sum,
+            first_at = MIN(first_at, excluded.first_at),
+            last_at = MAX(last_at, excluded.last_at)
+    """
+
+    # Keep the external-content full-text indexes in step with their tables
+    FTS_TRIGGERS = [
+        """
+            CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+                INSERT INTO messages_fts (rowid, message_content, username)
+                VALUES (new.id, new.message_content, new.username);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+                INSERT INTO messages_fts (messages_fts, rowid, message_content, username)
+                VALUES ('delete', old.id, old.message_content, old.username);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF message_content, username ON messages BEGIN
+                INSERT INTO messages_fts (messages_fts, rowid, message_content, username)
+                VALUES ('delete', old.id, old.message_content, old.username);
+                INSERT INTO messages_fts (rowid, message_content, username)
+                VALUES (new.id, new.message_content, new.username);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS responses_fts_insert AFTER INSERT ON responses BEGIN
+                INSERT INTO responses_fts (rowid, response_content)
+                VALUES (new.id, new.response_content);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS responses_fts_delete AFTER DELETE ON responses BEGIN
+                INSERT INTO responses_fts (responses_fts, rowid, response_content)
+                VALUES ('delete', old.id, old.response_content);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS responses_fts_update AFTER UPDATE OF response_content ON responses BEGIN
+                INSERT INTO responses_fts (responses_fts, rowid, response_content)
+                VALUES ('delete', old.id, old.response_content);
+                INSERT INTO responses_fts (rowid, response_content)
+                VALUES (new.id, new.response_content);
+            END
+        """,
+    ]
+
+    # From migration 7 bodies may be stored compressed, so the full-text indexes
+    # are fed through content_text(), which every connection registers. Updates
+    # that only change how a body is stored leave the index alone.
+    FTS_CODEC_TRIGGERS = [
+        """
+            CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+                INSERT INTO messages_fts (rowid, message_content, username)
+                VALUES (new.id, content_text(new.content_codec, new.message_content), new.username);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+                INSERT INTO messages_fts (messages_fts, rowid, message_content, username)
+                VALUES ('delete', old.id, content_text(old.content_codec, old.message_content), old.username);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF message_content, username ON messages
+            WHEN old.username IS NOT new.username
+              OR content_text(old.content_codec, old.message_content) IS NOT content_text(new.content_codec, new.message_content)
+            BEGIN
+                INSERT INTO messages_fts (messages_fts, rowid, message_content, username)
+                VALUES ('delete', old.id, content_text(old.content_codec, old.message_content), old.username);
+                INSERT INTO messages_fts (rowid, message_content, username)
+                VALUES (new.id, content_text(new.content_codec, new.message_content), new.username);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS responses_fts_insert AFTER INSERT ON responses BEGIN
+                INSERT INTO responses_fts (rowid, response_content)
+                VALUES (new.id, content_text(new.content_codec, new.response_content));
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS responses_fts_delete AFTER DELETE ON responses BEGIN
+                INSERT INTO responses_fts (responses_fts, rowid, response_content)
+                VALUES ('delete', old.id, content_text(old.content_codec, old.response_content));
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS responses_fts_update AFTER UPDATE OF response_content ON responses
+            WHEN content_text(old.content_codec, old.response_content) IS NOT content_text(new.content_codec, new.response_content)
+            BEGIN
+                INSERT INTO responses_fts (responses_fts, rowid, response_content)
+                VALUES ('delete', old.id, content_text(old.content_codec, old.response_content));
+                INSERT INTO responses_fts (rowid, response_content)
+                VALUES (new.id, content_text(new.content_codec, new.response_content));
+            END
+        """,
+    ]
+
+    # Bodies shorter than this are never compressed
+    COMPRESSION_MIN_BYTES = 128
+    # Newest bodies sampled to train a dictionary, and the fewest worth training on
+    COMPRESSION_SAMPLE_ROWS = 2000
+    COMPRESSION_MIN_SAMPLES = 100
+
+    # Exported columns of each kind, in the order of the rows queued for the writer
+    EXPORT_COLUMNS = {
+        'messages': ('user_id', 'username', 'user_display_name', 'channel_id', 'channel_name',
+                     'guild_id', 'guild_name', 'message_id', 'message_content', 'message_type',
+                     'has_attachments', 'attachment_info', 'timestamp'),
+        'responses': ('original_message_id', 'response_message_id', 'response_content', 'response_chunks',
+                      'chunk_number', 'processing_time_ms', 'model_used', 'tokens_used', 'timestamp'),
+    }
+    EXPORT_INTEGER_COLUMNS = ('response_chunks', 'chunk_number', 'processing_time_ms', 'tokens_used')
+
+    # Rows read per snapshot while exporting, and written per transaction while importing
+    EXPORT_BATCH_ROWS = 1000
+    IMPORT_BATCH_ROWS = 5000
+
+    # Migration 6 layouts: snowflakes as INTEGER, timestamps as epoch milliseconds
+    # and responses linked to their message by rowid. Each entry is the table
+    # definition and the expressions converting the old columns into it.
+    COMPACT_TABLES = {
+        'messages': ("""
+            CREATE TABLE {table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                username TEXT NOT NULL,
+                user_display_name TEXT,
+                channel_id INTEGER NOT NULL,
+                channel_name TEXT,
+                guild_id INTEGER,
+                guild_name TEXT,
+                message_id INTEGER NOT NULL UNIQUE,
+                message_content TEXT NOT NULL,
+                message_type TEXT DEFAULT 'user',
+                has_attachments BOOLEAN DEFAULT FALSE,
+                attachment_info TEXT,
+                timestamp INTEGER NOT NULL,
+                created_at INTEGER DEFAULT ({now})
+            )
+        """, {
+            'user_id': "pack_id(old.user_id)",
+            'channel_id': "pack_id(old.channel_id)",
+            'guild_id': "pack_id(old.guild_id)",
+            'message_id': "pack_id(old.message_id)",
+            'timestamp': "pack_time(old.timestamp)",
+            'created_at': "pack_time(old.created_at)",
+        }),
+        'responses': ("""
+            CREATE TABLE {table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                message_rowid INTEGER REFERENCES messages (id),
+                original_message_id INTEGER NOT NULL,
+                response_message_id INTEGER NOT NULL UNIQUE,
+                response_content TEXT NOT NULL,
+                response_chunks INTEGER DEFAULT 1,
+                chunk_number INTEGER DEFAULT 1,
+                processing_time_ms INTEGER,
+                model_used TEXT,
+                tokens_used INTEGER,
+                timestamp INTEGER NOT NULL,
+                created_at INTEGER DEFAULT ({now})
+            )
+        """, {
+            'message_rowid': "(SELECT m.id FROM {schema}.messages m WHERE m.message_id = old.original_message_id)",
+            'original_message_id': "pack_id(old.original_message_id)",
+            'response_message_id': "pack_id(old.response_message_id)",
+            'timestamp': "pack_time(old.timestamp)",
+            'created_at': "pack_time(old.created_at)",
+        }),
+        'user_settings': ("""
+            CREATE TABLE {table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL UNIQUE,
+                username TEXT,
+                user_display_name TEXT,
+                nsfw_mode BOOLEAN DEFAULT FALSE,
+                content_filter_level TEXT DEFAULT 'strict',
+                steam_id TEXT,
+                steam_username TEXT,
+                steam_linked_at INTEGER,
+                created_at INTEGER DEFAULT ({now}),
+                updated_at INTEGER DEFAULT ({now})
+            )
+        """, {
+            'user_id': "pack_id(old.user_id)",
+            'steam_linked_at': "pack_time(old.steam_linked_at)",
+            'created_at': "pack_time(old.created_at)",
+            'updated_at': "pack_time(old.updated_at)",
+        }),
+        'guild_settings': ("""
+            CREATE TABLE {table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                guild_id INTEGER NOT NULL UNIQUE,
+                guild_name TEXT,
+                random_messages_enabled BOOLEAN DEFAULT FALSE,
+                bot_reply_enabled BOOLEAN DEFAULT FALSE,
+                reply_all_enabled BOOLEAN DEFAULT FALSE,
+                created_at INTEGER DEFAULT ({now}),
+                updated_at INTEGER DEFAULT ({now})
+            )
+        """, {
+            'guild_id': "pack_id(old.guild_id)",
+            'created_at': "pack_time(old.created_at)",
+            'updated_at': "pack_time(old.updated_at)",
+        }),
+        'channel_settings': ("""
+            CREATE TABLE {table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel_id INTEGER NOT NULL UNIQUE,
+                guild_id INTEGER NOT NULL,
+                reply_all_enabled BOOLEAN DEFAULT FALSE,
+                created_at INTEGER DEFAULT ({now}),
+                updated_at INTEGER DEFAULT ({now})
+            )
+        """, {
+            'channel_id': "pack_id(old.channel_id)",
+            'guild_id': "pack_id(old.guild_id)",
+            'created_at': "pack_time(old.created_at)",
+            'updated_at': "pack_time(old.updated_at)",
+        }),
+        'user_summaries': ("""
+            CREATE TABLE {table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL UNIQUE,
+                summary_text TEXT NOT NULL,
+                message_count_at_update INTEGER NOT NULL,
+                last_updated INTEGER DEFAULT ({now}),
+                created_at INTEGER DEFAULT ({now})
+            )
+        """, {
+            'user_id': "pack_id(old.user_id)",
+            'last_updated': "pack_time(old.last_updated)",
+            'created_at': "pack_time(old.created_at)",
+        }),
+    }
+
+    def __init__(self, db_path: str = "bot_messages.db", read_pool_size: int = 4,
+                 write_batch_size: int = 200, write_flush_interval: float = 0.05,
+                 write_queue_size: int = 10000, settings_cache_size: int = 2048,
+                 settings_cache_ttl: float = 300.0, partition_months: Optional[int] = None,
+                 conversation_cache_turns: int = 20, conversation_cache_bytes: int = 16 * 1024 * 1024,
+                 compress_content: Optional[bool] = None, snapshot_pool_size: int = 2):
+        """
+        partition_months > 0 stores messages and responses in one attached file
+        per that many months (defaults to MESSAGE_PARTITION_MONTHS, 0 = off).
+        Retention then drops whole partition files, so rows are kept until
+        their entire partition is older than the retention window.
+
+        The last conversation_cache_turns turns of active users are kept in
+        memory for get_conversation_context, within conversation_cache_bytes.
+
+        compress_content stores new message and response bodies compressed
+        against a dictionary trained from existing rows (defaults to
+        MESSAGE_COMPRESSION). compress_stored_content trains the dictionary and
+        compresses rows already stored. Compressed rows stay readable with it off.
+
+        History, search, statistics and analytics reads run on a separate pool
+        of snapshot_pool_size read-only connections. Each call reads one WAL
+        snapshot inside its own read transaction, so long reports neither wait
+        for nor delay the writer.
+        """
         self.db_path = db_path
+        self.read_pool_size = max(1, read_pool_size)
+        self.snapshot_pool_size = max(1, snapshot_pool_size)
+        self.write_batch_size = max(1, write_batch_size)
+        self.write_flush_interval = write_flush_interval
+        self.write_queue_size = write_queue_size
+        if partition_months is None:
+            partition_months = int(os.getenv("MESSAGE_PARTITION_MONTHS", "0") or 0)
+        self.partition_months = max(0, partition_months)
+        if compress_content is None:
+            compress_content = os.getenv("MESSAGE_COMPRESSION", "").lower() in ("1", "true", "yes", "on")
+        self.compress_content = compress_content
         self.initialized = False
+
+        self._init_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._readers: Optional[asyncio.Queue] = None
+        self._reader_connections: List[aiosqlite.Connection] = []
+        self._snapshots: Optional[asyncio.Queue] = None
+        self._snapshot_connections: List[aiosqlite.Connection] = []
+        self._read_only_connections = set()
+
+        self._partition_root = os.path.splitext(db_path)[0]
+        self._known_partitions: List[str] = []
+        self._partitions: tuple = ()
+        self._attached: Dict[int, tuple] = {}
+
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._write_stats = {
+            'rows_flushed': 0,
+            'rows_failed': 0,
+            'batches_flushed': 0,
+            'total_flush_ms': 0.0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+        }
+
+        self._maintenance_stats: Dict[str, Any] = {}
+
+        self._contention_stats: Dict[str, Dict[str, Any]] = {}
+        self._write_lock_stats = {
+            'acquisitions': 0,
+            'contended': 0,
+            'total_wait_ms': 0.0,
+            'max_wait_ms': 0.0,
+        }
+
+        self._open_snapshots: Dict[int, float] = {}
+        self._snapshot_stats = {
+            'snapshots': 0,
+            'long_snapshots': 0,
+            'total_hold_ms': 0.0,
+            'last_hold_ms': 0.0,
+            'max_hold_ms': 0.0,
+        }
+
+        self._user_settings_cache = TTLCache(settings_cache_size, settings_cache_ttl)
+        self._guild_settings_cache = TTLCache(settings_cache_size, settings_cache_ttl)
+        self._channel_settings_cache = TTLCache(settings_cache_size, settings_cache_ttl)
+        self._conversation_cache = ConversationCache(conversation_cache_turns, conversation_cache_bytes)
+        self._codec = ContentCodec(db_path, self.COMPRESSION_MIN_BYTES)
+
+    @staticmethod
+    def _read_only_uri(path: str) -> str:
+        return f"file:{quote(os.path.abspath(path))}?mode=ro"
+
+    async def _open_connection(self, read_only: bool = False) -> aiosqlite.Connection:
+        """Open a connection to the database file with the tuned pragmas applied.
+
+        Read-only connections open every file with mode=ro and set query_only,
+        so they can never take the write lock.
+        """
+        if read_only:
+            db = await aiosqlite.connect(self._read_only_uri(self.db_path), uri=True)
+            self._read_only_connections.add(id(db))
+        else:
+            db = await aiosqlite.connect(self.db_path)
+        db.row_factory = aiosqlite.Row
+        for pragma, value in self.PRAGMAS.items():
+            if not (read_only and pragma == 'journal_mode'):
+                await db.execute(f"PRAGMA {pragma} = {value}")
+        if read_only:
+            await db.execute("PRAGMA query_only = ON")
+        await db.create_function('content_text', 2, self._codec.decompress, deterministic=True)
+        return db
+
+    @asynccontextmanager
+    async def _read_connection(self):
+        """Borrow a connection from the read pool"""
+        if not self.initialized:
+            await self.initialize()
+
+        db = await self._readers.get()
+        try:
+            await self._sync_partitions(db)
+            yield db
+        finally:
+            self._readers.put_nowait(db)
+
+    @asynccontextmanager
+    async def _snapshot_connection(self):
+        """Borrow a read-only connection that sees a single WAL snapshot until it is returned.
+
+        The read transaction begins with the first query; commits made by the
+        writer meanwhile are not visible to it.
+        """
+        if not self.initialized:
+            await self.initialize()
+
+        db = await self._snapshots.get()
+        started = self._snapshot_opened(id(db))
+        try:
+            await self._sync_partitions(db)
+            await db.execute("BEGIN")
+            try:
+                yield db
+            finally:
+                await db.rollback()
+        finally:
+            self._snapshot_closed(id(db), started)
+            self._snapshots.put_nowait(db)
+
+    def _snapshot_opened(self, key: int) -> float:
+        started = time.perf_counter()
+        self._open_snapshots[key] = started
+        return started
+
+    def _snapshot_closed(self, key: int, started: float):
+        """Record how long a snapshot was held"""
+        self._open_snapshots.pop(key, None)
+        held_ms = (time.perf_counter() - started) * 1000
+        stats = self._snapshot_stats
+        stats['snapshots'] += 1
+        stats['total_hold_ms'] += held_ms
+        stats['last_hold_ms'] = held_ms
+        stats['max_hold_ms'] = max(stats['max_hold_ms'], held_ms)
+        if held_ms > self.SNAPSHOT_WARN_MS:
+            stats['long_snapshots'] += 1
+            print(f"⚠️ A read snapshot was held for {held_ms / 1000:.1f}s, holding back WAL checkpoints")
+
+    @asynccontextmanager
+    async def _timed_write_lock(self):
+        """Hold the write lock, recording how long it took to get"""
+        started = time.perf_counter()
+        async with self._write_lock:
+            waited_ms = (time.perf_counter() - started) * 1000
+            stats = self._write_lock_stats
+            stats['acquisitions'] += 1
+            if waited_ms >= 1:
+                stats['contended'] += 1
+            stats['total_wait_ms'] += waited_ms
+            stats['max_wait_ms'] = max(stats['max_wait_ms'], waited_ms)
+            yield
+
+    @asynccontextmanager
+    async def _write_connection(self):
+        """Get exclusive access to the single writer connection"""
+        if not self.initialized:
+            await self.initialize()
+
+        async with self._timed_write_lock():
+            try:
+                await self._sync_partitions(self._writer)
+                yield self._writer
+            except Exception:
+                await self._writer.rollback()
+                raise
     
+    @staticmethod
+    def _is_contention(error: Exception) -> bool:
+        """Whether an error means another connection held a lock, so retrying can succeed"""
+        if not isinstance(error, sqlite3.OperationalError):
+            return False
+        code = getattr(error, 'sqlite_errorcode', None)
+        if code is not None:
+            return code & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+        message = str(error).lower()
+        return 'database is locked' in message or 'database table is locked' in message or 'busy' in message
+
+    async def _with_retry(self, method: str, operation):
+        """Await operation(), which runs one write transaction, again each time it fails on lock contention.
+
+        Retries back off exponentially with full jitter and stop once the next
+        one would start after RETRY_DEADLINE_S; the error is then raised and
+        counted as a drop. Other errors are raised straight away.
+        """
+        stats = self._contention_stats.get(method)
+        if stats is None:
+            stats = self._contention_stats[method] = {'calls': 0, 'retries': 0, 'drops': 0, 'backoff_ms': 0.0,
+                                                      'last_error': None}
+        stats['calls'] += 1
+        deadline = time.monotonic() + self.RETRY_DEADLINE_S
+        attempt = 0
+        while True:
+            try:
+                return await operation()
+            except Exception as e:
+                if not self._is_contention(e):
+                    raise
+                stats['last_error'] = str(e)
+                delay = random.uniform(0, min(self.RETRY_MAX_DELAY_S, self.RETRY_BASE_DELAY_S * 2 ** attempt))
+                if time.monotonic() + delay > deadline:
+                    stats['drops'] += 1
+                    print(f"❌ Gave up on {method} after {attempt + 1} attempts against a busy database")
+                    raise
+                attempt += 1
+                stats['retries'] += 1
+                stats['backoff_ms'] += delay * 1000
+                await asyncio.sleep(delay)
+
     async def initialize(self):
         """Initialize the database and create tables if they don't exist"""
         if self.initialized:
             return
-            
-        
-        os.makedirs(os.path.dirname(self.db_path) if os.path.dirname(self.db_path) else ".", exist_ok=True)
-        
-        async with aiosqlite.connect(self.db_path) as db:
-            
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS messages (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id TEXT NOT NULL,
-                    username TEXT NOT NULL,
-                    user_display_name TEXT,
-                    channel_id TEXT NOT NULL,
-                    channel_name TEXT,
-                    guild_id TEXT,
-                    guild_name TEXT,
-                    message_id TEXT NOT NULL UNIQUE,
-                    message_content TEXT NOT NULL,
-                    message_type TEXT DEFAULT 'user',
-                    has_attachments BOOLEAN DEFAULT FALSE,
-                    attachment_info TEXT,
-                    timestamp DATETIME NOT NULL,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS responses (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    original_message_id TEXT NOT NULL,
-                    response_message_id TEXT NOT NULL UNIQUE,
-                    response_content TEXT NOT NULL,
-                    response_chunks INTEGER DEFAULT 1,
-                    chunk_number INTEGER DEFAULT 1,
-                    processing_time_ms INTEGER,
-                    model_used TEXT,
-                    tokens_used INTEGER,
-                    timestamp DATETIME NOT NULL,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (original_message_id) REFERENCES messages (message_id)
-                )
-            """)
-            
-            
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS user_settings (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id TEXT NOT NULL UNIQUE,
-                    username TEXT,
-                    user_display_name TEXT,
-                    nsfw_mode BOOLEAN DEFAULT FALSE,
-                    content_filter_level TEXT DEFAULT 'strict',
-                    steam_id TEXT,
-                    steam_username TEXT,
-                    steam_linked_at DATETIME,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
 
-            
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS guild_settings (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    guild_id TEXT NOT NULL UNIQUE,
-                    guild_name TEXT,
-                    random_messages_enabled BOOLEAN DEFAULT FALSE,
-                    bot_reply_enabled BOOLEAN DEFAULT FALSE,
-                    reply_all_enabled BOOLEAN DEFAULT FALSE,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+        async with self._init_lock:
+            if self.initialized:
+                return
+
+            os.makedirs(os.path.dirname(self.db_path) if os.path.dirname(self.db_path) else ".", exist_ok=True)
+
+            self._writer = await self._open_connection()
+            cursor = await self._writer.execute("SELECT COUNT(*) FROM sqlite_master")
+            if (await cursor.fetchone())[0] == 0:
+                await self._writer.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self._discover_partitions()
+            await self._sync_partitions(self._writer)
+            await self._migrate(self._writer)
+            for key in self._partitions:
+                await self._upgrade_partition(self._writer, self._partition_schema(key))
+                await self._mirror_schema(self._writer, self._partition_schema(key))
+
+            cursor = await self._writer.execute("SELECT id, dictionary FROM compression_dictionaries ORDER BY id DESC LIMIT 1")
+            row = await cursor.fetchone()
+            if row:
+                self._codec.add_dictionary(row[0], row[1])
+
+            self._readers = asyncio.Queue()
+            for _ in range(self.read_pool_size):
+                reader = await self._open_connection()
+                self._reader_connections.append(reader)
+                self._readers.put_nowait(reader)
+
+            self._snapshots = asyncio.Queue()
+            for _ in range(self.snapshot_pool_size):
+                snapshot = await self._open_connection(read_only=True)
+                self._snapshot_connections.append(snapshot)
+                self._snapshots.put_nowait(snapshot)
+
+            self._write_queue = asyncio.Queue(maxsize=self.write_queue_size)
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+            self.initialized = True
+            print("✅ Message database initialized successfully")
+
+    def _migrations(self) -> list:
+        """Ordered schema migrations as (version, description, steps).
+
+        Each step is either a SQL statement or a coroutine function taking the
+        connection. Versions are applied in order inside a transaction and
+        recorded in PRAGMA user_version; append new entries, never edit old ones.
+        """
+        return [
+            (1, "base tables and indexes", [
+                """
+                    CREATE TABLE IF NOT EXISTS messages (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id TEXT NOT NULL,
+                        username TEXT NOT NULL,
+                        user_display_name TEXT,
+                        channel_id TEXT NOT NULL,
+                        channel_name TEXT,
+                        guild_id TEXT,
+                        guild_name TEXT,
+                        message_id TEXT NOT NULL UNIQUE,
+                        message_content TEXT NOT NULL,
+                        message_type TEXT DEFAULT 'user',
+                        has_attachments BOOLEAN DEFAULT FALSE,
+                        attachment_info TEXT,
+                        timestamp DATETIME NOT NULL,
+                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                """,
+                """
+                    CREATE TABLE IF NOT EXISTS responses (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        original_message_id TEXT NOT NULL,
+                        response_message_id TEXT NOT NULL UNIQUE,
+                        response_content TEXT NOT NULL,
+                        response_chunks INTEGER DEFAULT 1,
+                        chunk_number INTEGER DEFAULT 1,
+                        processing_time_ms INTEGER,
+                        model_used TEXT,
+                        tokens_used INTEGER,
+                        timestamp DATETIME NOT NULL,
+                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        FOREIGN KEY (original_message_id) REFERENCES messages (message_id)
+                    )
+                """,
+                """
+                    CREATE TABLE IF NOT EXISTS user_settings (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id TEXT NOT NULL UNIQUE,
+                        username TEXT,
+                        user_display_name TEXT,
+                        nsfw_mode BOOLEAN DEFAULT FALSE,
+                        content_filter_level TEXT DEFAULT 'strict',
+                        steam_id TEXT,
+                        steam_username TEXT,
+                        steam_linked_at DATETIME,
+                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                """,
+                """
+                    CREATE TABLE IF NOT EXISTS guild_settings (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        guild_id TEXT NOT NULL UNIQUE,
+                        guild_name TEXT,
+                        random_messages_enabled BOOLEAN DEFAULT FALSE,
+                        bot_reply_enabled BOOLEAN DEFAULT FALSE,
+                        reply_all_enabled BOOLEAN DEFAULT FALSE,
+                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                """,
+                """
+                    CREATE TABLE IF NOT EXISTS channel_settings (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        channel_id TEXT NOT NULL UNIQUE,
+                        guild_id TEXT NOT NULL,
+                        reply_all_enabled BOOLEAN DEFAULT FALSE,
+                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                """,
+                """
+                    CREATE TABLE IF NOT EXISTS user_summaries (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id TEXT NOT NULL UNIQUE,
+                        summary_text TEXT NOT NULL,
+                        message_count_at_update INTEGER NOT NULL,
+                        last_updated DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                """,
+                """
+                    CREATE TABLE IF NOT EXISTS message_counters (
+                        scope TEXT NOT NULL,
+                        scope_id TEXT NOT NULL,
+                        message_count INTEGER NOT NULL DEFAULT 0,
+                        response_count INTEGER NOT NULL DEFAULT 0,
+                        user_count INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (scope, scope_id)
+                    )
+                """,
+                "CREATE INDEX IF NOT EXISTS idx_messages_user_id ON messages (user_id)",
+                "CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp)",
+                "CREATE INDEX IF NOT EXISTS idx_responses_original_message ON responses (original_message_id)",
+                "CREATE INDEX IF NOT EXISTS idx_responses_timestamp ON responses (timestamp)",
+                "CREATE INDEX IF NOT EXISTS idx_user_settings_user_id ON user_settings (user_id)",
+                self._rebuild_counters,
+            ]),
+            (2, "columns added after the original deploy scripts", [
+                self._add_missing_columns,
+            ]),
+            (3, "composite indexes for the hot query paths", [
+                "CREATE INDEX IF NOT EXISTS idx_messages_user_ts ON messages (user_id, timestamp)",
+                "CREATE INDEX IF NOT EXISTS idx_messages_user_type_ts ON messages (user_id, message_type, timestamp)",
+                "CREATE INDEX IF NOT EXISTS idx_messages_channel_type_ts ON messages (channel_id, message_type, timestamp)",
+                "CREATE INDEX IF NOT EXISTS idx_responses_original_chunk ON responses (original_message_id, chunk_number)",
+                "CREATE INDEX IF NOT EXISTS idx_user_settings_steam_id ON user_settings (steam_id, user_id)",
+                "CREATE INDEX IF NOT EXISTS idx_user_settings_nsfw ON user_settings (nsfw_mode, updated_at)",
+                "DROP INDEX IF EXISTS idx_messages_user_id",
+                "DROP INDEX IF EXISTS idx_responses_original_message",
+                "DROP INDEX IF EXISTS idx_user_settings_user_id",
+            ]),
+            (4, "full-text search over message and response content", [
+                """
+                    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                        message_content, username,
+                        content='messages', content_rowid='id',
+                        tokenize='unicode61 remove_diacritics 2'
+                    )
+                """,
+                """
+                    CREATE VIRTUAL TABLE IF NOT EXISTS responses_fts USING fts5(
+                        response_content,
+                        content='responses', content_rowid='id',
+                        tokenize='unicode61 remove_diacritics 2'
+                    )
+                """,
+                *self.FTS_TRIGGERS,
+                "INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')",
+                "INSERT INTO responses_fts (responses_fts) VALUES ('rebuild')",
+            ]),
+            (5, "hourly, daily and all-time analytics rollups", [
+                """
+                    CREATE TABLE IF NOT EXISTS message_rollups (
+                        period TEXT NOT NULL,
+                        bucket TEXT NOT NULL,
+                        scope TEXT NOT NULL,
+                        scope_id TEXT NOT NULL,
+                        label TEXT,
+                        message_count INTEGER NOT NULL DEFAULT 0,
+                        response_count INTEGER NOT NULL DEFAULT 0,
+                        processing_ms_sum INTEGER NOT NULL DEFAULT 0,
+                        processing_ms_count INTEGER NOT NULL DEFAULT 0,
+                        processing_ms_min INTEGER,
+                        processing_ms_max INTEGER,
+                        tokens_sum INTEGER NOT NULL DEFAULT 0,
+                        first_at DATETIME,
+                        last_at DATETIME,
+                        PRIMARY KEY (period, scope, scope_id, bucket)
+                    )
+                """,
+                "CREATE INDEX IF NOT EXISTS idx_rollups_top_messages ON message_rollups (scope, message_count) WHERE period = 'total'",
+                "CREATE INDEX IF NOT EXISTS idx_rollups_top_responses ON message_rollups (scope, response_count) WHERE period = 'total'",
+                self._backfill_rollups,
+            ]),
+            (6, "compact layout: integer snowflakes, epoch-millisecond timestamps, responses linked by rowid", [
+                self._compact_main,
+                "CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp)",
+                "CREATE INDEX IF NOT EXISTS idx_messages_user_ts ON messages (user_id, timestamp)",
+                "CREATE INDEX IF NOT EXISTS idx_messages_user_type_ts ON messages (user_id, message_type, timestamp)",
+                "CREATE INDEX IF NOT EXISTS idx_messages_channel_type_ts ON messages (channel_id, message_type, timestamp)",
+                "CREATE INDEX IF NOT EXISTS idx_responses_timestamp ON responses (timestamp)",
+                "CREATE INDEX IF NOT EXISTS idx_responses_message_chunk ON responses (message_rowid, chunk_number)",
+                "CREATE INDEX IF NOT EXISTS idx_user_settings_steam_id ON user_settings (steam_id, user_id)",
+                "CREATE INDEX IF NOT EXISTS idx_user_settings_nsfw ON user_settings (nsfw_mode, updated_at)",
+                *self.FTS_TRIGGERS,
+            ]),
+            (7, "per-row codec flag and trained dictionaries for compressed bodies", [
+                f"""
+                    CREATE TABLE IF NOT EXISTS compression_dictionaries (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        dictionary BLOB NOT NULL,
+                        sample_rows INTEGER NOT NULL,
+                        rows_compressed INTEGER NOT NULL DEFAULT 0,
+                        raw_bytes INTEGER NOT NULL DEFAULT 0,
+                        stored_bytes INTEGER NOT NULL DEFAULT 0,
+                        created_at INTEGER DEFAULT ({self.NOW_MS_SQL})
+                    )
+                """,
+                self._add_codec_main,
+                *self.FTS_CODEC_TRIGGERS,
+            ]),
+        ]
+
+    async def _migrate(self, db, target_version: Optional[int] = None):
+        """Bring the schema up to date (or up to target_version), one transaction per migration"""
+        cursor = await db.execute("PRAGMA user_version")
+        current_version = (await cursor.fetchone())[0]
+
+        for version, description, steps in self._migrations():
+            if version <= current_version or (target_version is not None and version > target_version):
+                continue
+
+            try:
+                await db.execute("BEGIN")
+                for step in steps:
+                    if callable(step):
+                        await step(db)
+                    else:
+                        await db.execute(step)
+                await db.execute(f"PRAGMA user_version = {version}")
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                print(f"❌ Database migration {version} ({description}) failed: {e}")
+                raise
+
+            print(f"🔄 Applied database migration {version}: {description}")
+
+    async def _add_missing_columns(self, db):
+        """Add columns that databases created by the old migrate_* scripts are missing"""
+        expected = {
+            'user_settings': [
+                ('steam_id', 'TEXT'),
+                ('steam_username', 'TEXT'),
+                ('steam_linked_at', 'DATETIME'),
+            ],
+            'guild_settings': [
+                ('bot_reply_enabled', 'BOOLEAN DEFAULT FALSE'),
+                ('reply_all_enabled', 'BOOLEAN DEFAULT FALSE'),
+            ],
+        }
+
+        for table, columns in expected.items():
+            cursor = await db.execute(f"PRAGMA table_info({table})")
+            existing = {row[1] for row in await cursor.fetchall()}
+            for column, definition in columns:
+                if column not in existing:
+                    await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    async def _compact_main(self, db):
+        await self._compact_tables(db, 'main', tuple(self.COMPACT_TABLES))
+
+    async def _compact_tables(self, db, schema: str, tables: tuple):
+        """Rebuild tables of one schema in the migration 6 layout.
+
+        Rows are copied with their ids, so full-text indexes stay valid, a
+        chunk at a time with the event loop given a turn in between. Rows whose
+        ids or timestamps cannot be converted are dropped and reported, and the
+        counters and rollups rebuilt without them. Runs inside the caller's transaction.
+        """
+        def or_null(pack):
+            def convert(value):
+                try:
+                    return pack(value)
+                except (TypeError, ValueError):
+                    return None
+            return convert
+
+        await db.create_function('pack_id', 1, or_null(self._pack_id), deterministic=True)
+        await db.create_function('pack_time', 1, or_null(self._pack_time), deterministic=True)
+
+        # Renaming tables fails while views refer to a table that is missing
+        await db.execute("DROP VIEW IF EXISTS temp.all_messages")
+        await db.execute("DROP VIEW IF EXISTS temp.all_responses")
+
+        dropped = {}
+        for table in tables:
+            definition, conversions = self.COMPACT_TABLES[table]
+            await db.execute(f"DROP TABLE IF EXISTS {schema}.{table}_v2")
+            await db.execute(definition.format(table=f"{schema}.{table}_v2", now=self.NOW_MS_SQL))
+            cursor = await db.execute(f"PRAGMA {schema}.table_info({table}_v2)")
+            columns = [row[1] for row in await cursor.fetchall()]
+            select = ", ".join(conversions.get(column, f"old.{column}").format(schema=schema) for column in columns)
+
+            last_id, copied = -1, 0
+            while True:
+                cursor = await db.execute(f"""
+                    SELECT MAX(id) FROM (SELECT id FROM {schema}.{table} WHERE id > ? ORDER BY id LIMIT ?)
+                """, (last_id, self.COMPACT_CHUNK_ROWS))
+                chunk_end = (await cursor.fetchone())[0]
+                if chunk_end is None:
+                    break
+                cursor = await db.execute(f"""
+                    INSERT OR IGNORE INTO {schema}.{table}_v2 ({', '.join(columns)})
+                    SELECT {select} FROM {schema}.{table} old
+                    WHERE old.id > ? AND old.id <= ?
+                """, (last_id, chunk_end))
+                copied += cursor.rowcount
+                last_id = chunk_end
+                await asyncio.sleep(0)
+
+            cursor = await db.execute(f"SELECT COUNT(*) FROM {schema}.{table}")
+            dropped[table] = (await cursor.fetchone())[0] - copied
+            if dropped[table]:
+                print(f"⚠️ Dropped {dropped[table]} rows from {schema}.{table} whose ids or timestamps could not be converted")
+
+        for table in tables:
+            await db.execute(f"DROP TABLE {schema}.{table}")
+            await db.execute(f"ALTER TABLE {schema}.{table}_v2 RENAME TO {table}")
+
+        for table in ('messages', 'responses'):
+            cursor = await db.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE name = ?", (f"{table}_fts",))
+            if dropped.get(table) and await cursor.fetchone():
+                await db.execute(f"INSERT INTO {schema}.{table}_fts ({table}_fts) VALUES ('rebuild')")
+
+        await self._create_views(db)
+
+        # Counters and rollups were built by earlier migrations from the rows just dropped
+        if any(dropped.values()):
+            await self._rebuild_counters(db)
+            await self._rebuild_rollups(db)
+
+    async def _add_codec_main(self, db):
+        await self._add_content_codec(db, 'main')
+
+    async def _add_content_codec(self, db, schema: str):
+        """Add the content_codec column to one schema's messages and responses and drop
+        the full-text triggers that predate it, so the codec-aware ones replace them"""
+        for table in ('messages', 'responses'):
+            cursor = await db.execute(f"PRAGMA {schema}.table_info({table})")
+            if 'content_codec' not in {row[1] for row in await cursor.fetchall()}:
+                await db.execute(f"ALTER TABLE {schema}.{table} ADD COLUMN content_codec INTEGER NOT NULL DEFAULT 0")
+            for action in ('insert', 'delete', 'update'):
+                await db.execute(f"DROP TRIGGER IF EXISTS {schema}.{table}_fts_{action}")
+
+    async def _upgrade_partition(self, db, schema: str):
+        """Bring a partition written by an older version up to the current message layout"""
+        cursor = await db.execute(f"PRAGMA {schema}.user_version")
+        version = (await cursor.fetchone())[0]
+        if version >= 7:
+            return
 
-            
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS channel_settings (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    channel_id TEXT NOT NULL UNIQUE,
-                    guild_id TEXT NOT NULL,
-                    reply_all_enabled BOOLEAN DEFAULT FALSE,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+        cursor = await db.execute(f"SELECT COUNT(*) FROM {schema}.sqlite_master WHERE name IN ('messages', 'responses')")
+        if (await cursor.fetchone())[0] < 2:
+            await db.execute(f"PRAGMA {schema}.user_version = 7")
+            return
 
-            
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS user_summaries (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id TEXT NOT NULL UNIQUE,
-                    summary_text TEXT NOT NULL,
-                    message_count_at_update INTEGER NOT NULL,
-                    last_updated DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+        try:
+            await db.execute("BEGIN")
+            if version < 6:
+                await self._compact_tables(db, schema, ('messages', 'responses'))
+            await self._add_content_codec(db, schema)
+            await db.execute(f"PRAGMA {schema}.user_version = 7")
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            print(f"❌ Upgrading message partition {schema} failed: {e}")
+            raise
 
-            
-            await db.execute("CREATE INDEX IF NOT EXISTS idx_messages_user_id ON messages (user_id)")
-            await db.execute("CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp)")
-            await db.execute("CREATE INDEX IF NOT EXISTS idx_responses_original_message ON responses (original_message_id)")
-            await db.execute("CREATE INDEX IF NOT EXISTS idx_responses_timestamp ON responses (timestamp)")
-            await db.execute("CREATE INDEX IF NOT EXISTS idx_user_settings_user_id ON user_settings (user_id)")
+        print(f"🔄 Upgraded message partition {schema} to the current layout")
+
+    @staticmethod
+    def _pack_id(value) -> Optional[int]:
+        """Convert a Discord snowflake to the INTEGER it is stored as.
 
+        The slash_<interaction id> message ids logged for slash commands are
+        stored as the negated interaction id.
+        """
+        if value is None or isinstance(value, int):
+            return value
+        value = str(value)
+        packed = -int(value[6:]) if value.startswith('slash_') else int(value)
+        if not -2 ** 63 <= packed < 2 ** 63:
+            raise ValueError(f"Snowflake out of range: {value}")
+        return packed
+
+    @staticmethod
+    def _unpack_id(value) -> Optional[str]:
+        """Convert a stored snowflake back to the string callers use"""
+        if value is None or isinstance(value, str):
+            return value
+        return f"slash_{-value}" if value < 0 else str(value)
+
+    @classmethod
+    def _pack_time(cls, value) -> Optional[int]:
+        """Convert a datetime or ISO string to epoch milliseconds; naive values are UTC"""
+        if value is None or isinstance(value, int):
+            return value
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return (value - cls.EPOCH) // timedelta(milliseconds=1)
+
+    @classmethod
+    def _unpack_time(cls, value) -> Optional[str]:
+        """Convert stored epoch milliseconds back to a 'YYYY-MM-DD HH:MM:SS.fff' UTC string"""
+        if value is None or isinstance(value, str):
+            return value
+        return (cls.EPOCH + timedelta(milliseconds=value)).isoformat(sep=' ', timespec='milliseconds')
+
+    def _row_dict(self, row) -> dict:
+        """Convert a row to a dict with snowflakes and timestamps in their string forms
+        and, for rows selected with their content_codec, the body as text"""
+        row = dict(row)
+        for column in self.ID_COLUMNS:
+            if column in row:
+                row[column] = self._unpack_id(row[column])
+        for column in self.TIME_COLUMNS:
+            if column in row:
+                row[column] = self._unpack_time(row[column])
+        if 'content_codec' in row:
+            codec = row.pop('content_codec')
+            for column in ('message_content', 'response_content'):
+                if column in row:
+                    row[column] = self._codec.decompress(codec, row[column])
+        return row
+
+    def _partition_key(self, timestamp) -> str:
+        """Get the partition key (YYYY-MM of the partition's first month) for a timestamp"""
+        moment = self.EPOCH + timedelta(milliseconds=self._pack_time(timestamp))
+        index = moment.year * 12 + moment.month - 1
+        index -= index % self.partition_months
+        return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+    def _partition_end(self, key: str) -> datetime:
+        """Get the first moment after a partition's last month"""
+        index = int(key[:4]) * 12 + int(key[5:7]) - 1 + self.partition_months
+        return datetime(index // 12, index % 12 + 1, 1)
+
+    def _partition_path(self, key: str) -> str:
+        return f"{self._partition_root}.{key}.db"
+
+    @staticmethod
+    def _partition_schema(key: str) -> str:
+        return "p_" + key.replace("-", "_")
+
+    def _schemas_newest_first(self) -> List[str]:
+        """Schemas holding messages, newest partition first and the main file last"""
+        return [self._partition_schema(key) for key in reversed(self._partitions)] + [self.MAIN_SCHEMA]
+
+    def _discover_partitions(self):
+        """Find existing partition files next to the main database"""
+        if not self.partition_months:
+            return
+
+        pattern = f"{glob.escape(self._partition_root)}.[0-9][0-9][0-9][0-9]-[0-9][0-9].db"
+        prefix = len(self._partition_root) + 1
+        self._known_partitions = sorted(path[prefix:prefix + 7] for path in glob.glob(pattern))
+        self._partitions = tuple(self._known_partitions[-self.MAX_ATTACHED_PARTITIONS:])
+
+        skipped = self._known_partitions[:-self.MAX_ATTACHED_PARTITIONS]
+        if skipped:
+            print(f"⚠️ Only the newest {self.MAX_ATTACHED_PARTITIONS} message partitions are attached, ignoring: {', '.join(skipped)}")
+
+    async def _sync_partitions(self, db):
+        """Attach/detach partitions on a connection and rebuild its all_messages/all_responses views"""
+        current = self._attached.get(id(db))
+        if current == self._partitions:
+            return
+        current = current or ()
+
+        for key in current:
+            if key not in self._partitions:
+                await db.execute(f"DETACH DATABASE {self._partition_schema(key)}")
+
+        for key in self._partitions:
+            if key not in current:
+                schema = self._partition_schema(key)
+                path = self._partition_path(key)
+                if id(db) in self._read_only_connections:
+                    path = self._read_only_uri(path)
+                await db.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+                await db.execute(f"PRAGMA {schema}.synchronous = {self.PRAGMAS['synchronous']}")
+
+        await self._create_views(db)
+        self._attached[id(db)] = self._partitions
+
+    async def _create_views(self, db):
+        """(Re)create the all_messages/all_responses views over main and the attached partitions"""
+        read_only = id(db) in self._read_only_connections
+        if read_only:
+            # query_only covers the temp schema too; the files themselves stay mode=ro
+            await db.execute("PRAGMA query_only = OFF")
+        await db.execute("DROP VIEW IF EXISTS temp.all_messages")
+        await db.execute("DROP VIEW IF EXISTS temp.all_responses")
+
+        schemas = ['main'] + [self._partition_schema(key) for key in self._partitions]
+        await db.execute("CREATE TEMP VIEW all_messages AS " + " UNION ALL ".join(
+            f"SELECT {self.MESSAGE_COLUMNS} FROM {schema}.messages" for schema in schemas
+        ))
+        await db.execute("CREATE TEMP VIEW all_responses AS " + " UNION ALL ".join(
+            f"SELECT {self.RESPONSE_COLUMNS} FROM {schema}.responses" for schema in schemas
+        ))
+        if read_only:
+            await db.execute("PRAGMA query_only = ON")
+
+    async def _ensure_partition(self, db, timestamp) -> str:
+        """Get the schema a row with this timestamp belongs in, creating its partition if needed.
+
+        Must run on the writer before the batch's first INSERT, since attaching
+        and creating tables happens outside the batch transaction.
+        """
+        if not self.partition_months:
+            return self.MAIN_SCHEMA
+
+        key = self._partition_key(timestamp)
+        if key in self._partitions:
+            return self._partition_schema(key)
+
+        if len(self._partitions) >= self.MAX_ATTACHED_PARTITIONS and key < self._partitions[0]:
+            return self.MAIN_SCHEMA
+
+        if key not in self._known_partitions:
+            self._known_partitions = sorted(self._known_partitions + [key])
+        self._partitions = tuple(self._known_partitions[-self.MAX_ATTACHED_PARTITIONS:])
+        await self._sync_partitions(db)
+
+        schema = self._partition_schema(key)
+        await db.execute(f"PRAGMA {schema}.auto_vacuum = INCREMENTAL")
+        await db.execute(f"PRAGMA {schema}.journal_mode = {self.PRAGMAS['journal_mode']}")
+        await self._upgrade_partition(db, schema)
+        await self._mirror_schema(db, schema)
+
+        print(f"🗂️ Created message partition {key}")
+        return schema
+
+    async def _mirror_schema(self, db, schema: str):
+        """Create any messages/responses tables, indexes, full-text tables and triggers
+        that main has but a partition is missing, backfilling new full-text indexes"""
+        cursor = await db.execute(f"SELECT name FROM {schema}.sqlite_master")
+        existing = {row[0] for row in await cursor.fetchall()}
+
+        cursor = await db.execute("""
+            SELECT name, sql FROM main.sqlite_master
+            WHERE tbl_name IN ('messages', 'responses', 'messages_fts', 'responses_fts') AND sql IS NOT NULL
+            ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END
+        """)
+        rebuild = []
+        for name, sql in await cursor.fetchall():
+            if name in existing:
+                continue
+            sql = re.sub(r"^CREATE (UNIQUE |VIRTUAL )?(TABLE|INDEX|TRIGGER) \S+",
+                         rf"CREATE \1\2 IF NOT EXISTS {schema}.{name}", sql.strip(), count=1)
+            await db.execute(sql)
+            if sql.startswith('CREATE VIRTUAL TABLE'):
+                rebuild.append(name)
+
+        for name in rebuild:
+            await db.execute(f"INSERT INTO {schema}.{name} ({name}) VALUES ('rebuild')")
+        await db.commit()
+
+    async def _drop_partition(self, db, key: str) -> tuple:
+        """Detach a partition everywhere and delete its file, returning (messages, responses) removed"""
+        schema = self._partition_schema(key)
+        if key in self._partitions:
+            deltas, messages, responses = await self._collect_counter_deltas(db, schema, sign=-1)
+            await self._apply_counter_deltas(db, deltas)
             await db.commit()
-        
-        self.initialized = True
-        print("✅ Message database initialized successfully")
+        else:
+            messages, responses = 0, 0
+            print(f"⚠️ Deleting unattached message partition {key}; run rebuild_counters to resync the counters")
+
+        self._known_partitions = [known for known in self._known_partitions if known != key]
+        self._partitions = tuple(self._known_partitions[-self.MAX_ATTACHED_PARTITIONS:])
+
+        await self._sync_partitions(db)
+        for _ in range(len(self._reader_connections)):
+            reader = await self._readers.get()
+            try:
+                await self._sync_partitions(reader)
+            finally:
+                self._readers.put_nowait(reader)
+
+        # Snapshots in use keep reading the old file until returned and are resynced on their next borrow
+        for _ in range(self._snapshots.qsize()):
+            snapshot = self._snapshots.get_nowait()
+            try:
+                await self._sync_partitions(snapshot)
+            finally:
+                self._snapshots.put_nowait(snapshot)
+
+        path = self._partition_path(key)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+        return messages, responses
+
+    async def _newest_first(self, db, query: str, params: tuple, limit: int) -> list:
+        """Run a per-schema ORDER BY timestamp DESC LIMIT query across partitions, newest first,
+        stopping as soon as enough rows have been collected"""
+        rows = []
+        for schema in self._schemas_newest_first():
+            cursor = await db.execute(query.format(schema=schema), params + (limit - len(rows),))
+            rows.extend(await cursor.fetchall())
+            if len(rows) >= limit:
+                break
+        return rows
+
+    async def close(self):
+        """Close the pooled connections, waiting for in-flight queries to finish"""
+        if not self.initialized:
+            return
+
+        await self._stop_flusher()
+
+        async with self._write_lock:
+            for _ in range(len(self._reader_connections)):
+                await self._readers.get()
+            for _ in range(len(self._snapshot_connections)):
+                await self._snapshots.get()
+
+            self.initialized = False
+
+            for reader in self._reader_connections + self._snapshot_connections:
+                self._read_only_connections.discard(id(reader))
+                await reader.close()
+            self._reader_connections = []
+            self._readers = None
+            self._snapshot_connections = []
+            self._snapshots = None
+
+            try:
+                await self._writer.execute("PRAGMA optimize")
+            except Exception as e:
+                print(f"❌ Error optimizing database before close: {e}")
+            await self._writer.close()
+            self._writer = None
+            self._attached = {}
+
+        print("✅ Message database closed")
+
+    async def _enqueue_write(self, kind: str, params: tuple, wait: bool) -> bool:
+        """Queue a row for the background writer, blocking while the queue is full"""
+        if not self.initialized:
+            await self.initialize()
+
+        future = asyncio.get_running_loop().create_future() if wait else None
+        await self._write_queue.put((kind, params, future))
+
+        if future is None:
+            return True
+        return await future
+
+    async def _flush_loop(self):
+        """Collect queued rows and write them in batches until a stop marker arrives"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self._write_queue.get()
+            if item is None:
+                self._write_queue.task_done()
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.write_flush_interval
+            while len(batch) < self.write_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._write_queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    self._write_queue.task_done()
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                await self._flush_batch(batch)
+            except Exception as e:
+                # _flush_batch has already released the batch; keep the writer running
+                print(f"❌ Unexpected error in database write loop: {e}")
+
+        leftover = []
+        while not self._write_queue.empty():
+            item = self._write_queue.get_nowait()
+            if item is None:
+                self._write_queue.task_done()
+            else:
+                leftover.append(item)
+        for start in range(0, len(leftover), self.write_batch_size):
+            try:
+                await self._flush_batch(leftover[start:start + self.write_batch_size])
+            except Exception as e:
+                print(f"❌ Unexpected error in database write loop: {e}")
+
+    async def _flush_batch(self, batch: List[tuple]):
+        """Write a batch of queued rows, in a single transaction unless one of them fails"""
+        started = time.perf_counter()
+        written = []
+        try:
+            written, owners = await self._write_items(batch)
+
+            # The rows are committed, so a cache failure must not fail the writes
+            try:
+                for kind, row, _ in written:
+                    if kind == 'message' and row[9] == 'user':
+                        self._conversation_cache.add_message(row[0], row[3], self._conversation_turn(
+                            row[7], row[8], row[12], row[10], row[11]
+                        ))
+                    elif kind == 'response':
+                        owner = owners.get(row[0])
+                        if owner:
+                            self._conversation_cache.add_response(owner[0], owner[2], row[0], row[1], {
+                                'chunk_number': row[4], 'content': row[2], 'timestamp': self._unpack_time(row[8]),
+                                'model_used': row[6]
+                            })
+            except Exception as e:
+                print(f"⚠️ Error updating conversation cache after a flush, clearing it: {e}")
+                self._conversation_cache.clear()
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            stats = self._write_stats
+            stats['batches_flushed'] += 1
+            stats['rows_flushed'] += len(written)
+            stats['rows_failed'] += len(batch) - len(written)
+            stats['total_flush_ms'] += elapsed_ms
+            stats['last_flush_ms'] = elapsed_ms
+            stats['max_flush_ms'] = max(stats['max_flush_ms'], elapsed_ms)
+        finally:
+            # Waiters and flush() must always be released, whatever happened above
+            written_ids = {id(item) for item in written}
+            for item in batch:
+                future = item[2]
+                if future is not None and not future.done():
+                    future.set_result(id(item) in written_ids)
+                self._write_queue.task_done()
+
+    async def _write_items(self, items: List[tuple]) -> tuple:
+        """Write queued items in one transaction. If that fails for any reason but
+        contention, write each half on its own, so only the rows that fail alone are lost.
+
+        Returns (the items written, the owner of each of their message ids).
+        """
+        message_rows = [params for kind, params, _ in items if kind == 'message']
+        response_rows = [params for kind, params, _ in items if kind == 'response']
+        try:
+            owners = await self._with_retry('write_batch', lambda: self._write_rows(message_rows, response_rows))
+            return items, owners
+        except Exception as e:
+            if len(items) == 1 or self._is_contention(e):
+                print(f"❌ Error flushing {len(items)} queued database writes: {e}")
+                return [], {}
+
+        middle = len(items) // 2
+        first, first_owners = await self._write_items(items[:middle])
+        second, second_owners = await self._write_items(items[middle:])
+        return first + second, {**first_owners, **second_owners}
+
+    async def _write_rows(self, message_rows: List[tuple], response_rows: List[tuple]) -> dict:
+        """Store message and response rows in queue form in one transaction, keeping
+        counters, rollups and compression totals in step.
+
+        Returns the (user, guild, channel, timestamp) owner of each message id involved.
+        """
+        async with self._write_connection() as db:
+            deltas = {}
+
+            # Responses live in their original message's partition so retention drops them together
+            owners = {row[7]: (row[0], row[5], row[3], row[12]) for row in message_rows}
+            missing = {row[0] for row in response_rows} - owners.keys()
+            for row in await self._select_in(
+                db,
+                "SELECT message_id, user_id, guild_id, channel_id, timestamp FROM all_messages WHERE message_id IN ({})",
+                missing
+            ):
+                owners[row[0]] = (row[1], row[2], row[3], row[4])
+
+            messages_by_schema = {}
+            for row in message_rows:
+                schema = await self._ensure_partition(db, row[12])
+                messages_by_schema.setdefault(schema, []).append(row)
+
+            responses_by_schema = {}
+            for row in response_rows:
+                owner = owners.get(row[0])
+                schema = await self._ensure_partition(db, owner[3] if owner else row[8])
+                responses_by_schema.setdefault(schema, []).append(row)
+
+            rollups = {}
+            compressed = {}
+            for schema, rows in messages_by_schema.items():
+                new_messages = await self._new_rows(db, f"{schema}.messages", 'message_id', rows, 7)
+                await db.executemany(self.INSERT_MESSAGE_SQL.format(schema=schema),
+                                     [self._stored_row(row, 8, compressed) for row in rows])
+                for row in new_messages:
+                    self._add_counter_delta(deltas, (row[0], row[5], row[3]), messages=1)
+                    keys = [('global', '', None), ('user', str(row[0]), row[1]), ('channel', str(row[3]), row[4])]
+                    if row[5]:
+                        keys.append(('guild', str(row[5]), row[6]))
+                    self._add_rollup(rollups, row[12], keys, messages=1)
+
+            for schema, rows in responses_by_schema.items():
+                new_responses = await self._new_rows(db, f"{schema}.responses", 'response_message_id', rows, 1)
+                await db.executemany(self.INSERT_RESPONSE_SQL.format(schema=schema),
+                                     [self._stored_row(row, 2, compressed) for row in rows])
+                for row in new_responses:
+                    owner = owners.get(row[0])
+                    self._add_counter_delta(deltas, owner[:3] if owner else None, responses=1)
+                    keys = [('global', '', None)]
+                    if owner:
+                        keys += [('user', str(owner[0]), None), ('channel', str(owner[2]), None)]
+                        if owner[1]:
+                            keys.append(('guild', str(owner[1]), None))
+                    if row[6]:
+                        keys.append(('model', row[6], row[6]))
+                    self._add_rollup(rollups, row[8], keys, responses=1, processing_ms=row[5], tokens=row[7])
+
+            await self._apply_counter_deltas(db, deltas)
+            await self._apply_rollups(db, rollups)
+            await self._record_compression(db, compressed)
+            await db.commit()
+        return owners
+
+    def _stored_row(self, row: tuple, index: int, compressed: dict) -> tuple:
+        """Get a queued row as it is written: its body at index compressed when compression
+        is on and worthwhile, and its content_codec appended"""
+        codec, content = ContentCodec.PLAIN, row[index]
+        if self.compress_content:
+            codec, content = self._compress_body(content, compressed)
+        return row[:index] + (content,) + row[index + 1:] + (codec,)
+
+    def _compress_body(self, content: str, compressed: dict) -> tuple:
+        """Get the (codec, value) to store for a body, adding it to the totals in compressed"""
+        codec, stored = self._codec.compress(content)
+        if codec != ContentCodec.PLAIN:
+            totals = compressed.setdefault(codec, [0, 0, 0])
+            totals[0] += 1
+            totals[1] += len(content.encode('utf-8'))
+            totals[2] += len(stored)
+        return codec, stored
+
+    async def _record_compression(self, db, compressed: dict):
+        """Add per-dictionary (rows, raw bytes, stored bytes) totals to compression_dictionaries"""
+        if compressed:
+            await db.executemany("""
+                UPDATE compression_dictionaries
+                SET rows_compressed = rows_compressed + ?, raw_bytes = raw_bytes + ?, stored_bytes = stored_bytes + ?
+                WHERE id = ?
+            """, [(rows, raw, stored, codec) for codec, (rows, raw, stored) in compressed.items()])
+
+    async def _select_in(self, db, query: str, values) -> list:
+        """Run a query with an IN (...) list, chunked to stay under SQLite's variable limit"""
+        values = list(values)
+        rows = []
+        for start in range(0, len(values), 500):
+            chunk = values[start:start + 500]
+            cursor = await db.execute(query.format(', '.join('?' * len(chunk))), chunk)
+            rows.extend(await cursor.fetchall())
+        return rows
+
+    async def _new_rows(self, db, table: str, key_column: str, rows: List[tuple], key_index: int) -> List[tuple]:
+        """Return the rows of a batch whose key is not already stored, keeping the last row for repeated keys"""
+        by_key = {row[key_index]: row for row in rows}
+
+        existing = await self._select_in(
+            db, f"SELECT {key_column} FROM {table} WHERE {key_column} IN ({{}})", by_key.keys()
+        )
+        for row in existing:
+            by_key.pop(row[0], None)
+        return list(by_key.values())
+
+    @staticmethod
+    def _add_counter_delta(deltas: dict, owner: Optional[tuple], messages: int = 0, responses: int = 0):
+        """Add a change to the global counter and, when the owning message is known, its user/guild/channel counters"""
+        keys = [('global', '')]
+        if owner:
+            user_id, guild_id, channel_id = owner
+            keys.append(('user', str(user_id)))
+            keys.append(('channel', str(channel_id)))
+            if guild_id:
+                keys.append(('guild', str(guild_id)))
+
+        for key in keys:
+            delta = deltas.setdefault(key, [0, 0])
+            delta[0] += messages
+            delta[1] += responses
+
+    async def _apply_counter_deltas(self, db, deltas: dict):
+        """Apply accumulated counter changes, keeping the global unique user count in step"""
+        if not deltas:
+            return
+
+        active_users_query = """
+            SELECT scope_id FROM message_counters
+            WHERE scope = 'user' AND message_count > 0 AND scope_id IN ({})
+        """
+        user_ids = [scope_id for scope, scope_id in deltas if scope == 'user']
+        active_before = {row[0] for row in await self._select_in(db, active_users_query, user_ids)}
+
+        await db.executemany(self.UPSERT_COUNTER_SQL, [
+            (scope, scope_id, messages, responses, 0)
+            for (scope, scope_id), (messages, responses) in deltas.items()
+            if scope != 'global'
+        ])
+
+        active_after = {row[0] for row in await self._select_in(db, active_users_query, user_ids)}
+        messages, responses = deltas.get(('global', ''), (0, 0))
+        user_delta = len(active_after - active_before) - len(active_before - active_after)
+        await db.execute(self.UPSERT_COUNTER_SQL, ('global', '', messages, responses, user_delta))
+
+    async def _collect_counter_deltas(self, db, schema: str, condition: str = "", params: tuple = (),
+                                      sign: int = 1) -> tuple:
+        """Count the rows in one schema (optionally only messages matching a condition on m) as counter deltas.
+
+        Returns (deltas, messages, responses). Without a condition, responses whose
+        original message is not in the same schema count towards the global total only.
+        """
+        where = f"WHERE {condition}" if condition else ""
+        deltas = {}
+        messages = responses = 0
+
+        link = await self._response_link(db, schema)
+
+        cursor = await db.execute(f"""
+            SELECT m.user_id, m.guild_id, m.channel_id, COUNT(*)
+            FROM {schema}.messages m
+            {where}
+            GROUP BY m.user_id, m.guild_id, m.channel_id
+        """, params)
+        for row in await cursor.fetchall():
+            self._add_counter_delta(deltas, (row[0], row[1], row[2]), messages=sign * row[3])
+            messages += row[3]
+
+        cursor = await db.execute(f"""
+            SELECT m.user_id, m.guild_id, m.channel_id, COUNT(*)
+            FROM {schema}.responses r
+            JOIN {schema}.messages m ON {link}
+            {where}
+            GROUP BY m.user_id, m.guild_id, m.channel_id
+        """, params)
+        for row in await cursor.fetchall():
+            self._add_counter_delta(deltas, (row[0], row[1], row[2]), responses=sign * row[3])
+            responses += row[3]
+
+        if not condition:
+            cursor = await db.execute(f"SELECT COUNT(*) FROM {schema}.responses")
+            orphans = (await cursor.fetchone())[0] - responses
+            if orphans:
+                self._add_counter_delta(deltas, None, responses=sign * orphans)
+                responses += orphans
+
+        return deltas, messages, responses
+
+    async def _response_link(self, db, schema: str) -> str:
+        """Get the join condition from responses r to their messages m in a schema"""
+        # Migration 1 rebuilds the counters before migration 6 adds message_rowid
+        cursor = await db.execute(f"PRAGMA {schema}.table_info(responses)")
+        if 'message_rowid' in {row[1] for row in await cursor.fetchall()}:
+            return "m.id = r.message_rowid"
+        return "m.message_id = r.original_message_id"
+
+    async def _rebuild_counters(self, db):
+        """Recompute every counter from the messages and responses in every schema"""
+        await db.execute("DELETE FROM message_counters")
+        await db.execute(self.UPSERT_COUNTER_SQL, ('global', '', 0, 0, 0))
+
+        for schema in self._schemas_newest_first():
+            deltas, _, _ = await self._collect_counter_deltas(db, schema)
+            await self._apply_counter_deltas(db, deltas)
+
+    @classmethod
+    def _add_rollup(cls, rollups: dict, timestamp, keys: List[tuple], messages: int = 0, responses: int = 0,
+                    processing_ms: Optional[int] = None, tokens: Optional[int] = None):
+        """Add one logged row to the hourly, daily and all-time rollups of each (scope, scope_id, label) key"""
+        timestamp = cls._unpack_time(timestamp)
+        buckets = [('hour', timestamp[:13] + ':00'), ('day', timestamp[:10]), ('total', '')]
+
+        for period, bucket in buckets:
+            for scope, scope_id, label in keys:
+                rollup = rollups.get((period, bucket, scope, scope_id))
+                if rollup is None:
+                    rollup = rollups[(period, bucket, scope, scope_id)] = [
+                        label, 0, 0, 0, 0, None, None, 0, timestamp, timestamp
+                    ]
+                rollup[0] = label if label is not None else rollup[0]
+                rollup[1] += messages
+                rollup[2] += responses
+                if processing_ms is not None:
+                    rollup[3] += processing_ms
+                    rollup[4] += 1
+                    rollup[5] = processing_ms if rollup[5] is None else min(rollup[5], processing_ms)
+                    rollup[6] = processing_ms if rollup[6] is None else max(rollup[6], processing_ms)
+                rollup[7] += tokens or 0
+                rollup[8] = min(rollup[8], timestamp)
+                rollup[9] = max(rollup[9], timestamp)
+
+    async def _apply_rollups(self, db, rollups: dict):
+        """Merge accumulated rollup rows into message_rollups"""
+        if not rollups:
+            return
+
+        await db.executemany(
+            self.UPSERT_ROLLUP_SQL.format(source="VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"),
+            [key + tuple(rollup) for key, rollup in rollups.items()]
+        )
+
+    async def _backfill_rollups(self, db):
+        """Aggregate the messages and responses already stored into message_rollups"""
+        message_scopes = [
+            ("'global'", "''", "NULL", "1"),
+            ("'user'", "m.user_id", "MAX(m.username)", "1"),
+            ("'channel'", "m.channel_id", "MAX(m.channel_name)", "1"),
+            ("'guild'", "m.guild_id", "MAX(m.guild_name)", "m.guild_id IS NOT NULL"),
+        ]
+        response_scopes = message_scopes[:1] + [
+            (scope, scope_id, "NULL", f"{scope_id} IS NOT NULL") for scope, scope_id, _, _ in message_scopes[1:]
+        ] + [
+            ("'model'", "r.model_used", "MAX(r.model_used)", "r.model_used IS NOT NULL"),
+        ]
+
+        # Runs against the text timestamps of migration 5 as well as the compact layout
+        def as_text(column: str) -> str:
+            return self.TIME_TEXT_SQL.format(column=column)
+
+        for schema in self._schemas_newest_first():
+            for period, bucket in self.ROLLUP_PERIODS.items():
+                for scope, scope_id, label, condition in message_scopes:
+                    await db.execute(self.UPSERT_ROLLUP_SQL.format(source=f"""
+                        SELECT '{period}', {bucket.format(column=as_text('m.timestamp'))}, {scope}, {scope_id}, {label},
+                               COUNT(*), 0, 0, 0, NULL, NULL, 0,
+                               {as_text('MIN(m.timestamp)')}, {as_text('MAX(m.timestamp)')}
+                        FROM {schema}.messages m
+                        WHERE {condition}
+                        GROUP BY 2, 4
+                    """))
+
+                for scope, scope_id, label, condition in response_scopes:
+                    await db.execute(self.UPSERT_ROLLUP_SQL.format(source=f"""
+                        SELECT '{period}', {bucket.format(column=as_text('r.timestamp'))}, {scope}, {scope_id}, {label},
+                               0, COUNT(*), COALESCE(SUM(r.processing_time_ms), 0), COUNT(r.processing_time_ms),
+                               MIN(r.processing_time_ms), MAX(r.processing_time_ms), COALESCE(SUM(r.tokens_used), 0),
+                               {as_text('MIN(r.timestamp)')}, {as_text('MAX(r.timestamp)')}
+                        FROM {schema}.responses r
+                        LEFT JOIN {schema}.messages m ON r.original_message_id = m.message_id
+                        WHERE {condition}
+                        GROUP BY 2, 4
+                    """))
+
+    async def _rebuild_rollups(self, db):
+        """Recompute every rollup from the messages and responses in every schema"""
+        await db.execute("DELETE FROM message_rollups")
+        await self._backfill_rollups(db)
+
+    async def _stop_flusher(self):
+        """Drain the write queue and stop the background writer"""
+        if self._flush_task is None:
+            return
+
+        if not self._flush_task.done():
+            await self._write_queue.put(None)
+            await self._flush_task
+        self._flush_task = None
+
+    async def flush(self):
+        """Wait until every queued write has been committed"""
+        if self._write_queue is not None:
+            await self._write_queue.join()
+
+    def get_write_queue_stats(self) -> Dict[str, Any]:
+        """Get queue depth and flush latency for the background writer"""
+        stats = self._write_stats
+        batches = stats['batches_flushed']
+        rows = stats['rows_flushed'] + stats['rows_failed']
+        return {
+            'queue_depth': self._write_queue.qsize() if self._write_queue is not None else 0,
+            'queue_capacity': self.write_queue_size,
+            'rows_flushed': stats['rows_flushed'],
+            'rows_failed': stats['rows_failed'],
+            'batches_flushed': batches,
+            'avg_batch_size': rows / batches if batches else 0.0,
+            'last_flush_ms': stats['last_flush_ms'],
+            'avg_flush_ms': stats['total_flush_ms'] / batches if batches else 0.0,
+            'max_flush_ms': stats['max_flush_ms'],
+        }
     
+    def get_contention_stats(self) -> Dict[str, Any]:
+        """Get write lock waits and, per method, busy retries and writes dropped after the retry deadline"""
+        lock = self._write_lock_stats
+        methods = {method: dict(stats) for method, stats in self._contention_stats.items()}
+        return {
+            'retries': sum(stats['retries'] for stats in methods.values()),
+            'drops': sum(stats['drops'] for stats in methods.values()),
+            'methods': methods,
+            'write_lock_acquisitions': lock['acquisitions'],
+            'write_lock_contended': lock['contended'],
+            'avg_write_lock_wait_ms': lock['total_wait_ms'] / lock['acquisitions'] if lock['acquisitions'] else 0.0,
+            'max_write_lock_wait_ms': lock['max_wait_ms'],
+        }
+
+    def get_conversation_cache_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and memory use for the in-memory conversation buffers"""
+        return self._conversation_cache.stats()
+
+    def get_settings_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get hit/miss counters for the user, guild and channel settings caches"""
+        return {
+            'user': self._user_settings_cache.stats(),
+            'guild': self._guild_settings_cache.stats(),
+            'channel': self._channel_settings_cache.stats(),
+        }
+
+    def get_snapshot_stats(self) -> Dict[str, Any]:
+        """Get how long the read-only snapshot connections have been held"""
+        stats = self._snapshot_stats
+        now = time.perf_counter()
+        return {
+            'pool_size': self.snapshot_pool_size,
+            'in_use': len(self._open_snapshots),
+            'snapshots': stats['snapshots'],
+            'long_snapshots': stats['long_snapshots'],
+            'avg_hold_ms': stats['total_hold_ms'] / stats['snapshots'] if stats['snapshots'] else 0.0,
+            'last_hold_ms': stats['last_hold_ms'],
+            'max_hold_ms': stats['max_hold_ms'],
+            'longest_open_ms': max(((now - started) * 1000 for started in self._open_snapshots.values()), default=0.0),
+        }
+
+    def _query_plan_probes(self, probe_id: str) -> List[tuple]:
+        """(method name, method, args) calls whose SQL check_query_plans inspects"""
+        return [
+            ('get_user_message_history', self.get_user_message_history, (probe_id,)),
+            ('get_user_message_page', self.get_user_message_page, (probe_id, 10, self._encode_cursor(0, 0))),
+            ('get_conversation_context', self.get_conversation_context, (probe_id,)),
+            ('get_conversation_context', self.get_conversation_context, (probe_id, 10, probe_id)),
+            ('search_messages', self.search_messages, (probe_id, 'messages', probe_id)),
+            ('search_messages', self.search_messages, (probe_id, 'responses')),
+            ('get_message_counters', self.get_message_counters, ('user', probe_id)),
+            ('get_rollups', self.get_rollups, ('user', probe_id, 'hour', probe_id)),
+            ('get_top_rollups', self.get_top_rollups, ('user',)),
+            ('get_top_rollups', self.get_top_rollups, ('model', 10, 'response_count')),
+            ('get_user_settings', self.get_user_settings, (probe_id,)),
+            ('get_guild_settings', self.get_guild_settings, (probe_id,)),
+            ('get_channel_settings', self.get_channel_settings, (probe_id, probe_id)),
+            ('get_channel_messages', self.get_channel_messages, (probe_id,)),
+            ('get_users_with_nsfw_enabled', self.get_users_with_nsfw_enabled, ()),
+            ('validate_steam_id_link', self.validate_steam_id_link, ('76561197960265728', probe_id)),
+            ('get_user_summary', self.get_user_summary, (probe_id,)),
+            ('get_recent_user_messages_for_summary', self.get_recent_user_messages_for_summary, (probe_id,)),
+        ]
+
+    async def check_query_plans(self) -> Dict[str, List[str]]:
+        """Run each read method, EXPLAIN QUERY PLAN the SQL it issued, and report full scans.
+
+        A SCAN walks a whole table or index even when it does so in index order,
+        so only SEARCH steps and full-text MATCH lookups pass. A temp B-tree
+        means every matching row is read and sorted before LIMIT applies, so
+        those are reported too. Returns a mapping of method name to offending
+        plan lines; an empty dict means every query is served by an index lookup.
+        """
+        if not self.initialized:
+            await self.initialize()
+
+        probe_id = '0'
+        probes = self._query_plan_probes(probe_id)
+
+        traced = []
+        current = [None]
+
+        def trace(statement: str):
+            # FTS5 reads its own shadow tables through the same connection
+            if re.search(r"_fts_(config|data|idx|docsize|content)\b", statement):
+                return
+            if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                traced.append((current[0], statement))
+
+        for cache in (self._user_settings_cache, self._guild_settings_cache, self._channel_settings_cache):
+            cache.invalidate(probe_id)
+        self._conversation_cache.invalidate(self._pack_id(probe_id))
+
+        for reader in self._reader_connections + self._snapshot_connections:
+            await reader.set_trace_callback(trace)
+        try:
+            for name, method, args in probes:
+                current[0] = name
+                await method(*args)
+        finally:
+            for reader in self._reader_connections + self._snapshot_connections:
+                await reader.set_trace_callback(None)
+            for cache in (self._user_settings_cache, self._guild_settings_cache, self._channel_settings_cache):
+                cache.invalidate(probe_id)
+            self._conversation_cache.invalidate(self._pack_id(probe_id))
+
+        # Plan against an empty copy of the schema so the result depends on the
+        # indexes alone, not on table sizes or ANALYZE statistics
+        async with self._read_connection() as db:
+            cursor = await db.execute("""
+                SELECT sql FROM main.sqlite_master
+                WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+                  AND type != 'trigger' AND sql NOT LIKE 'CREATE TABLE ''%'
+                ORDER BY type DESC
+            """)
+            schema = [row[0] for row in await cursor.fetchall()]
+
+        problems = {}
+        planner = sqlite3.connect(":memory:")
+        planner.create_function('content_text', 2, lambda codec, content: content)
+        try:
+            for statement in schema:
+                planner.execute(statement)
+            for name, statement in traced:
+                statement = re.sub(r"\bp_\d{4}_\d{2}\.", "main.", statement)
+                for row in planner.execute(f"EXPLAIN QUERY PLAN {statement}"):
+                    detail = row[3]
+                    if detail.startswith('SCAN') and 'CONSTANT ROW' not in detail \
+                            and not re.search(r"VIRTUAL TABLE INDEX \d+:\S*M", detail):
+                        problems.setdefault(name, []).append(detail)
+                    elif detail.startswith('USE TEMP B-TREE'):
+                        problems.setdefault(name, []).append(detail)
+        finally:
+            planner.close()
+
+        return problems
+
     async def log_user_message(self, 
                               user_id: str,
                               username: str,
@@ -140,30 +1886,22 @@ class MessageDatabase:
                               message_content: str,
                               has_attachments: bool = False,
                               attachment_info: Optional[Dict] = None,
-                              timestamp: Optional[datetime] = None) -> bool:
-        """Log a user message to the database"""
-        if not self.initialized:
-            await self.initialize()
-        
+                              timestamp: Optional[datetime] = None,
+                              wait: bool = True) -> bool:
+        """Queue a user message for the background writer.
+
+        With wait=True this returns once the batch containing the row is committed.
+        """
         if timestamp is None:
             timestamp = datetime.utcnow()
         
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    INSERT OR REPLACE INTO messages 
-                    (user_id, username, user_display_name, channel_id, channel_name, 
-                     guild_id, guild_name, message_id, message_content, message_type,
-                     has_attachments, attachment_info, timestamp)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    user_id, username, user_display_name, channel_id, channel_name,
-                    guild_id, guild_name, message_id, message_content, 'user',
-                    has_attachments, json.dumps(attachment_info) if attachment_info else None,
-                    timestamp
-                ))
-                await db.commit()
-                return True
+            return await self._enqueue_write('message', (
+                self._pack_id(user_id), username, user_display_name, self._pack_id(channel_id), channel_name,
+                self._pack_id(guild_id), guild_name, self._pack_id(message_id), message_content, 'user',
+                has_attachments, json.dumps(attachment_info) if attachment_info else None,
+                self._pack_time(timestamp)
+            ), wait)
         except Exception as e:
             print(f"❌ Error logging user message: {e}")
             return False
@@ -177,221 +1915,990 @@ class MessageDatabase:
                               processing_time_ms: Optional[int] = None,
                               model_used: Optional[str] = None,
                               tokens_used: Optional[int] = None,
-                              timestamp: Optional[datetime] = None) -> bool:
-        """Log a bot response to the database"""
-        if not self.initialized:
-            await self.initialize()
-        
+                              timestamp: Optional[datetime] = None,
+                              wait: bool = True) -> bool:
+        """Queue a bot response for the background writer.
+
+        With wait=True this returns once the batch containing the row is committed.
+        """
         if timestamp is None:
             timestamp = datetime.utcnow()
         
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    INSERT OR REPLACE INTO responses 
-                    (original_message_id, response_message_id, response_content,
-                     response_chunks, chunk_number, processing_time_ms, model_used,
-                     tokens_used, timestamp)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    original_message_id, response_message_id, response_content,
-                    response_chunks, chunk_number, processing_time_ms, model_used,
-                    tokens_used, timestamp
-                ))
-                await db.commit()
-                return True
+            return await self._enqueue_write('response', (
+                self._pack_id(original_message_id), self._pack_id(response_message_id), response_content,
+                response_chunks, chunk_number, processing_time_ms, model_used,
+                tokens_used, self._pack_time(timestamp)
+            ), wait)
         except Exception as e:
             print(f"❌ Error logging bot response: {e}")
             return False
     
-    async def get_user_message_history(self, user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
-        """Get message history for a specific user"""
+    @staticmethod
+    def _encode_cursor(timestamp: int, row_id: int) -> str:
+        """Build an opaque page cursor from the stored (timestamp, id) of a page's last row"""
+        raw = json.dumps([timestamp, row_id], separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple:
+        """Get the (timestamp, id) back out of a page cursor, raising ValueError if it is malformed"""
+        try:
+            timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            return int(timestamp), int(row_id)
+        except (ValueError, TypeError):
+            raise ValueError("Invalid page cursor")
+
+    async def get_user_message_page(self, user_id: str, limit: int = 10,
+                                     cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Get one page of a user's messages, newest first.
+
+        Each message carries its reply as one logical response: bot_responses
+        holds the chunks joined in order, response_message_ids the Discord ids
+        of the chunks and response_count the number of replies, not chunks.
+        Pages are keyed on (timestamp, id) rather than OFFSET, so every page
+        costs the same index range read. Pass the returned next_cursor to get
+        the following page; it is None on the last page. Raises ValueError for
+        a malformed cursor.
+        """
         if not self.initialized:
             await self.initialize()
 
+        params = (self._pack_id(user_id),)
+        keyset = ""
+        if cursor:
+            params += self._decode_cursor(cursor)
+            keyset = "AND (m.timestamp, m.id) < (?, ?)"
+
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                db.row_factory = aiosqlite.Row
-                async with db.execute("""
-                    SELECT m.*,
-                           GROUP_CONCAT(r.response_content, ' ') as bot_responses,
-                           COUNT(r.id) as response_count
-                    FROM messages m
-                    LEFT JOIN responses r ON m.message_id = r.original_message_id
-                    WHERE m.user_id = ?
-                    GROUP BY m.id
-                    ORDER BY m.timestamp DESC
+            async with self._snapshot_connection() as db:
+                rows = await self._newest_first(db, f"""
+                    SELECT m.*, '{{schema}}' as source_schema
+                    FROM {{schema}}.messages m
+                    WHERE m.user_id = ? {keyset}
+                    ORDER BY m.timestamp DESC, m.id DESC
                     LIMIT ?
-                """, (user_id, limit)) as cursor:
-                    rows = await cursor.fetchall()
-                    return [dict(row) for row in rows]
+                """, params, limit + 1)
+
+                messages = [self._row_dict(row) for row in rows[:limit]]
+                await self._attach_replies(db, messages)
+                next_cursor = None
+                if len(rows) > limit:
+                    next_cursor = self._encode_cursor(rows[limit - 1]['timestamp'], rows[limit - 1]['id'])
+                return {'messages': messages, 'next_cursor': next_cursor}
         except Exception as e:
-            print(f"❌ Error getting user message history: {e}")
-            return []
+            print(f"❌ Error getting user message page: {e}")
+            return {'messages': [], 'next_cursor': None}
+
+    async def _attach_replies(self, db, messages: List[dict]):
+        """Give each message row its reply as one logical response, built from the chunk rows"""
+        by_schema = {}
+        for message in messages:
+            by_schema.setdefault(message.pop('source_schema'), {})[message['id']] = message
+            message['response_count'] = 0
+
+        for schema, by_rowid in by_schema.items():
+            chunks = {}
+            for row in await self._select_in(db, f"""
+                SELECT message_rowid, chunk_number, response_message_id,
+                       content_text(content_codec, response_content)
+                FROM {schema}.responses
+                WHERE message_rowid IN ({{}})
+            """, by_rowid.keys()):
+                chunks.setdefault(row[0], []).append((row[1] or 1, row[2], row[3]))
+
+            for rowid, message in by_rowid.items():
+                parts = sorted(chunks.get(rowid, []))
+                message['bot_responses'] = "".join(content or "" for _, _, content in parts) if parts else None
+                message['response_message_ids'] = [self._unpack_id(response_id) for _, response_id, _ in parts]
+                if parts:
+                    # Each first chunk starts a separate reply to the same message
+                    message['response_count'] = max(1, sum(1 for chunk_number, _, _ in parts if chunk_number == 1))
+
+    async def get_user_message_history(self, user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Get message history for a specific user"""
+        return (await self.get_user_message_page(user_id, limit))['messages']
+
+    @classmethod
+    def _conversation_turn(cls, message_id: int, content: str, timestamp: int, has_attachments, attachment_info) -> dict:
+        """Build a conversation buffer turn in the same form whether it comes from a flush or a database load"""
+        return {
+            'message_id': message_id,
+            'content': content,
+            'timestamp': cls._unpack_time(timestamp),
+            'has_attachments': int(bool(has_attachments)),
+            'attachment_info': attachment_info,
+            'responses': {},
+        }
+
+    async def _load_conversation_turns(self, db, user_id: int, channel_id: Optional[int], count: int) -> List[dict]:
+        """Load a user's newest count turns with their replies, oldest first"""
+        params = (user_id,)
+        in_channel = ""
+        if channel_id is not None:
+            params += (channel_id,)
+            in_channel = "AND m.channel_id = ?"
+
+        turns = []
+        for schema in self._schemas_newest_first():
+            cursor = await db.execute(f"""
+                SELECT m.id, m.message_id, content_text(m.content_codec, m.message_content),
+                       m.timestamp, m.has_attachments, m.attachment_info
+                FROM {schema}.messages m
+                WHERE m.user_id = ? AND m.message_type = 'user' {in_channel}
+                ORDER BY m.timestamp DESC
+                LIMIT ?
+            """, params + (count - len(turns),))
+            schema_turns = {row[0]: self._conversation_turn(*row[1:]) for row in await cursor.fetchall()}
+
+            # Replies are stored in the same schema as the message they answer
+            for row in await self._select_in(db, f"""
+                SELECT message_rowid, response_message_id, chunk_number,
+                       content_text(content_codec, response_content), timestamp, model_used
+                FROM {schema}.responses
+                WHERE message_rowid IN ({{}})
+            """, schema_turns.keys()):
+                schema_turns[row[0]]['responses'][row[1]] = {
+                    'chunk_number': row[2], 'content': row[3], 'timestamp': self._unpack_time(row[4]),
+                    'model_used': row[5]
+                }
+
+            turns.extend(schema_turns.values())
+            if len(turns) >= count:
+                break
+
+        return list(reversed(turns))
+
+    async def get_conversation_context(self, user_id: str, limit: int = 20,
+                                       channel_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get conversation context for a user (alternating user messages and bot responses).
 
-    async def get_conversation_context(self, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
-        """Get conversation context for a user (alternating user messages and bot responses)"""
+        Covers the user's last limit messages, optionally only those in one
+        channel, each followed by exactly one assistant turn for its reply: the
+        chunks of a long reply are joined back together in order, with their
+        Discord ids in response_message_ids.
+        Active users are served from the in-memory conversation buffers, which
+        the write path keeps current; a miss loads the buffer from the database.
+        """
         if not self.initialized:
             await self.initialize()
 
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                db.row_factory = aiosqlite.Row
+            user_id, channel_id = self._pack_id(user_id), self._pack_id(channel_id)
+            cached = self._conversation_cache.get(user_id, channel_id)
+            if cached is not None and (cached[1] or len(cached[0]) >= limit):
+                turns = cached[0]
+            else:
+                count = max(limit, self._conversation_cache.turns_per_user)
+                generation = self._conversation_cache.generation(user_id)
+                async with self._read_connection() as db:
+                    turns = await self._load_conversation_turns(db, user_id, channel_id, count)
+                self._conversation_cache.set(user_id, channel_id, turns, len(turns) < count, generation)
+
+            conversation = []
+            for turn in turns[-limit:] if limit > 0 else []:
+                user_msg = {
+                    "role": "user",
+                    "content": turn["content"],
+                    "timestamp": turn["timestamp"],
+                    "has_attachments": turn["has_attachments"]
+                }
 
-                
-                async with db.execute("""
-                    SELECT
-                        m.message_content as user_message,
-                        m.timestamp as user_timestamp,
-                        m.has_attachments,
-                        m.attachment_info,
-                        r.response_content as bot_response,
-                        r.timestamp as bot_timestamp,
-                        r.model_used
-                    FROM messages m
-                    LEFT JOIN responses r ON m.message_id = r.original_message_id
-                    WHERE m.user_id = ? AND m.message_type = 'user'
-                    ORDER BY m.timestamp DESC
-                    LIMIT ?
-                """, (user_id, limit)) as cursor:
-                    rows = await cursor.fetchall()
+                if turn["attachment_info"]:
+                    try:
+                        user_msg["attachment_info"] = json.loads(turn["attachment_info"])
+                    except:
+                        pass
 
-                    
-                    conversation = []
-                    for row in reversed(rows):  
-                        row_dict = dict(row)
+                conversation.append(user_msg)
 
-                        
-                        user_msg = {
-                            "role": "user",
-                            "content": row_dict["user_message"],
-                            "timestamp": row_dict["user_timestamp"],
-                            "has_attachments": row_dict["has_attachments"]
-                        }
+                chunks = sorted(turn["responses"].items(), key=lambda item: (item[1]["chunk_number"] or 1, item[0]))
+                if chunks and any(chunk["content"] for _, chunk in chunks):
+                    conversation.append({
+                        "role": "assistant",
+                        "content": "".join(chunk["content"] or "" for _, chunk in chunks),
+                        "timestamp": chunks[0][1]["timestamp"],
+                        "model_used": chunks[0][1]["model_used"],
+                        "response_message_ids": [self._unpack_id(response_id) for response_id, _ in chunks]
+                    })
 
-                        
-                        if row_dict["attachment_info"]:
-                            try:
-                                user_msg["attachment_info"] = json.loads(row_dict["attachment_info"])
-                            except:
-                                pass
+            return conversation
 
-                        conversation.append(user_msg)
+        except Exception as e:
+            print(f"❌ Error getting conversation context: {e}")
+            return []
 
-                        
-                        if row_dict["bot_response"]:
-                            bot_msg = {
-                                "role": "assistant",
-                                "content": row_dict["bot_response"],
-                                "timestamp": row_dict["bot_timestamp"],
-                                "model_used": row_dict["model_used"]
-                            }
-                            conversation.append(bot_msg)
+    @staticmethod
+    def _fts_query(text: str) -> Optional[str]:
+        """Turn free text into an FTS5 query: every word must match, the last one as a prefix"""
+        words = re.findall(r"\w+", text or "")
+        if not words:
+            return None
+        return " ".join(f'"{word}"' for word in words[:-1]) + (" " if len(words) > 1 else "") + f'"{words[-1]}"*'
 
-                    return conversation
+    @staticmethod
+    def _snippet(text: str, query: str, tokens: int = 16) -> str:
+        """Build a snippet like FTS5's snippet() for a compressed body.
 
+        snippet() reads bodies back from the table, where compressed ones are
+        blobs, so for those the window of tokens holding the most query words
+        is picked here instead, matching words the way _fts_query does.
+        """
+        words = [word.casefold() for word in re.findall(r"\w+", query or "")]
+        found = list(re.finditer(r"\w+", text or ""))
+        if not words or not found:
+            return text or ""
+
+        exact, prefix = set(words[:-1]), words[-1]
+        hits = [token.group().casefold() in exact or token.group().casefold().startswith(prefix) for token in found]
+
+        best_start, best_hits = 0, -1
+        for index, hit in enumerate(hits):
+            if hit:
+                start = max(0, min(index, len(found) - tokens))
+                count = sum(hits[start:start + tokens])
+                if count > best_hits:
+                    best_start, best_hits = start, count
+        end = min(len(found), best_start + tokens)
+
+        parts = ["…"] if best_start > 0 else []
+        position = found[best_start].start()
+        for token, hit in zip(found[best_start:end], hits[best_start:end]):
+            parts.append(text[position:token.start()])
+            parts.append(f"**{token.group()}**" if hit else token.group())
+            position = token.end()
+        parts.append("…" if end < len(found) else text[position:])
+        return "".join(parts)
+
+    def _search_sql(self, source: str) -> tuple:
+        """(select list, FROM ... WHERE match clause, rank expression) for searching a source"""
+        if source == 'messages':
+            select = """
+                SELECT m.message_id, m.user_id, m.username, m.user_display_name, m.channel_id,
+                       m.channel_name, m.guild_id, m.guild_name, m.timestamp,
+                       content_text(m.content_codec, m.message_content) as content,
+                       CASE m.content_codec WHEN 0 THEN snippet(messages_fts, 0, '**', '**', '…', 16) END as snippet,
+                       messages_fts.rank as rank
+            """
+            source_sql = """
+                FROM {schema}.messages_fts
+                JOIN {schema}.messages m ON m.id = messages_fts.rowid
+                WHERE messages_fts MATCH ?
+            """
+            rank_column = "messages_fts.rank"
+        else:
+            select = """
+                SELECT r.response_message_id, r.original_message_id, r.model_used, r.timestamp,
+                       m.user_id, m.username, m.channel_id, m.guild_id,
+                       content_text(r.content_codec, r.response_content) as content,
+                       CASE r.content_codec WHEN 0 THEN snippet(responses_fts, 0, '**', '**', '…', 16) END as snippet,
+                       responses_fts.rank as rank
+            """
+            source_sql = """
+                FROM {schema}.responses_fts
+                JOIN {schema}.responses r ON r.id = responses_fts.rowid
+                LEFT JOIN {schema}.messages m ON m.id = r.message_rowid
+                WHERE responses_fts MATCH ?
+            """
+            rank_column = "responses_fts.rank"
+        return select, source_sql, rank_column
+
+    async def search_messages(self, query: str, source: str = 'messages', user_id: Optional[str] = None,
+                              limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+        """Full-text search over logged messages or bot responses, best matches first.
+
+        Returns {'total': matching rows, 'results': one page of rows}, each row
+        carrying a 'snippet' with the matched words wrapped in ** and its bm25 'rank'.
+        """
+        if not self.initialized:
+            await self.initialize()
+
+        match = self._fts_query(query)
+        if match is None or source not in ('messages', 'responses'):
+            return {'total': 0, 'results': []}
+
+        select, source_sql, rank_column = self._search_sql(source)
+
+        params = (match,)
+        if user_id is not None:
+            source_sql += " AND m.user_id = ?"
+            params += (self._pack_id(user_id),)
+
+        try:
+            async with self._snapshot_connection() as db:
+                total = 0
+                rows = []
+                # Oldest first, so the stable sort below keeps equal ranks in insertion order
+                for schema in reversed(self._schemas_newest_first()):
+                    cursor = await db.execute(f"SELECT COUNT(*) {source_sql}".format(schema=schema), params)
+                    total += (await cursor.fetchone())[0]
+
+                    # Each schema is ranked on its own, so take enough from every
+                    # one to cover the requested page before merging
+                    cursor = await db.execute(
+                        f"{select} {source_sql} ORDER BY {rank_column} LIMIT ?".format(schema=schema),
+                        params + (offset + limit,)
+                    )
+                    rows.extend(self._row_dict(row) for row in await cursor.fetchall())
+
+                rows.sort(key=lambda row: row['rank'])
+                results = rows[offset:offset + limit]
+                for row in results:
+                    if row['snippet'] is None:
+                        row['snippet'] = self._snippet(row['content'], query)
+                return {'total': total, 'results': results}
         except Exception as e:
-            print(f"❌ Error getting conversation context: {e}")
-            return []
+            print(f"❌ Error searching {source}: {e}")
+            return {'total': 0, 'results': []}
     
+    async def rebuild_message_counters(self) -> bool:
+        """Rebuild the message counters from scratch, repairing any drift"""
+        if not self.initialized:
+            await self.initialize()
+
+        try:
+            async with self._write_connection() as db:
+                await self._rebuild_counters(db)
+                await db.commit()
+                return True
+        except Exception as e:
+            print(f"❌ Error rebuilding message counters: {e}")
+            return False
+
+    async def get_message_counters(self, scope: str = 'global', scope_id: str = '') -> Dict[str, int]:
+        """Get the message, response and unique user counters for a scope (global, user, guild or channel)"""
+        if not self.initialized:
+            await self.initialize()
+
+        try:
+            async with self._snapshot_connection() as db:
+                cursor = await db.execute("""
+                    SELECT message_count, response_count, user_count
+                    FROM message_counters
+                    WHERE scope = ? AND scope_id = ?
+                """, (scope, scope_id))
+                result = await cursor.fetchone()
+
+                if result:
+                    return {
+                        'message_count': result[0],
+                        'response_count': result[1],
+                        'user_count': result[2]
+                    }
+                return {'message_count': 0, 'response_count': 0, 'user_count': 0}
+        except Exception as e:
+            print(f"❌ Error getting message counters: {e}")
+            return {'message_count': 0, 'response_count': 0, 'user_count': 0}
+
     async def get_conversation_stats(self, user_id: Optional[str] = None) -> Dict[str, Any]:
         """Get conversation statistics"""
         if not self.initialized:
             await self.initialize()
         
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                stats = {}
-                
-                
-                if user_id:
-                    cursor = await db.execute("SELECT COUNT(*) FROM messages WHERE user_id = ?", (user_id,))
-                    stats['total_messages'] = (await cursor.fetchone())[0]
-                    
-                    cursor = await db.execute("SELECT COUNT(*) FROM responses r JOIN messages m ON r.original_message_id = m.message_id WHERE m.user_id = ?", (user_id,))
-                    stats['total_responses'] = (await cursor.fetchone())[0]
-                else:
-                    cursor = await db.execute("SELECT COUNT(*) FROM messages")
-                    stats['total_messages'] = (await cursor.fetchone())[0]
-                    
-                    cursor = await db.execute("SELECT COUNT(*) FROM responses")
-                    stats['total_responses'] = (await cursor.fetchone())[0]
-                
-                
-                if not user_id:
-                    cursor = await db.execute("SELECT COUNT(DISTINCT user_id) FROM messages")
-                    stats['unique_users'] = (await cursor.fetchone())[0]
-                
-                return stats
+            if user_id:
+                counters = await self.get_message_counters('user', user_id)
+            else:
+                counters = await self.get_message_counters()
+
+            stats = {
+                'total_messages': counters['message_count'],
+                'total_responses': counters['response_count']
+            }
+            
+            if not user_id:
+                stats['unique_users'] = counters['user_count']
+            
+            return stats
         except Exception as e:
             print(f"❌ Error getting conversation stats: {e}")
             return {}
+
+    async def get_rollups(self, scope: str = 'global', scope_id: str = '', period: str = 'day',
+                          since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get a scope's hourly or daily rollups (bucket >= since), oldest bucket first.
+
+        Buckets are 'YYYY-MM-DD HH:00' for hours and 'YYYY-MM-DD' for days.
+        Hourly rollups are pruned along with old messages; daily and all-time
+        rollups are kept after the raw rows are gone.
+        """
+        if not self.initialized:
+            await self.initialize()
+
+        try:
+            async with self._snapshot_connection() as db:
+                cursor = await db.execute("""
+                    SELECT bucket, label, message_count, response_count, processing_ms_sum,
+                           processing_ms_count, processing_ms_min, processing_ms_max, tokens_sum
+                    FROM message_rollups
+                    WHERE period = ? AND scope = ? AND scope_id = ? AND bucket >= ?
+                    ORDER BY bucket
+                """, (period, scope, scope_id, since or ''))
+                return [dict(row) for row in await cursor.fetchall()]
+        except Exception as e:
+            print(f"❌ Error getting rollups: {e}")
+            return []
+
+    async def get_top_rollups(self, scope: str, limit: int = 10, by: str = 'message_count') -> List[Dict[str, Any]]:
+        """Get the all-time rollups of a scope (user, channel, guild or model) with the highest message or response count"""
+        if not self.initialized:
+            await self.initialize()
+
+        if by not in ('message_count', 'response_count'):
+            return []
+
+        try:
+            async with self._snapshot_connection() as db:
+                cursor = await db.execute(f"""
+                    SELECT scope_id, label, message_count, response_count, processing_ms_sum,
+                           processing_ms_count, processing_ms_min, processing_ms_max, tokens_sum,
+                           first_at, last_at
+                    FROM message_rollups
+                    WHERE period = 'total' AND scope = ?
+                    ORDER BY {by} DESC
+                    LIMIT ?
+                """, (scope, limit))
+                return [dict(row) for row in await cursor.fetchall()]
+        except Exception as e:
+            print(f"❌ Error getting top rollups: {e}")
+            return []
     
-    async def cleanup_old_messages(self, days_to_keep: int = 30) -> int:
-        """Clean up messages older than specified days"""
+    async def cleanup_old_messages(self, days_to_keep: int = 30, batch_size: int = 1000) -> int:
+        """Clean up messages older than specified days.
+
+        Partitions that lie entirely before the cutoff are detached and deleted.
+        Rows in the main file are deleted batch_size messages at a time, each
+        batch in its own short transaction, so queued logging writes can get the
+        writer in between. Hourly analytics rollups before the cutoff go too;
+        daily and all-time rollups are kept. Freed pages are then returned with
+        an incremental vacuum and the WAL is checkpointed.
+        """
         if not self.initialized:
             await self.initialize()
         
         try:
             cutoff_date = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
             cutoff_date = cutoff_date - timedelta(days=days_to_keep)
-            
-            async with aiosqlite.connect(self.db_path) as db:
-                
-                cursor = await db.execute("""
-                    DELETE FROM responses 
-                    WHERE original_message_id IN (
-                        SELECT message_id FROM messages WHERE timestamp < ?
-                    )
-                """, (cutoff_date,))
-                responses_deleted = cursor.rowcount
-                
-                
-                cursor = await db.execute("DELETE FROM messages WHERE timestamp < ?", (cutoff_date,))
-                messages_deleted = cursor.rowcount
-                
+            batch_size = max(1, batch_size)
+
+            started = time.perf_counter()
+            messages_deleted = responses_deleted = batches = 0
+
+            if self.partition_months:
+                async with self._write_connection() as db:
+                    for key in list(self._known_partitions):
+                        if self._partition_end(key) <= cutoff_date:
+                            messages, responses = await self._drop_partition(db, key)
+                            messages_deleted += messages
+                            responses_deleted += responses
+
+            async def delete_batch():
+                async with self._write_connection() as db:
+                    deleted = await self._delete_expired_batch(db, self._pack_time(cutoff_date), batch_size)
+                    await db.commit()
+                    return deleted
+
+            while True:
+                batch_messages, batch_responses = await self._with_retry('cleanup_old_messages', delete_batch)
+                if batch_messages > 0:
+                    messages_deleted += batch_messages
+                    responses_deleted += batch_responses
+                    batches += 1
+
+                if batch_messages < batch_size:
+                    break
+                await asyncio.sleep(0)
+
+            async with self._write_connection() as db:
+                await db.execute(
+                    "DELETE FROM message_rollups WHERE period = 'hour' AND bucket < ?",
+                    (str(cutoff_date)[:13] + ':00',)
+                )
                 await db.commit()
-                
-                total_deleted = messages_deleted + responses_deleted
-                print(f"🧹 Cleaned up {messages_deleted} messages and {responses_deleted} responses older than {days_to_keep} days")
-                return total_deleted
+
+            if messages_deleted or responses_deleted:
+                self._conversation_cache.clear()
+
+            pages_freed = await self._reclaim_space()
+
+            elapsed = time.perf_counter() - started
+            total_deleted = messages_deleted + responses_deleted
+            self._maintenance_stats = {
+                'last_cleanup_at': datetime.utcnow().isoformat(),
+                'rows_deleted': total_deleted,
+                'batches': batches,
+                'duration_s': elapsed,
+                'rows_per_second': total_deleted / elapsed if elapsed > 0 else 0.0,
+                'pages_freed': pages_freed,
+            }
+
+            print(f"🧹 Cleaned up {messages_deleted} messages and {responses_deleted} responses older than {days_to_keep} days "
+                  f"in {batches} batches ({self._maintenance_stats['rows_per_second']:.0f} rows/s, {pages_freed} pages freed)")
+            return total_deleted
         except Exception as e:
             print(f"❌ Error cleaning up old messages: {e}")
             return 0
 
+    async def _delete_expired_batch(self, db, cutoff: int, batch_size: int) -> tuple:
+        """Delete up to batch_size of the oldest main-file messages before cutoff, with their
+        responses and counter contributions, returning (messages, responses) deleted"""
+        await db.execute("CREATE TEMP TABLE IF NOT EXISTS cleanup_rows (id INTEGER PRIMARY KEY)")
+        await db.execute("DELETE FROM temp.cleanup_rows")
+        cursor = await db.execute("""
+            INSERT INTO temp.cleanup_rows (id)
+            SELECT id FROM main.messages
+            WHERE timestamp < ?
+            ORDER BY timestamp
+            LIMIT ?
+        """, (cutoff, batch_size))
+        if cursor.rowcount <= 0:
+            return 0, 0
+
+        in_batch = "m.id IN (SELECT id FROM temp.cleanup_rows)"
+        deltas, _, _ = await self._collect_counter_deltas(db, 'main', in_batch, sign=-1)
+
+        cursor = await db.execute("""
+            DELETE FROM main.responses
+            WHERE message_rowid IN (SELECT id FROM temp.cleanup_rows)
+        """)
+        responses = cursor.rowcount
+
+        cursor = await db.execute("""
+            DELETE FROM main.messages
+            WHERE id IN (SELECT id FROM temp.cleanup_rows)
+        """)
+        messages = cursor.rowcount
+
+        await self._apply_counter_deltas(db, deltas)
+        await db.execute("DELETE FROM message_counters WHERE scope != 'global' AND message_count <= 0")
+        return messages, responses
+
+    async def _reclaim_space(self, pages_per_step: int = 1000) -> int:
+        """Run incremental vacuum in small steps, then checkpoint and truncate the WAL"""
+        pages_freed = 0
+        while True:
+            async with self._write_connection() as db:
+                cursor = await db.execute("PRAGMA auto_vacuum")
+                if (await cursor.fetchone())[0] != 2:
+                    break
+                cursor = await db.execute("PRAGMA freelist_count")
+                free_pages = (await cursor.fetchone())[0]
+                if free_pages == 0:
+                    break
+
+                # executescript steps the pragma to completion; execute would free a single page
+                await db.executescript(f"PRAGMA incremental_vacuum({pages_per_step})")
+                pages_freed += min(free_pages, pages_per_step)
+            await asyncio.sleep(0)
+
+        async with self._write_connection() as db:
+            await db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        return pages_freed
+
+    async def vacuum_database(self) -> bool:
+        """Rebuild the main file with VACUUM, switching it to incremental auto-vacuum.
+
+        Needed once for databases created before incremental vacuum was enabled;
+        this blocks all writes for the duration.
+        """
+        if not self.initialized:
+            await self.initialize()
+
+        try:
+            await self.flush()
+            async with self._write_connection() as db:
+                await db.commit()
+                await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                await db.execute("VACUUM")
+                await db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                return True
+        except Exception as e:
+            print(f"❌ Error vacuuming database: {e}")
+            return False
+
+    async def train_compression_dictionary(self) -> Optional[int]:
+        """Train a dictionary from the newest stored bodies and compress new rows with it.
+
+        Returns the new dictionary's id, or None if there are too few bodies
+        long enough to compress to learn from.
+        """
+        if not self.initialized:
+            await self.initialize()
+
+        try:
+            samples = []
+            async with self._snapshot_connection() as db:
+                for table, column in (('messages', 'message_content'), ('responses', 'response_content')):
+                    rows = await self._newest_first(db, f"""
+                        SELECT content_text(content_codec, {column})
+                        FROM {{schema}}.{table}
+                        WHERE length({column}) >= ?
+                        ORDER BY timestamp DESC
+                        LIMIT ?
+                    """, (self.COMPRESSION_MIN_BYTES,), self.COMPRESSION_SAMPLE_ROWS // 2)
+                    samples.extend(row[0] for row in rows)
+
+            if len(samples) < self.COMPRESSION_MIN_SAMPLES:
+                print(f"⚠️ Only {len(samples)} stored bodies are long enough to compress, not training a dictionary yet")
+                return None
+
+            dictionary = await asyncio.to_thread(ContentCodec.train, samples)
+            async with self._write_connection() as db:
+                cursor = await db.execute(
+                    "INSERT INTO compression_dictionaries (dictionary, sample_rows) VALUES (?, ?)",
+                    (dictionary, len(samples))
+                )
+                dictionary_id = cursor.lastrowid
+                await db.commit()
+
+            self._codec.add_dictionary(dictionary_id, dictionary)
+            print(f"🗜️ Trained compression dictionary {dictionary_id} ({len(dictionary)} bytes) from {len(samples)} stored bodies")
+            return dictionary_id
+        except Exception as e:
+            print(f"❌ Error training compression dictionary: {e}")
+            return None
+
+    async def compress_stored_content(self, batch_size: int = 500) -> int:
+        """Compress message and response bodies stored as plain text.
+
+        Trains a dictionary first if there is none. Rows are rewritten batch_size
+        at a time, each batch in its own short transaction. The space saved is
+        reused by later writes; vacuum_database returns it to the filesystem.
+        Returns the number of rows compressed.
+        """
+        if not self.initialized:
+            await self.initialize()
+
+        if self._codec.current_id is None and await self.train_compression_dictionary() is None:
+            return 0
+
+        try:
+            started = time.perf_counter()
+            total = 0
+            for schema in self._schemas_newest_first():
+                for table, column in (('messages', 'message_content'), ('responses', 'response_content')):
+                    last_id = 0
+                    while True:
+                        async with self._write_connection() as db:
+                            cursor = await db.execute(f"""
+                                SELECT id, {column} FROM {schema}.{table}
+                                WHERE id > ? AND content_codec = 0
+                                ORDER BY id
+                                LIMIT ?
+                            """, (last_id, batch_size))
+                            rows = await cursor.fetchall()
+                            if not rows:
+                                break
+                            last_id = rows[-1][0]
+
+                            compressed, updates = {}, []
+                            for row_id, content in rows:
+                                codec, stored = self._compress_body(content, compressed)
+                                if codec != ContentCodec.PLAIN:
+                                    updates.append((stored, codec, row_id))
+                            await db.executemany(
+                                f"UPDATE {schema}.{table} SET {column} = ?, content_codec = ? WHERE id = ?", updates
+                            )
+                            await self._record_compression(db, compressed)
+                            await db.commit()
+                        total += len(updates)
+                        await asyncio.sleep(0)
+
+            print(f"🗜️ Compressed {total} stored bodies in {time.perf_counter() - started:.1f}s")
+            return total
+        except Exception as e:
+            print(f"❌ Error compressing stored content: {e}")
+            return 0
+
+    async def get_compression_stats(self) -> Dict[str, Any]:
+        """Get the compression ratio of stored bodies and what decompressing them on read costs.
+
+        Byte totals cover every row compressed since the first dictionary was
+        trained; read counters cover this process.
+        """
+        if not self.initialized:
+            await self.initialize()
+
+        try:
+            async with self._snapshot_connection() as db:
+                cursor = await db.execute("""
+                    SELECT COUNT(*), COALESCE(SUM(rows_compressed), 0),
+                           COALESCE(SUM(raw_bytes), 0), COALESCE(SUM(stored_bytes), 0)
+                    FROM compression_dictionaries
+                """)
+                dictionaries, rows, raw_bytes, stored_bytes = await cursor.fetchone()
+
+            codec = self._codec.stats()
+            return {
+                'enabled': self.compress_content,
+                'current_dictionary': codec['current_dictionary'],
+                'dictionaries': dictionaries,
+                'rows_compressed': rows,
+                'raw_bytes': raw_bytes,
+                'stored_bytes': stored_bytes,
+                'saved_bytes': raw_bytes - stored_bytes,
+                'ratio': raw_bytes / stored_bytes if stored_bytes else 0.0,
+                'reads': codec['reads'],
+                'read_ms': codec['read_ms'],
+                'avg_read_us': codec['avg_read_us'],
+            }
+        except Exception as e:
+            print(f"❌ Error getting compression stats: {e}")
+            return {}
+
+    async def get_database_health(self) -> Dict[str, Any]:
+        """Get file, free page and WAL sizes plus the last cleanup's throughput"""
+        if not self.initialized:
+            await self.initialize()
+
+        try:
+            async with self._snapshot_connection() as db:
+                pragmas = {}
+                for pragma in ('page_size', 'page_count', 'freelist_count', 'auto_vacuum'):
+                    cursor = await db.execute(f"PRAGMA main.{pragma}")
+                    pragmas[pragma] = (await cursor.fetchone())[0]
+
+            wal_path = f"{self.db_path}-wal"
+            partition_paths = [self._partition_path(key) for key in self._known_partitions]
+
+            return {
+                'backend': 'sqlite',
+                'db_size_bytes': pragmas['page_size'] * pragmas['page_count'],
+                'free_pages': pragmas['freelist_count'],
+                'free_bytes': pragmas['page_size'] * pragmas['freelist_count'],
+                'auto_vacuum': {0: 'none', 1: 'full', 2: 'incremental'}.get(pragmas['auto_vacuum'], 'unknown'),
+                'wal_size_bytes': os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+                'partitions': len(partition_paths),
+                'partition_size_bytes': sum(os.path.getsize(path) for path in partition_paths if os.path.exists(path)),
+                'last_cleanup': dict(self._maintenance_stats),
+            }
+        except Exception as e:
+            print(f"❌ Error getting database health: {e}")
+            return {}
+
+    async def stream_rows(self, kind: str = 'messages', since=None, until=None,
+                          guild_id: Optional[str] = None, user_id: Optional[str] = None,
+                          batch_size: int = EXPORT_BATCH_ROWS) -> AsyncIterator[Dict[str, Any]]:
+        """Yield stored messages or responses as export rows, in constant memory.
+
+        Rows come in id order, the main file first and then each partition
+        from oldest to newest. since (inclusive) and until (exclusive) bound the
+        row's timestamp; guild_id and user_id filter responses by their original
+        message. Each batch_size rows are read from a fresh snapshot, so a long
+        export does not hold back WAL checkpoints.
+        """
+        if kind not in self.EXPORT_COLUMNS:
+            raise ValueError(f"Unknown export kind: {kind}")
+
+        alias = 'm' if kind == 'messages' else 'r'
+        columns = ", ".join(f"{alias}.{column}" for column in self.EXPORT_COLUMNS[kind])
+        source = "{schema}.messages m" if kind == 'messages' else \
+            "{schema}.responses r LEFT JOIN {schema}.messages m ON m.id = r.message_rowid"
+
+        filters, params = "", ()
+        for condition, value in ((f"{alias}.timestamp >= ?", self._pack_time(since)),
+                                 (f"{alias}.timestamp < ?", self._pack_time(until)),
+                                 ("m.guild_id = ?", self._pack_id(guild_id)),
+                                 ("m.user_id = ?", self._pack_id(user_id))):
+            if value is not None:
+                filters += f" AND {condition}"
+                params += (value,)
+
+        if not self.initialized:
+            await self.initialize()
+
+        for schema in reversed(self._schemas_newest_first()):
+            last_id = 0
+            while True:
+                async with self._snapshot_connection() as db:
+                    cursor = await db.execute(f"""
+                        SELECT {alias}.id, {columns}, {alias}.content_codec
+                        FROM {source.format(schema=schema)}
+                        WHERE {alias}.id > ? {filters}
+                        ORDER BY {alias}.id
+                        LIMIT ?
+                    """, (last_id,) + params + (batch_size,))
+                    rows = [self._row_dict(row) for row in await cursor.fetchall()]
+
+                for row in rows:
+                    last_id = row.pop('id')
+                    if kind == 'messages':
+                        row['has_attachments'] = bool(row['has_attachments'])
+                    yield row
+                if len(rows) < batch_size:
+                    break
+
+    @staticmethod
+    def _export_format(path: str, file_format: Optional[str]) -> str:
+        return file_format or ('parquet' if path.endswith('.parquet') else 'jsonl')
+
+    @classmethod
+    def _parquet_schema(cls, kind: str):
+        def column_type(column: str):
+            if column == 'has_attachments':
+                return pyarrow.bool_()
+            return pyarrow.int64() if column in cls.EXPORT_INTEGER_COLUMNS else pyarrow.string()
+        return pyarrow.schema([(column, column_type(column)) for column in cls.EXPORT_COLUMNS[kind]])
+
+    async def export_rows(self, path: str, kind: str = 'messages', file_format: Optional[str] = None,
+                          **filters) -> int:
+        """Write stored messages or responses to a JSONL or Parquet file, returning the rows written.
+
+        The format follows the file extension unless file_format is given, and
+        filters are those of stream_rows. Rows are written as they are read, off
+        the event loop, into a temporary file that replaces path once complete.
+        """
+        file_format = self._export_format(path, file_format)
+        if file_format == 'parquet' and not PYARROW_AVAILABLE:
+            print("❌ Parquet export needs pyarrow: pip install pyarrow")
+            return 0
+
+        temp_path = f"{path}.partial"
+        written = 0
+        writer = None
+        try:
+            if file_format == 'parquet':
+                writer = pyarrow.parquet.ParquetWriter(temp_path, self._parquet_schema(kind))
+
+                def write(rows: List[dict]):
+                    writer.write_table(pyarrow.Table.from_pylist(rows, schema=writer.schema))
+            else:
+                writer = open(temp_path, 'w', encoding='utf-8')
+
+                def write(rows: List[dict]):
+                    writer.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows))
+
+            batch = []
+            async for row in self.stream_rows(kind, **filters):
+                batch.append(row)
+                if len(batch) >= self.EXPORT_BATCH_ROWS:
+                    await asyncio.to_thread(write, batch)
+                    written += len(batch)
+                    batch = []
+            if batch:
+                await asyncio.to_thread(write, batch)
+                written += len(batch)
+
+            await asyncio.to_thread(writer.close)
+            writer = None
+            os.replace(temp_path, path)
+            print(f"📦 Exported {written} {kind} to {path}")
+            return written
+        except Exception as e:
+            print(f"❌ Error exporting {kind} to {path}: {e}")
+            if writer is not None:
+                writer.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return 0
+
+    async def _read_export(self, path: str, file_format: str, batch_size: int) -> AsyncIterator[List[dict]]:
+        """Yield the rows of an export file batch_size at a time, reading off the event loop"""
+        if file_format == 'parquet':
+            batches = pyarrow.parquet.ParquetFile(path).iter_batches(batch_size=batch_size)
+            while True:
+                batch = await asyncio.to_thread(next, batches, None)
+                if batch is None:
+                    return
+                yield batch.to_pylist()
+        else:
+            with open(path, encoding='utf-8') as export:
+                while True:
+                    lines = await asyncio.to_thread(
+                        lambda: [line for line in itertools.islice(export, batch_size) if line.strip()]
+                    )
+                    if not lines:
+                        return
+                    yield [json.loads(line) for line in lines]
+
+    async def import_rows(self, path: str, kind: str = 'messages', file_format: Optional[str] = None,
+                          batch_size: int = IMPORT_BATCH_ROWS) -> int:
+        """Load a file written by export_rows, returning the rows imported.
+
+        Rows take the same path as logged ones, so partitions, counters, rollups
+        and compression stay in step, and rows already stored are updated in
+        place. Each batch_size rows are written with executemany in a single
+        transaction, releasing the writer in between so live logging keeps
+        flowing. Import messages before their responses.
+        """
+        if kind not in self.EXPORT_COLUMNS:
+            raise ValueError(f"Unknown export kind: {kind}")
+        file_format = self._export_format(path, file_format)
+        if file_format == 'parquet' and not PYARROW_AVAILABLE:
+            print("❌ Parquet import needs pyarrow: pip install pyarrow")
+            return 0
+
+        if not self.initialized:
+            await self.initialize()
+
+        ids = {'user_id', 'channel_id', 'guild_id', 'message_id', 'original_message_id', 'response_message_id'}
+        columns = self.EXPORT_COLUMNS[kind]
+        started = time.perf_counter()
+        imported = 0
+        try:
+            async for batch in self._read_export(path, file_format, batch_size):
+                rows = [
+                    tuple(self._pack_id(row.get(column)) if column in ids
+                          else self._pack_time(row.get(column)) if column == 'timestamp'
+                          else row.get(column) for column in columns)
+                    for row in batch
+                ]
+                if kind == 'messages':
+                    await self._with_retry('import_rows', lambda: self._write_rows(rows, []))
+                else:
+                    await self._with_retry('import_rows', lambda: self._write_rows([], rows))
+                imported += len(rows)
+                await asyncio.sleep(0)
+        except Exception as e:
+            print(f"❌ Error importing {kind} from {path} after {imported} rows: {e}")
+        finally:
+            # Imported rows are not in the conversation buffers
+            if imported:
+                self._conversation_cache.clear()
+
+        elapsed = time.perf_counter() - started
+        print(f"📥 Imported {imported} {kind} from {path} in {elapsed:.1f}s")
+        return imported
+
     async def get_user_settings(self, user_id: str) -> dict:
         """Get user settings, creating default settings if they don't exist"""
+        cached = self._user_settings_cache.get(user_id)
+        if cached is not None:
+            return dict(cached)
+
         if not self.initialized:
             await self.initialize()
 
+        generation = self._user_settings_cache.generation
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._read_connection() as db:
                 cursor = await db.execute("""
                     SELECT user_id, username, user_display_name, nsfw_mode, content_filter_level,
                            steam_id, steam_username, steam_linked_at,
                            created_at, updated_at
                     FROM user_settings
                     WHERE user_id = ?
-                """, (user_id,))
+                """, (self._pack_id(user_id),))
 
                 result = await cursor.fetchone()
 
                 if result:
-                    return {
-                        'user_id': result[0],
+                    settings = {
+                        'user_id': self._unpack_id(result[0]),
                         'username': result[1],
                         'user_display_name': result[2],
                         'nsfw_mode': bool(result[3]),
                         'content_filter_level': result[4],
                         'steam_id': result[5],
                         'steam_username': result[6],
-                        'steam_linked_at': result[7],
-                        'created_at': result[8],
-                        'updated_at': result[9]
+                        'steam_linked_at': self._unpack_time(result[7]),
+                        'created_at': self._unpack_time(result[8]),
+                        'updated_at': self._unpack_time(result[9])
                     }
                 else:
                     
-                    default_settings = {
+                    settings = {
                         'user_id': user_id,
                         'username': None,
                         'user_display_name': None,
@@ -403,7 +2910,9 @@ class MessageDatabase:
                         'created_at': datetime.utcnow().isoformat(),
                         'updated_at': datetime.utcnow().isoformat()
                     }
-                    return default_settings
+
+                self._user_settings_cache.set(user_id, settings, generation)
+                return dict(settings)
 
         except Exception as e:
             print(f"❌ Error getting user settings: {e}")
@@ -429,68 +2938,72 @@ class MessageDatabase:
             await self.initialize()
 
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async def write():
+                async with self._write_connection() as db:
                 
-                cursor = await db.execute("SELECT user_id FROM user_settings WHERE user_id = ?", (user_id,))
-                exists = await cursor.fetchone()
+                    cursor = await db.execute("SELECT user_id FROM user_settings WHERE user_id = ?", (self._pack_id(user_id),))
+                    exists = await cursor.fetchone()
 
-                current_time = datetime.utcnow().isoformat()
+                    current_time = self._pack_time(datetime.utcnow())
 
-                if exists:
+                    if exists:
                     
-                    update_fields = []
-                    update_values = []
+                        update_fields = []
+                        update_values = []
 
-                    if username is not None:
-                        update_fields.append("username = ?")
-                        update_values.append(username)
+                        if username is not None:
+                            update_fields.append("username = ?")
+                            update_values.append(username)
 
-                    if user_display_name is not None:
-                        update_fields.append("user_display_name = ?")
-                        update_values.append(user_display_name)
+                        if user_display_name is not None:
+                            update_fields.append("user_display_name = ?")
+                            update_values.append(user_display_name)
 
-                    if nsfw_mode is not None:
-                        update_fields.append("nsfw_mode = ?")
-                        update_values.append(nsfw_mode)
+                        if nsfw_mode is not None:
+                            update_fields.append("nsfw_mode = ?")
+                            update_values.append(nsfw_mode)
 
-                    if content_filter_level is not None:
-                        update_fields.append("content_filter_level = ?")
-                        update_values.append(content_filter_level)
+                        if content_filter_level is not None:
+                            update_fields.append("content_filter_level = ?")
+                            update_values.append(content_filter_level)
 
-                    if steam_id is not None:
-                        update_fields.append("steam_id = ?")
-                        update_values.append(steam_id)
+                        if steam_id is not None:
+                            update_fields.append("steam_id = ?")
+                            update_values.append(steam_id)
                         
-                        update_fields.append("steam_linked_at = ?")
-                        update_values.append(current_time)
+                            update_fields.append("steam_linked_at = ?")
+                            update_values.append(current_time)
 
-                    if steam_username is not None:
-                        update_fields.append("steam_username = ?")
-                        update_values.append(steam_username)
+                        if steam_username is not None:
+                            update_fields.append("steam_username = ?")
+                            update_values.append(steam_username)
 
-                    if update_fields:
-                        update_fields.append("updated_at = ?")
-                        update_values.append(current_time)
-                        update_values.append(user_id)  
+                        if update_fields:
+                            update_fields.append("updated_at = ?")
+                            update_values.append(current_time)
+                            update_values.append(self._pack_id(user_id))  
 
-                        query = f"UPDATE user_settings SET {', '.join(update_fields)} WHERE user_id = ?"
-                        await db.execute(query, update_values)
-                else:
+                            query = f"UPDATE user_settings SET {', '.join(update_fields)} WHERE user_id = ?"
+                            await db.execute(query, update_values)
+                    else:
                     
-                    await db.execute("""
-                        INSERT INTO user_settings (user_id, username, user_display_name, nsfw_mode,
-                                                 content_filter_level, steam_id, steam_username,
-                                                 steam_linked_at, created_at, updated_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (user_id, username, user_display_name,
-                         nsfw_mode if nsfw_mode is not None else False,
-                         content_filter_level if content_filter_level is not None else 'strict',
-                         steam_id, steam_username,
-                         current_time if steam_id else None,
-                         current_time, current_time))
-
-                await db.commit()
-                return True
+                        await db.execute("""
+                            INSERT INTO user_settings (user_id, username, user_display_name, nsfw_mode,
+                                                     content_filter_level, steam_id, steam_username,
+                                                     steam_linked_at, created_at, updated_at)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        """, (self._pack_id(user_id), username, user_display_name,
+                             nsfw_mode if nsfw_mode is not None else False,
+                             content_filter_level if content_filter_level is not None else 'strict',
+                             steam_id, steam_username,
+                             current_time if steam_id else None,
+                             current_time, current_time))
+
+                    await db.commit()
+                    self._user_settings_cache.invalidate(user_id)
+                    return True
+
+            return await self._with_retry('update_user_settings', write)
 
         except Exception as e:
             print(f"❌ Error updating user settings: {e}")
@@ -498,32 +3011,37 @@ class MessageDatabase:
 
     async def get_guild_settings(self, guild_id: str) -> dict:
         """Get guild settings, creating default settings if they don't exist"""
+        cached = self._guild_settings_cache.get(guild_id)
+        if cached is not None:
+            return dict(cached)
+
         if not self.initialized:
             await self.initialize()
 
+        generation = self._guild_settings_cache.generation
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._read_connection() as db:
                 cursor = await db.execute("""
                     SELECT guild_id, guild_name, random_messages_enabled, bot_reply_enabled, reply_all_enabled, created_at, updated_at
                     FROM guild_settings
                     WHERE guild_id = ?
-                """, (guild_id,))
+                """, (self._pack_id(guild_id),))
 
                 result = await cursor.fetchone()
 
                 if result:
-                    return {
-                        'guild_id': result[0],
+                    settings = {
+                        'guild_id': self._unpack_id(result[0]),
                         'guild_name': result[1],
                         'random_messages_enabled': bool(result[2]),
                         'bot_reply_enabled': bool(result[3]),
                         'reply_all_enabled': bool(result[4]),
-                        'created_at': result[5],
-                        'updated_at': result[6]
+                        'created_at': self._unpack_time(result[5]),
+                        'updated_at': self._unpack_time(result[6])
                     }
                 else:
                     
-                    default_settings = {
+                    settings = {
                         'guild_id': guild_id,
                         'guild_name': None,
                         'random_messages_enabled': False,
@@ -532,7 +3050,9 @@ class MessageDatabase:
                         'created_at': datetime.utcnow().isoformat(),
                         'updated_at': datetime.utcnow().isoformat()
                     }
-                    return default_settings
+
+                self._guild_settings_cache.set(guild_id, settings, generation)
+                return dict(settings)
 
         except Exception as e:
             print(f"❌ Error getting guild settings: {e}")
@@ -556,56 +3076,60 @@ class MessageDatabase:
             await self.initialize()
 
         try:
-            current_time = datetime.utcnow().isoformat()
+            current_time = self._pack_time(datetime.utcnow())
 
-            async with aiosqlite.connect(self.db_path) as db:
+            async def write():
+                async with self._write_connection() as db:
                 
-                cursor = await db.execute("SELECT guild_id FROM guild_settings WHERE guild_id = ?", (guild_id,))
-                exists = await cursor.fetchone()
+                    cursor = await db.execute("SELECT guild_id FROM guild_settings WHERE guild_id = ?", (self._pack_id(guild_id),))
+                    exists = await cursor.fetchone()
 
-                if exists:
+                    if exists:
                     
-                    update_fields = []
-                    update_values = []
+                        update_fields = []
+                        update_values = []
 
-                    if guild_name is not None:
-                        update_fields.append("guild_name = ?")
-                        update_values.append(guild_name)
+                        if guild_name is not None:
+                            update_fields.append("guild_name = ?")
+                            update_values.append(guild_name)
 
-                    if random_messages_enabled is not None:
-                        update_fields.append("random_messages_enabled = ?")
-                        update_values.append(random_messages_enabled)
+                        if random_messages_enabled is not None:
+                            update_fields.append("random_messages_enabled = ?")
+                            update_values.append(random_messages_enabled)
 
-                    if bot_reply_enabled is not None:
-                        update_fields.append("bot_reply_enabled = ?")
-                        update_values.append(bot_reply_enabled)
+                        if bot_reply_enabled is not None:
+                            update_fields.append("bot_reply_enabled = ?")
+                            update_values.append(bot_reply_enabled)
 
-                    if reply_all_enabled is not None:
-                        update_fields.append("reply_all_enabled = ?")
-                        update_values.append(reply_all_enabled)
+                        if reply_all_enabled is not None:
+                            update_fields.append("reply_all_enabled = ?")
+                            update_values.append(reply_all_enabled)
 
-                    if update_fields:
-                        update_fields.append("updated_at = ?")
-                        update_values.append(current_time)
-                        update_values.append(guild_id)  
+                        if update_fields:
+                            update_fields.append("updated_at = ?")
+                            update_values.append(current_time)
+                            update_values.append(self._pack_id(guild_id))  
 
-                        query = f"UPDATE guild_settings SET {', '.join(update_fields)} WHERE guild_id = ?"
-                        await db.execute(query, update_values)
-                else:
+                            query = f"UPDATE guild_settings SET {', '.join(update_fields)} WHERE guild_id = ?"
+                            await db.execute(query, update_values)
+                    else:
                     
-                    await db.execute("""
-                        INSERT INTO guild_settings (guild_id, guild_name, random_messages_enabled,
-                                                  bot_reply_enabled, reply_all_enabled,
-                                                  created_at, updated_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, (guild_id, guild_name,
-                         random_messages_enabled if random_messages_enabled is not None else False,
-                         bot_reply_enabled if bot_reply_enabled is not None else False,
-                         reply_all_enabled if reply_all_enabled is not None else False,
-                         current_time, current_time))
-
-                await db.commit()
-                return True
+                        await db.execute("""
+                            INSERT INTO guild_settings (guild_id, guild_name, random_messages_enabled,
+                                                      bot_reply_enabled, reply_all_enabled,
+                                                      created_at, updated_at)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)
+                        """, (self._pack_id(guild_id), guild_name,
+                             random_messages_enabled if random_messages_enabled is not None else False,
+                             bot_reply_enabled if bot_reply_enabled is not None else False,
+                             reply_all_enabled if reply_all_enabled is not None else False,
+                             current_time, current_time))
+
+                    await db.commit()
+                    self._guild_settings_cache.invalidate(guild_id)
+                    return True
+
+            return await self._with_retry('update_guild_settings', write)
 
         except Exception as e:
             print(f"❌ Error updating guild settings: {e}")
@@ -613,37 +3137,44 @@ class MessageDatabase:
 
     async def get_channel_settings(self, channel_id: str, guild_id: str) -> dict:
         """Get channel settings, creating default settings if they don't exist"""
+        cached = self._channel_settings_cache.get(channel_id)
+        if cached is not None:
+            return dict(cached)
+
         if not self.initialized:
             await self.initialize()
 
+        generation = self._channel_settings_cache.generation
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._read_connection() as db:
                 cursor = await db.execute("""
                     SELECT channel_id, guild_id, reply_all_enabled, created_at, updated_at
                     FROM channel_settings
                     WHERE channel_id = ?
-                """, (channel_id,))
+                """, (self._pack_id(channel_id),))
 
                 result = await cursor.fetchone()
 
                 if result:
-                    return {
-                        'channel_id': result[0],
-                        'guild_id': result[1],
+                    settings = {
+                        'channel_id': self._unpack_id(result[0]),
+                        'guild_id': self._unpack_id(result[1]),
                         'reply_all_enabled': bool(result[2]),
-                        'created_at': result[3],
-                        'updated_at': result[4]
+                        'created_at': self._unpack_time(result[3]),
+                        'updated_at': self._unpack_time(result[4])
                     }
                 else:
                     
-                    default_settings = {
+                    settings = {
                         'channel_id': channel_id,
                         'guild_id': guild_id,
                         'reply_all_enabled': False,
                         'created_at': datetime.utcnow().isoformat(),
                         'updated_at': datetime.utcnow().isoformat()
                     }
-                    return default_settings
+
+                self._channel_settings_cache.set(channel_id, settings, generation)
+                return dict(settings)
 
         except Exception as e:
             print(f"❌ Error getting channel settings: {e}")
@@ -663,41 +3194,45 @@ class MessageDatabase:
             await self.initialize()
 
         try:
-            current_time = datetime.utcnow().isoformat()
+            current_time = self._pack_time(datetime.utcnow())
 
-            async with aiosqlite.connect(self.db_path) as db:
+            async def write():
+                async with self._write_connection() as db:
                 
-                cursor = await db.execute("SELECT channel_id FROM channel_settings WHERE channel_id = ?", (channel_id,))
-                exists = await cursor.fetchone()
+                    cursor = await db.execute("SELECT channel_id FROM channel_settings WHERE channel_id = ?", (self._pack_id(channel_id),))
+                    exists = await cursor.fetchone()
 
-                if exists:
+                    if exists:
                     
-                    update_fields = []
-                    update_values = []
+                        update_fields = []
+                        update_values = []
 
-                    if reply_all_enabled is not None:
-                        update_fields.append("reply_all_enabled = ?")
-                        update_values.append(reply_all_enabled)
+                        if reply_all_enabled is not None:
+                            update_fields.append("reply_all_enabled = ?")
+                            update_values.append(reply_all_enabled)
 
-                    if update_fields:
-                        update_fields.append("updated_at = ?")
-                        update_values.append(current_time)
-                        update_values.append(channel_id)  
+                        if update_fields:
+                            update_fields.append("updated_at = ?")
+                            update_values.append(current_time)
+                            update_values.append(self._pack_id(channel_id))  
 
-                        query = f"UPDATE channel_settings SET {', '.join(update_fields)} WHERE channel_id = ?"
-                        await db.execute(query, update_values)
-                else:
+                            query = f"UPDATE channel_settings SET {', '.join(update_fields)} WHERE channel_id = ?"
+                            await db.execute(query, update_values)
+                    else:
                     
-                    await db.execute("""
-                        INSERT INTO channel_settings (channel_id, guild_id, reply_all_enabled,
-                                                  created_at, updated_at)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (channel_id, guild_id,
-                         reply_all_enabled if reply_all_enabled is not None else False,
-                         current_time, current_time))
+                        await db.execute("""
+                            INSERT INTO channel_settings (channel_id, guild_id, reply_all_enabled,
+                                                      created_at, updated_at)
+                            VALUES (?, ?, ?, ?, ?)
+                        """, (self._pack_id(channel_id), self._pack_id(guild_id),
+                             reply_all_enabled if reply_all_enabled is not None else False,
+                             current_time, current_time))
 
-                await db.commit()
-                return True
+                    await db.commit()
+                    self._channel_settings_cache.invalidate(channel_id)
+                    return True
+
+            return await self._with_retry('update_channel_settings', write)
 
         except Exception as e:
             print(f"❌ Error updating channel settings: {e}")
@@ -709,16 +3244,14 @@ class MessageDatabase:
             await self.initialize()
 
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                cursor = await db.execute("""
-                    SELECT message_content
-                    FROM messages
+            async with self._read_connection() as db:
+                results = await self._newest_first(db, """
+                    SELECT content_text(content_codec, message_content)
+                    FROM {schema}.messages
                     WHERE channel_id = ? AND message_type = 'user' AND message_content != ''
                     ORDER BY timestamp DESC
                     LIMIT ?
-                """, (channel_id, limit))
-
-                results = await cursor.fetchall()
+                """, (self._pack_id(channel_id),), limit)
                 return [row[0] for row in results]
 
         except Exception as e:
@@ -731,7 +3264,7 @@ class MessageDatabase:
             await self.initialize()
 
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._read_connection() as db:
                 cursor = await db.execute("""
                     SELECT user_id, username, user_display_name, content_filter_level, updated_at
                     FROM user_settings
@@ -743,11 +3276,11 @@ class MessageDatabase:
 
                 return [
                     {
-                        'user_id': row[0],
+                        'user_id': self._unpack_id(row[0]),
                         'username': row[1],
                         'user_display_name': row[2],
                         'content_filter_level': row[3],
-                        'updated_at': row[4]
+                        'updated_at': self._unpack_time(row[4])
                     }
                     for row in results
                 ]
@@ -762,10 +3295,15 @@ class MessageDatabase:
             await self.initialize()
 
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("DELETE FROM user_settings WHERE user_id = ?", (user_id,))
-                await db.commit()
-                return True
+            async def write():
+                async with self._write_connection() as db:
+                    await db.execute("DELETE FROM user_settings WHERE user_id = ?", (self._pack_id(user_id),))
+                    await db.commit()
+                    self._user_settings_cache.invalidate(user_id)
+                    return True
+
+            return await self._with_retry('delete_user_settings', write)
+
         except Exception as e:
             print(f"❌ Error deleting user settings for {user_id}: {e}")
             return False
@@ -790,12 +3328,12 @@ class MessageDatabase:
                     'error': 'Invalid Steam ID format. Must be a 17-digit number.'
                 }
 
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._read_connection() as db:
                 
                 cursor = await db.execute("""
                     SELECT user_id FROM user_settings 
                     WHERE steam_id = ? AND user_id != ?
-                """, (steam_id, user_id))
+                """, (steam_id, self._pack_id(user_id)))
                 existing_link = await cursor.fetchone()
 
                 if existing_link:
@@ -808,7 +3346,7 @@ class MessageDatabase:
                 cursor = await db.execute("""
                     SELECT steam_id FROM user_settings 
                     WHERE user_id = ? AND steam_id IS NOT NULL AND steam_id != ?
-                """, (user_id, steam_id))
+                """, (self._pack_id(user_id), steam_id))
                 current_steam_id = await cursor.fetchone()
 
                 if current_steam_id and current_steam_id[0] != steam_id:
@@ -836,23 +3374,23 @@ class MessageDatabase:
             await self.initialize()
 
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._read_connection() as db:
                 cursor = await db.execute("""
                     SELECT user_id, summary_text, message_count_at_update,
                            last_updated, created_at
                     FROM user_summaries
                     WHERE user_id = ?
-                """, (user_id,))
+                """, (self._pack_id(user_id),))
 
                 result = await cursor.fetchone()
 
                 if result:
                     return {
-                        'user_id': result[0],
+                        'user_id': self._unpack_id(result[0]),
                         'summary_text': result[1],
                         'message_count_at_update': result[2],
-                        'last_updated': result[3],
-                        'created_at': result[4]
+                        'last_updated': self._unpack_time(result[3]),
+                        'created_at': self._unpack_time(result[4])
                     }
                 return None
 
@@ -866,30 +3404,33 @@ class MessageDatabase:
             await self.initialize()
 
         try:
-            current_time = datetime.utcnow().isoformat()
+            current_time = self._pack_time(datetime.utcnow())
 
-            async with aiosqlite.connect(self.db_path) as db:
+            async def write():
+                async with self._write_connection() as db:
                 
-                cursor = await db.execute("SELECT user_id FROM user_summaries WHERE user_id = ?", (user_id,))
-                exists = await cursor.fetchone()
+                    cursor = await db.execute("SELECT user_id FROM user_summaries WHERE user_id = ?", (self._pack_id(user_id),))
+                    exists = await cursor.fetchone()
 
-                if exists:
+                    if exists:
                     
-                    await db.execute("""
-                        UPDATE user_summaries
-                        SET summary_text = ?, message_count_at_update = ?, last_updated = ?
-                        WHERE user_id = ?
-                    """, (summary_text, message_count, current_time, user_id))
-                else:
+                        await db.execute("""
+                            UPDATE user_summaries
+                            SET summary_text = ?, message_count_at_update = ?, last_updated = ?
+                            WHERE user_id = ?
+                        """, (summary_text, message_count, current_time, self._pack_id(user_id)))
+                    else:
                     
-                    await db.execute("""
-                        INSERT INTO user_summaries (user_id, summary_text, message_count_at_update,
-                                                  last_updated, created_at)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (user_id, summary_text, message_count, current_time, current_time))
+                        await db.execute("""
+                            INSERT INTO user_summaries (user_id, summary_text, message_count_at_update,
+                                                      last_updated, created_at)
+                            VALUES (?, ?, ?, ?, ?)
+                        """, (self._pack_id(user_id), summary_text, message_count, current_time, current_time))
 
-                await db.commit()
-                return True
+                    await db.commit()
+                    return True
+
+            return await self._with_retry('update_user_summary', write)
 
         except Exception as e:
             print(f"❌ Error updating user summary: {e}")
@@ -897,17 +3438,8 @@ class MessageDatabase:
 
     async def get_message_count_for_user(self, user_id: str) -> int:
         """Get the total number of messages for a user"""
-        if not self.initialized:
-            await self.initialize()
-
-        try:
-            async with aiosqlite.connect(self.db_path) as db:
-                cursor = await db.execute("SELECT COUNT(*) FROM messages WHERE user_id = ?", (user_id,))
-                result = await cursor.fetchone()
-                return result[0] if result else 0
-        except Exception as e:
-            print(f"❌ Error getting message count for user: {e}")
-            return 0
+        counters = await self.get_message_counters('user', user_id)
+        return counters['message_count']
 
     async def get_recent_user_messages_for_summary(self, user_id: str, limit: int = 10) -> List[str]:
         """Get recent messages for a user to generate summary"""
@@ -915,19 +3447,40 @@ class MessageDatabase:
             await self.initialize()
 
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                cursor = await db.execute("""
-                    SELECT message_content
-                    FROM messages
+            async with self._read_connection() as db:
+                results = await self._newest_first(db, """
+                    SELECT content_text(content_codec, message_content)
+                    FROM {schema}.messages
                     WHERE user_id = ? AND message_type = 'user' AND message_content != ''
                     ORDER BY timestamp DESC
                     LIMIT ?
-                """, (user_id, limit))
-
-                results = await cursor.fetchall()
+                """, (self._pack_id(user_id),), limit)
                 
                 return [row[0] for row in reversed(results)]
 
         except Exception as e:
             print(f"❌ Error getting recent messages for summary: {e}")
             return []
+
+
+def create_message_database(db_path: str = "data/bot_messages.db", **kwargs) -> MessageDatabase:
+    """Create the configured message database: PostgreSQL when MESSAGE_DATABASE_URL is set,
+    otherwise the SQLite file at db_path"""
+    database_url = os.getenv("MESSAGE_DATABASE_URL", "")
+    if database_url:
+        from utils.postgres_database import PostgresMessageDatabase
+        return PostgresMessageDatabase(database_url, **kwargs)
+    return MessageDatabase(db_path, **kwargs)
+
+
+def get_message_database(bot) -> MessageDatabase:
+    """Get the bot-wide message database, creating it on first use.
+
+    It lives on the bot rather than on any cog, so every cog shares one set of
+    pools and caches and reloading a cog does not reopen or reinitialize it.
+    The SQLite file is DB_PATH, by default data/bot_messages.db.
+    """
+    db = getattr(bot, 'message_db', None)
+    if db is None:
+        db = bot.message_db = create_message_database(os.getenv("DB_PATH", "data/bot_messages.db"))
+    return db
@@ -0,0 +1,179 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+
+import aiohttp
+
+
+class HttpClient:
+    """Bot-wide HTTP client: one aiohttp session whose connection pool, DNS cache
+    and keep-alive connections are shared by every cog"""
+
+    # Connections kept open in total and to any one host
+    POOL_SIZE = 100
+    POOL_SIZE_PER_HOST = 20
+
+    # Seconds a resolved address and an idle connection are kept
+    DNS_CACHE_TTL = 300
+    KEEPALIVE_TIMEOUT = 60
+
+    # Defaults for requests that don't pass their own timeout
+    TIMEOUT = aiohttp.ClientTimeout(total=120, connect=10, sock_connect=10)
+
+    # Latencies kept per host for the percentiles in get_stats
+    LATENCY_SAMPLES = 512
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_lock = asyncio.Lock()
+        self._hosts: Dict[str, Dict[str, Any]] = {}
+
+    def _host_stats(self, host: str) -> Dict[str, Any]:
+        stats = self._hosts.get(host)
+        if stats is None:
+            stats = self._hosts[host] = {
+                'requests': 0,
+                'errors': 0,
+                'in_flight': 0,
+                'new_connections': 0,
+                'reused_connections': 0,
+                'dns_cache_hits': 0,
+                'dns_cache_misses': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'latencies': deque(maxlen=self.LATENCY_SAMPLES),
+            }
+        return stats
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        """Hooks that time every request and count connection and DNS cache reuse per host"""
+        trace = aiohttp.TraceConfig()
+
+        async def request_start(session, context, params):
+            context.started = time.perf_counter()
+            self._host_stats(params.url.host)['in_flight'] += 1
+
+        async def request_end(session, context, params):
+            stats = self._host_stats(params.url.host)
+            elapsed_ms = (time.perf_counter() - context.started) * 1000
+            stats['in_flight'] -= 1
+            stats['requests'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['latencies'].append(elapsed_ms)
+
+        async def request_exception(session, context, params):
+            stats = self._host_stats(params.url.host)
+            stats['in_flight'] -= 1
+            stats['errors'] += 1
+
+        async def connection_created(session, context, params):
+            context.new_connection = True
+
+        async def connection_reused(session, context, params):
+            context.new_connection = False
+
+        async def headers_sent(session, context, params):
+            # Connection events carry no URL, so they are attributed once the request is sent
+            new_connection = getattr(context, 'new_connection', None)
+            if new_connection is not None:
+                self._host_stats(params.url.host)['new_connections' if new_connection else 'reused_connections'] += 1
+                context.new_connection = None
+
+        async def dns_hit(session, context, params):
+            self._host_stats(params.host)['dns_cache_hits'] += 1
+
+        async def dns_miss(session, context, params):
+            self._host_stats(params.host)['dns_cache_misses'] += 1
+
+        trace.on_request_start.append(request_start)
+        trace.on_request_end.append(request_end)
+        trace.on_request_exception.append(request_exception)
+        trace.on_connection_create_end.append(connection_created)
+        trace.on_connection_reuseconn.append(connection_reused)
+        trace.on_request_headers_sent.append(headers_sent)
+        trace.on_dns_cache_hit.append(dns_hit)
+        trace.on_dns_cache_miss.append(dns_miss)
+        return trace
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """The shared session, created on first use inside the running event loop"""
+        if self._session is None or self._session.closed:
+            async with self._session_lock:
+                if self._session is None or self._session.closed:
+                    connector = aiohttp.TCPConnector(
+                        limit=self.POOL_SIZE,
+                        limit_per_host=self.POOL_SIZE_PER_HOST,
+                        ttl_dns_cache=self.DNS_CACHE_TTL,
+                        keepalive_timeout=self.KEEPALIVE_TIMEOUT,
+                    )
+                    self._session = aiohttp.ClientSession(
+                        connector=connector,
+                        timeout=self.TIMEOUT,
+                        trace_configs=[self._trace_config()],
+                    )
+        return self._session
+
+    @asynccontextmanager
+    async def session(self):
+        """Borrow the shared session; it stays open when the block exits"""
+        yield await self._get_session()
+
+    async def warm_up(self, *urls: str):
+        """Open a pooled connection to each URL's host, so the first real request skips DNS, TCP and TLS setup"""
+        session = await self._get_session()
+        for url in urls:
+            try:
+                async with session.head(url, timeout=aiohttp.ClientTimeout(total=10), allow_redirects=False):
+                    pass
+                print(f"🔥 Warmed up connection to {url}")
+            except Exception as e:
+                print(f"⚠️ Could not warm up connection to {url}: {e}")
+
+    async def close(self):
+        """Close the session and every pooled connection"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get request counts, latency percentiles and connection and DNS cache reuse per host"""
+        result = {}
+        for host, stats in self._hosts.items():
+            latencies = sorted(stats['latencies'])
+
+            def percentile(fraction: float) -> float:
+                if not latencies:
+                    return 0.0
+                return latencies[min(int(fraction * len(latencies)), len(latencies) - 1)]
+
+            connections = stats['new_connections'] + stats['reused_connections']
+            result[host] = {
+                'requests': stats['requests'],
+                'errors': stats['errors'],
+                'in_flight': stats['in_flight'],
+                'new_connections': stats['new_connections'],
+                'reused_connections': stats['reused_connections'],
+                'reuse_ratio': stats['reused_connections'] / connections if connections else 0.0,
+                'dns_cache_hits': stats['dns_cache_hits'],
+                'dns_cache_misses': stats['dns_cache_misses'],
+                'avg_ms': stats['total_ms'] / stats['requests'] if stats['requests'] else 0.0,
+                'p50_ms': percentile(0.50),
+                'p95_ms': percentile(0.95),
+                'max_ms': stats['max_ms'],
+            }
+        return result
+
+
+def get_http_client(bot) -> HttpClient:
+    """Get the bot-wide HTTP client, creating it on first use.
+
+    Like the message database it lives on the bot, so reloading a cog keeps
+    the pooled connections open.
+    """
+    client = getattr(bot, 'http_client', None)
+    if client is None:
+        client = bot.http_client = HttpClient()
+    return client
@@ -0,0 +1,649 @@
+"""
+PostgreSQL storage backend for MessageDatabase
+"""
+
+import asyncio
+import functools
+import itertools
+import json
+import re
+from contextlib import asynccontextmanager
+from typing import Optional, List, Dict, Any
+
+try:
+    import asyncpg
+    ASYNCPG_AVAILABLE = True
+except ImportError:
+    ASYNCPG_AVAILABLE = False
+
+from utils.database import MessageDatabase
+
+
+class PostgresCursor:
+    """Rows fetched by PostgresConnection.execute, read like an aiosqlite cursor"""
+
+    def __init__(self, rows: list, rowcount: int):
+        self._rows = rows
+        self._position = 0
+        self.rowcount = rowcount
+        self.lastrowid = None
+
+    async def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+        row = self._rows[self._position]
+        self._position += 1
+        return row
+
+    async def fetchall(self) -> list:
+        rows = self._rows[self._position:]
+        self._position = len(self._rows)
+        return rows
+
+
+class PostgresConnection:
+    """The part of the aiosqlite connection API MessageDatabase uses, over an asyncpg connection.
+
+    Statements keep SQLite's ? and ?N placeholders. As with sqlite3, the first
+    statement that changes anything opens a transaction, which lasts until
+    commit() or rollback().
+    """
+
+    # Statements run without opening a transaction
+    AUTOCOMMIT_VERBS = ('SELECT', 'WITH', 'EXPLAIN', 'SHOW', 'VACUUM')
+
+    def __init__(self, connection, trace=None):
+        self.connection = connection
+        self._trace = trace
+        self._transaction = None
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def _translate(sql: str) -> str:
+        """Rewrite ? and ?N placeholders as $N"""
+        positions = itertools.count(1)
+        return re.sub(r"\?(\d*)", lambda match: f"${match.group(1) or next(positions)}", sql)
+
+    async def _begin(self):
+        if self._transaction is None:
+            self._transaction = self.connection.transaction()
+            await self._transaction.start()
+
+    async def execute(self, sql: str, params=()) -> PostgresCursor:
+        sql = self._translate(sql)
+        params = tuple(params)
+        if self._trace is not None:
+            self._trace(sql, params)
+
+        verb = sql.lstrip().split(None, 1)[0].upper()
+        if verb not in self.AUTOCOMMIT_VERBS:
+            await self._begin()
+
+        if verb in ('SELECT', 'WITH', 'EXPLAIN', 'SHOW') or re.search(r"\bRETURNING\b", sql, re.IGNORECASE):
+            rows = await self.connection.fetch(sql, *params)
+            return PostgresCursor(rows, len(rows))
+
+        status = await self.connection.execute(sql, *params)
+        count = status.rsplit(' ', 1)[-1]
+        return PostgresCursor([], int(count) if count.isdigit() else -1)
+
+    async def executemany(self, sql: str, rows):
+        rows = [tuple(row) for row in rows]
+        if not rows:
+            return
+        await self._begin()
+        await self.connection.executemany(self._translate(sql), rows)
+
+    async def commit(self):
+        if self._transaction is not None:
+            transaction, self._transaction = self._transaction, None
+            await transaction.commit()
+
+    async def rollback(self):
+        if self._transaction is not None:
+            transaction, self._transaction = self._transaction, None
+            await transaction.rollback()
+
+
+class PostgresMessageDatabase(MessageDatabase):
+    """MessageDatabase stored in PostgreSQL, with reads served from an asyncpg pool.
+
+    Writes still go through the background queue and one writer connection,
+    so batching, counters and rollups work as they do on SQLite. Partitioning
+    and dictionary compression stay SQLite-only: retention deletes in batches
+    and PostgreSQL already compresses long bodies (TOAST). Search ranks are
+    the negated ts_rank, so lower is better as with bm25.
+    """
+
+    MAIN_SCHEMA = 'public'
+
+    # Key of the advisory lock held while migrating, so processes starting together take turns
+    MIGRATION_LOCK_ID = 7_046_105_311
+
+    NOW_MS_SQL = "(EXTRACT(EPOCH FROM clock_timestamp()) * 1000)::BIGINT"
+
+    # serialization_failure, deadlock_detected and lock_not_available: the
+    # transaction lost a race for a lock and can be run again
+    CONTENTION_SQLSTATES = ('40001', '40P01', '55P03')
+
+    INSERT_RESPONSE_SQL = """
+        INSERT INTO {schema}.responses
+        (original_message_id, message_rowid, response_message_id, response_content,
+         response_chunks, chunk_number, processing_time_ms, model_used,
+         tokens_used, timestamp, content_codec)
+        VALUES (?1, (SELECT id FROM {schema}.messages WHERE message_id = ?1),
+                ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9, ?10)
+        ON CONFLICT (response_message_id) DO UPDATE SET
+            original_message_id = excluded.original_message_id, message_rowid = excluded.message_rowid,
+            response_content = excluded.response_content, response_chunks = excluded.response_chunks,
+            chunk_number = excluded.chunk_number, processing_time_ms = excluded.processing_time_ms,
+            model_used = excluded.model_used, tokens_used = excluded.tokens_used,
+            timestamp = excluded.timestamp, content_codec = excluded.content_codec
+    """
+
+    UPSERT_COUNTER_SQL = """
+        INSERT INTO message_counters (scope, scope_id, message_count, response_count, user_count)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (scope, scope_id) DO UPDATE SET
+            message_count = message_counters.message_count + excluded.message_count,
+            response_count = message_counters.response_count + excluded.response_count,
+            user_count = message_counters.user_count + excluded.user_count
+    """
+
+    # LEAST and GREATEST skip NULLs, unlike SQLite's MIN and MAX
+    UPSERT_ROLLUP_SQL = """
+        INSERT INTO message_rollups
+        (period, bucket, scope, scope_id, label, message_count, response_count,
+         processing_ms_sum, processing_ms_count, processing_ms_min, processing_ms_max,
+         tokens_sum, first_at, last_at)
+        {source}
+        ON CONFLICT (period, scope, scope_id, bucket) DO UPDATE SET
+            label = COALESCE(excluded.label, message_rollups.label),
+            message_count = message_rollups.message_count + excluded.message_count,
+            response_count = message_rollups.response_count + excluded.response_count,
+            processing_ms_sum = message_rollups.processing_ms_sum + excluded.processing_ms_sum,
+            processing_ms_count = message_rollups.processing_ms_count + excluded.processing_ms_count,
+            processing_ms_min = LEAST(message_rollups.processing_ms_min, excluded.processing_ms_min),
+            processing_ms_max = GREATEST(message_rollups.processing_ms_max, excluded.processing_ms_max),
+            tokens_sum = message_rollups.tokens_sum + excluded.tokens_sum,
+            first_at = LEAST(message_rollups.first_at, excluded.first_at),
+            last_at = GREATEST(message_rollups.last_at, excluded.last_at)
+    """
+
+    # Search documents; the expression indexes in migration 1 must match these exactly
+    MESSAGE_VECTOR_SQL = "to_tsvector('simple', {alias}message_content || ' ' || {alias}username)"
+    RESPONSE_VECTOR_SQL = "to_tsvector('simple', {alias}response_content)"
+    HEADLINE_OPTIONS = "StartSel=**, StopSel=**, MaxWords=16, MinWords=8"
+
+    def __init__(self, dsn: str, read_pool_size: int = 4, **kwargs):
+        if not ASYNCPG_AVAILABLE:
+            raise RuntimeError("asyncpg is not installed; pip install asyncpg to store messages in PostgreSQL")
+
+        kwargs['partition_months'] = 0
+        kwargs['compress_content'] = False
+        super().__init__(dsn, read_pool_size, **kwargs)
+        self._pool = None
+        self._trace = None
+
+    async def initialize(self):
+        """Open the connection pool and bring the schema up to date"""
+        if self.initialized:
+            return
+
+        async with self._init_lock:
+            if self.initialized:
+                return
+
+            # The writer keeps one connection for itself
+            self._pool = await asyncpg.create_pool(
+                self.db_path, min_size=2, max_size=self.read_pool_size + self.snapshot_pool_size + 1
+            )
+            self._writer = PostgresConnection(await self._pool.acquire())
+            await self._migrate(self._writer)
+
+            self._write_queue = asyncio.Queue(maxsize=self.write_queue_size)
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+            self.initialized = True
+            print("✅ Message database initialized successfully (PostgreSQL)")
+
+    @asynccontextmanager
+    async def _read_connection(self):
+        """Borrow a connection from the pool"""
+        if not self.initialized:
+            await self.initialize()
+
+        async with self._pool.acquire() as connection:
+            reader = PostgresConnection(connection, self._trace)
+            try:
+                yield reader
+            finally:
+                await reader.rollback()
+
+    @asynccontextmanager
+    async def _snapshot_connection(self):
+        """Borrow a pooled connection inside a REPEATABLE READ, READ ONLY transaction"""
+        if not self.initialized:
+            await self.initialize()
+
+        async with self._pool.acquire() as connection:
+            started = self._snapshot_opened(id(connection))
+            try:
+                async with connection.transaction(isolation='repeatable_read', readonly=True):
+                    yield PostgresConnection(connection, self._trace)
+            finally:
+                self._snapshot_closed(id(connection), started)
+
+    @asynccontextmanager
+    async def _write_connection(self):
+        """Get exclusive access to the single writer connection"""
+        if not self.initialized:
+            await self.initialize()
+
+        async with self._timed_write_lock():
+            try:
+                yield self._writer
+            except Exception:
+                await self._writer.rollback()
+                raise
+
+    async def close(self):
+        """Close the pool, waiting for borrowed connections to be returned"""
+        if not self.initialized:
+            return
+
+        await self._stop_flusher()
+
+        async with self._write_lock:
+            self.initialized = False
+            await self._writer.rollback()
+            await self._pool.release(self._writer.connection)
+            self._writer = None
+            await self._pool.close()
+            self._pool = None
+
+        print("✅ Message database closed")
+
+    def _migrations(self) -> list:
+        """Ordered schema migrations, as for SQLite but recorded in the schema_version table.
+
+        Version 1 is the SQLite schema as of its migration 7, with search served
+        by expression GIN indexes instead of FTS5 tables. content_text and
+        group_concat stand in for the SQLite functions the shared queries call.
+        """
+        now = self.NOW_MS_SQL
+        return [
+            (1, "message log schema", [
+                f"""
+                    CREATE TABLE IF NOT EXISTS messages (
+                        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                        user_id BIGINT NOT NULL,
+                        username TEXT NOT NULL,
+                        user_display_name TEXT,
+                        channel_id BIGINT NOT NULL,
+                        channel_name TEXT,
+                        guild_id BIGINT,
+                        guild_name TEXT,
+                        message_id BIGINT NOT NULL UNIQUE,
+                        message_content TEXT NOT NULL,
+                        message_type TEXT DEFAULT 'user',
+                        has_attachments BOOLEAN DEFAULT FALSE,
+                        attachment_info TEXT,
+                        timestamp BIGINT NOT NULL,
+                        created_at BIGINT DEFAULT ({now}),
+                        content_codec INTEGER NOT NULL DEFAULT 0
+                    )
+                """,
+                f"""
+                    CREATE TABLE IF NOT EXISTS responses (
+                        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                        message_rowid BIGINT REFERENCES messages (id) ON DELETE SET NULL,
+                        original_message_id BIGINT NOT NULL,
+                        response_message_id BIGINT NOT NULL UNIQUE,
+                        response_content TEXT NOT NULL,
+                        response_chunks INTEGER DEFAULT 1,
+                        chunk_number INTEGER DEFAULT 1,
+                        processing_time_ms INTEGER,
+                        model_used TEXT,
+                        tokens_used INTEGER,
+                        timestamp BIGINT NOT NULL,
+                        created_at BIGINT DEFAULT ({now}),
+                        content_codec INTEGER NOT NULL DEFAULT 0
+                    )
+                """,
+                f"""
+                    CREATE TABLE IF NOT EXISTS user_settings (
+                        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                        user_id BIGINT NOT NULL UNIQUE,
+                        username TEXT,
+                        user_display_name TEXT,
+                        nsfw_mode BOOLEAN DEFAULT FALSE,
+                        content_filter_level TEXT DEFAULT 'strict',
+                        steam_id TEXT,
+                        steam_username TEXT,
+                        steam_linked_at BIGINT,
+                        created_at BIGINT DEFAULT ({now}),
+                        updated_at BIGINT DEFAULT ({now})
+                    )
+                """,
+                f"""
+                    CREATE TABLE IF NOT EXISTS guild_settings (
+                        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                        guild_id BIGINT NOT NULL UNIQUE,
+                        guild_name TEXT,
+                        random_messages_enabled BOOLEAN DEFAULT FALSE,
+                        bot_reply_enabled BOOLEAN DEFAULT FALSE,
+                        reply_all_enabled BOOLEAN DEFAULT FALSE,
+                        created_at BIGINT DEFAULT ({now}),
+                        updated_at BIGINT DEFAULT ({now})
+                    )
+                """,
+                f"""
+                    CREATE TABLE IF NOT EXISTS channel_settings (
+                        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                        channel_id BIGINT NOT NULL UNIQUE,
+                        guild_id BIGINT NOT NULL,
+                        reply_all_enabled BOOLEAN DEFAULT FALSE,
+                        created_at BIGINT DEFAULT ({now}),
+                        updated_at BIGINT DEFAULT ({now})
+                    )
+                """,
+                f"""
+                    CREATE TABLE IF NOT EXISTS user_summaries (
+                        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                        user_id BIGINT NOT NULL UNIQUE,
+                        summary_text TEXT NOT NULL,
+                        message_count_at_update INTEGER NOT NULL,
+                        last_updated BIGINT DEFAULT ({now}),
+                        created_at BIGINT DEFAULT ({now})
+                    )
+                """,
+                """
+                    CREATE TABLE IF NOT EXISTS message_counters (
+                        scope TEXT NOT NULL,
+                        scope_id TEXT NOT NULL,
+                        message_count BIGINT NOT NULL DEFAULT 0,
+                        response_count BIGINT NOT NULL DEFAULT 0,
+                        user_count BIGINT NOT NULL DEFAULT 0,
+                        PRIMARY KEY (scope, scope_id)
+                    )
+                """,
+                # Buckets and times compare bytewise, as they do in SQLite
+                """
+                    CREATE TABLE IF NOT EXISTS message_rollups (
+                        period TEXT NOT NULL,
+                        bucket TEXT COLLATE "C" NOT NULL,
+                        scope TEXT NOT NULL,
+                        scope_id TEXT NOT NULL,
+                        label TEXT,
+                        message_count BIGINT NOT NULL DEFAULT 0,
+                        response_count BIGINT NOT NULL DEFAULT 0,
+                        processing_ms_sum BIGINT NOT NULL DEFAULT 0,
+                        processing_ms_count BIGINT NOT NULL DEFAULT 0,
+                        processing_ms_min INTEGER,
+                        processing_ms_max INTEGER,
+                        tokens_sum BIGINT NOT NULL DEFAULT 0,
+                        first_at TEXT COLLATE "C",
+                        last_at TEXT COLLATE "C",
+                        PRIMARY KEY (period, scope, scope_id, bucket)
+                    )
+                """,
+                f"""
+                    CREATE TABLE IF NOT EXISTS compression_dictionaries (
+                        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                        dictionary BYTEA NOT NULL,
+                        sample_rows INTEGER NOT NULL,
+                        rows_compressed BIGINT NOT NULL DEFAULT 0,
+                        raw_bytes BIGINT NOT NULL DEFAULT 0,
+                        stored_bytes BIGINT NOT NULL DEFAULT 0,
+                        created_at BIGINT DEFAULT ({now})
+                    )
+                """,
+                "CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp)",
+                # SQLite indexes end in the rowid; here the id tiebreak of the history pages needs a column
+                "CREATE INDEX IF NOT EXISTS idx_messages_user_ts ON messages (user_id, timestamp, id)",
+                "CREATE INDEX IF NOT EXISTS idx_messages_user_type_ts ON messages (user_id, message_type, timestamp)",
+                "CREATE INDEX IF NOT EXISTS idx_messages_channel_type_ts ON messages (channel_id, message_type, timestamp)",
+                "CREATE INDEX IF NOT EXISTS idx_responses_timestamp ON responses (timestamp)",
+                "CREATE INDEX IF NOT EXISTS idx_responses_message_chunk ON responses (message_rowid, chunk_number)",
+                "CREATE INDEX IF NOT EXISTS idx_user_settings_steam_id ON user_settings (steam_id, user_id)",
+                "CREATE INDEX IF NOT EXISTS idx_user_settings_nsfw ON user_settings (nsfw_mode, updated_at)",
+                "CREATE INDEX IF NOT EXISTS idx_rollups_top_messages ON message_rollups (scope, message_count) WHERE period = 'total'",
+                "CREATE INDEX IF NOT EXISTS idx_rollups_top_responses ON message_rollups (scope, response_count) WHERE period = 'total'",
+                f"CREATE INDEX IF NOT EXISTS idx_messages_search ON messages USING GIN (({self.MESSAGE_VECTOR_SQL.format(alias='')}))",
+                f"CREATE INDEX IF NOT EXISTS idx_responses_search ON responses USING GIN (({self.RESPONSE_VECTOR_SQL.format(alias='')}))",
+                f"CREATE OR REPLACE VIEW all_messages AS SELECT {self.MESSAGE_COLUMNS} FROM messages",
+                f"CREATE OR REPLACE VIEW all_responses AS SELECT {self.RESPONSE_COLUMNS} FROM responses",
+                """
+                    CREATE OR REPLACE FUNCTION content_text(codec INTEGER, content TEXT) RETURNS TEXT
+                    LANGUAGE sql IMMUTABLE AS 'SELECT content'
+                """,
+                """
+                    CREATE OR REPLACE FUNCTION group_concat_step(text_so_far TEXT, value TEXT, separator TEXT) RETURNS TEXT
+                    LANGUAGE sql IMMUTABLE STRICT AS 'SELECT text_so_far || separator || value'
+                """,
+                "CREATE OR REPLACE AGGREGATE group_concat(TEXT, TEXT) (SFUNC = group_concat_step, STYPE = TEXT)",
+                self._rebuild_counters,
+            ]),
+        ]
+
+    async def _migrate(self, db, target_version: Optional[int] = None):
+        """Bring the schema up to date (or up to target_version), one transaction per migration"""
+        # Even IF NOT EXISTS races another process creating the table, so take the lock first
+        await db.execute("SELECT pg_advisory_lock(?)", (self.MIGRATION_LOCK_ID,))
+        try:
+            await db.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+            await db.commit()
+
+            cursor = await db.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+            current_version = (await cursor.fetchone())[0]
+
+            for version, description, steps in self._migrations():
+                if version <= current_version or (target_version is not None and version > target_version):
+                    continue
+
+                try:
+                    for step in steps:
+                        if callable(step):
+                            await step(db)
+                        else:
+                            await db.execute(step)
+                    await db.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
+                    await db.commit()
+                except Exception as e:
+                    await db.rollback()
+                    print(f"❌ Database migration {version} ({description}) failed: {e}")
+                    raise
+
+                print(f"🔄 Applied database migration {version}: {description}")
+        finally:
+            await db.execute("SELECT pg_advisory_unlock(?)", (self.MIGRATION_LOCK_ID,))
+
+    async def _response_link(self, db, schema: str) -> str:
+        return "m.id = r.message_rowid"
+
+    @classmethod
+    def _is_contention(cls, error: Exception) -> bool:
+        return getattr(error, 'sqlstate', None) in cls.CONTENTION_SQLSTATES
+
+    @staticmethod
+    def _fts_query(text: str) -> Optional[str]:
+        """Turn free text into a tsquery: every word must match, the last one as a prefix"""
+        words = re.findall(r"\w+", text or "")
+        if not words:
+            return None
+        return " & ".join(words[:-1] + [words[-1] + ":*"])
+
+    def _search_sql(self, source: str) -> tuple:
+        """(select list, FROM ... WHERE match clause, ORDER BY terms) for searching a source.
+
+        Equal ranks keep insertion order, as they do in an FTS5 rank sort.
+        """
+        if source == 'messages':
+            vector = self.MESSAGE_VECTOR_SQL.format(alias='m.')
+            select = f"""
+                SELECT m.message_id, m.user_id, m.username, m.user_display_name, m.channel_id,
+                       m.channel_name, m.guild_id, m.guild_name, m.timestamp,
+                       m.message_content as content,
+                       ts_headline('simple', m.message_content, q, '{self.HEADLINE_OPTIONS}') as snippet,
+                       -ts_rank({vector}, q) as rank
+            """
+            source_sql = f"""
+                FROM {{schema}}.messages m, to_tsquery('simple', ?) q
+                WHERE {vector} @@ q
+            """
+            order_by = "rank, m.id"
+        else:
+            vector = self.RESPONSE_VECTOR_SQL.format(alias='r.')
+            select = f"""
+                SELECT r.response_message_id, r.original_message_id, r.model_used, r.timestamp,
+                       m.user_id, m.username, m.channel_id, m.guild_id,
+                       r.response_content as content,
+                       ts_headline('simple', r.response_content, q, '{self.HEADLINE_OPTIONS}') as snippet,
+                       -ts_rank({vector}, q) as rank
+            """
+            source_sql = f"""
+                FROM {{schema}}.responses r
+                CROSS JOIN to_tsquery('simple', ?) q
+                LEFT JOIN {{schema}}.messages m ON m.id = r.message_rowid
+                WHERE {vector} @@ q
+            """
+            order_by = "rank, r.id"
+        return select, source_sql, order_by
+
+    async def _delete_expired_batch(self, db, cutoff: int, batch_size: int) -> tuple:
+        """Delete up to batch_size of the oldest messages before cutoff, with their
+        responses and counter contributions, returning (messages, responses) deleted"""
+        cursor = await db.execute("""
+            SELECT id FROM messages
+            WHERE timestamp < ?
+            ORDER BY timestamp
+            LIMIT ?
+        """, (cutoff, batch_size))
+        ids = [row[0] for row in await cursor.fetchall()]
+        if not ids:
+            return 0, 0
+
+        deltas, _, _ = await self._collect_counter_deltas(db, self.MAIN_SCHEMA, "m.id = ANY(?::BIGINT[])", (ids,), sign=-1)
+
+        cursor = await db.execute("DELETE FROM responses WHERE message_rowid = ANY(?::BIGINT[])", (ids,))
+        responses = cursor.rowcount
+
+        cursor = await db.execute("DELETE FROM messages WHERE id = ANY(?::BIGINT[])", (ids,))
+        messages = cursor.rowcount
+
+        await self._apply_counter_deltas(db, deltas)
+        await db.execute("DELETE FROM message_counters WHERE scope != 'global' AND message_count <= 0")
+        return messages, responses
+
+    async def _reclaim_space(self, pages_per_step: int = 1000) -> int:
+        # Autovacuum makes deleted rows' space reusable; there is no file to shrink
+        return 0
+
+    async def vacuum_database(self) -> bool:
+        """Run VACUUM ANALYZE now instead of waiting for autovacuum"""
+        if not self.initialized:
+            await self.initialize()
+
+        try:
+            await self.flush()
+            async with self._write_connection() as db:
+                await db.commit()
+                await db.execute("VACUUM (ANALYZE)")
+                return True
+        except Exception as e:
+            print(f"❌ Error vacuuming database: {e}")
+            return False
+
+    async def train_compression_dictionary(self) -> Optional[int]:
+        print("⚠️ Dictionary compression is SQLite-only; PostgreSQL compresses long bodies itself")
+        return None
+
+    async def get_database_health(self) -> Dict[str, Any]:
+        """Get database size, dead row counts and the last cleanup's throughput"""
+        if not self.initialized:
+            await self.initialize()
+
+        try:
+            async with self._read_connection() as db:
+                cursor = await db.execute("""
+                    SELECT pg_database_size(current_database()), COALESCE(SUM(n_live_tup), 0),
+                           COALESCE(SUM(n_dead_tup), 0), current_setting('autovacuum')
+                    FROM pg_stat_user_tables
+                """)
+                size, live_rows, dead_rows, autovacuum = await cursor.fetchone()
+
+            return {
+                'backend': 'postgresql',
+                'db_size_bytes': size,
+                'live_rows': live_rows,
+                'dead_rows': dead_rows,
+                'free_pages': 0,
+                'free_bytes': 0,
+                'auto_vacuum': 'autovacuum' if autovacuum == 'on' else 'off',
+                'wal_size_bytes': 0,
+                'partitions': 0,
+                'partition_size_bytes': 0,
+                'last_cleanup': dict(self._maintenance_stats),
+            }
+        except Exception as e:
+            print(f"❌ Error getting database health: {e}")
+            return {}
+
+    @classmethod
+    def _plan_nodes(cls, node: dict):
+        yield node
+        for child in node.get('Plans', []):
+            yield from cls._plan_nodes(child)
+
+    async def check_query_plans(self) -> Dict[str, List[str]]:
+        """Run each read method, EXPLAIN the SQL it issued, and report full scans.
+
+        Sequential scans and sorts are priced out for the EXPLAIN, so the
+        planner only picks one when no index can serve the query, whatever the
+        table sizes. Ordering full-text matches by rank always needs a sort and
+        is not reported. Returns a mapping of method name to offending plan
+        nodes; an empty dict means every query is served by an index.
+        """
+        if not self.initialized:
+            await self.initialize()
+
+        probe_id = '0'
+        traced = []
+        current = [None]
+
+        def trace(statement: str, params: tuple):
+            if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                traced.append((current[0], statement, params))
+
+        caches = (self._user_settings_cache, self._guild_settings_cache, self._channel_settings_cache)
+        for cache in caches:
+            cache.invalidate(probe_id)
+        self._conversation_cache.invalidate(self._pack_id(probe_id))
+
+        self._trace = trace
+        try:
+            for name, method, args in self._query_plan_probes(probe_id):
+                current[0] = name
+                await method(*args)
+        finally:
+            self._trace = None
+            for cache in caches:
+                cache.invalidate(probe_id)
+            self._conversation_cache.invalidate(self._pack_id(probe_id))
+
+        problems = {}
+        async with self._pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute("SET LOCAL enable_seqscan = off")
+                await connection.execute("SET LOCAL enable_sort = off")
+                for name, statement, params in traced:
+                    plan = json.loads(await connection.fetchval(f"EXPLAIN (FORMAT JSON) {statement}", *params))
+                    for node in self._plan_nodes(plan[0]['Plan']):
+                        if node['Node Type'] == 'Seq Scan':
+                            problems.setdefault(name, []).append(f"Seq Scan on {node.get('Relation Name')}")
+                        elif node['Node Type'] in ('Sort', 'Incremental Sort') \
+                                and not any('ts_rank' in key for key in node.get('Sort Key', [])):
+                            problems.setdefault(name, []).append(f"Sort by {', '.join(node.get('Sort Key', []))}")
+
+        return problems
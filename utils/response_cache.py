@@ -0,0 +1,398 @@
+import asyncio
+import difflib
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import aiosqlite
+
+
+class ResponseCache:
+    """Cache of finished AI replies, looked up before any OpenRouter call.
+
+    Entries are keyed on a hash of the model, the system prompt, the last
+    CONTEXT_MESSAGES of conversation and the normalized user message, so a
+    reply is only reused for the same prompt in the same situation. Prompts
+    with a link are answered from the link alone and skip the context. A
+    bounded LRU dict in memory sits in front of an optional SQLite file.
+
+    With near_duplicates on, a miss also looks for an entry in the same scope
+    whose user message has a SimHash within NEAR_DUPLICATE_DISTANCE bits, so
+    typos and a few added or dropped words hit too. Numbers and links are part
+    of the scope, so "2+2" never answers "2+3". Splitting the hash into more
+    bands than that distance means any match shares at least one band exactly,
+    which is what both tiers index.
+
+    A close SimHash only makes an entry a candidate: swapping one word changes
+    few trigrams, so "a joke about cats" lands near "a joke about dogs". The
+    words must also overlap by NEAR_DUPLICATE_MIN_OVERLAP, counting a
+    misspelling as the same word, and no word may be swapped for another.
+    """
+
+    # Seconds an entry lives, by what the answer depends on
+    CATEGORY_TTLS = {
+        'weather': 600,
+        'search': 1800,
+        'general': 3600,
+        'link': 86400,
+    }
+
+    CONTEXT_MESSAGES = 2
+
+    NEAR_DUPLICATE_DISTANCE = 6
+    NEAR_DUPLICATE_MIN_LENGTH = 16
+    NEAR_DUPLICATE_MIN_OVERLAP = 0.8
+    TYPO_MIN_RATIO = 0.8
+    SIMHASH_BANDS = 8
+
+    # Most rows kept in the SQLite tier; expired rows go first
+    DB_MAX_ROWS = 50000
+    DB_PURGE_EVERY = 200
+
+    URL_PATTERN = re.compile(r'https?://\S+', re.IGNORECASE)
+    ANCHOR_PATTERN = re.compile(r'https?://\S+|\d+', re.IGNORECASE)
+    MENTION_PATTERN = re.compile(r'<[@#][!&]?\d+>')
+
+    def __init__(self, maxsize: int = 2048, db_path: Optional[str] = None, near_duplicates: bool = False):
+        self.enabled = maxsize > 0
+        self.maxsize = max(1, maxsize)
+        self.db_path = db_path
+        self.near_duplicates = near_duplicates
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._bands: Dict[tuple, set] = {}
+        self._db: Optional[aiosqlite.Connection] = None
+        self._db_lock = asyncio.Lock()
+        self._stores_since_purge = 0
+        self._stats = {
+            'lookups': 0,
+            'memory_hits': 0,
+            'db_hits': 0,
+            'near_duplicate_hits': 0,
+            'misses': 0,
+            'bypassed': 0,
+            'stores': 0,
+            'evictions': 0,
+        }
+        self._category_hits: Dict[str, int] = {}
+
+    # Keys
+
+    def normalize(self, text: str) -> str:
+        text = self.MENTION_PATTERN.sub(" ", text.lower()).replace("@gork", " ")
+        text = re.sub(r"[^\w\s:/.?=&%-]", "", text)
+        return re.sub(r"\s+", " ", text).strip(" ?!.")
+
+    def simhash(self, text: str) -> int:
+        """64-bit SimHash over character trigrams"""
+        weights = [0] * 64
+        padded = f"  {text}  "
+        for i in range(len(padded) - 2):
+            value = int.from_bytes(hashlib.blake2b(padded[i:i + 3].encode(), digest_size=8).digest(), 'big')
+            for bit in range(64):
+                weights[bit] += 1 if value >> bit & 1 else -1
+        return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+    def _is_typo_of(self, word: str, others) -> bool:
+        return any(difflib.SequenceMatcher(None, word, other).ratio() >= self.TYPO_MIN_RATIO for other in others)
+
+    def same_words(self, content: str, other: str) -> bool:
+        """Whether two normalized messages differ only by typos and a few added or dropped words"""
+        words, other_words = set(content.split()), set(other.split())
+        only_here = [word for word in words - other_words if not self._is_typo_of(word, other_words - words)]
+        only_there = [word for word in other_words - words if not self._is_typo_of(word, words - other_words)]
+        # A word replaced by a different one changes what is being asked
+        if only_here and only_there:
+            return False
+        shared = len(words & other_words) + len(words - other_words) - len(only_here)
+        return shared / (shared + len(only_here) + len(only_there)) >= self.NEAR_DUPLICATE_MIN_OVERLAP
+
+    def _band_values(self, simhash: int) -> list:
+        width = 64 // self.SIMHASH_BANDS
+        return [(simhash >> (band * width)) & ((1 << width) - 1) for band in range(self.SIMHASH_BANDS)]
+
+    def make_key(self, messages: list, model: str) -> Optional[dict]:
+        """Cache key, scope and SimHash for a request, or None if it can't be cached"""
+        if not self.enabled or not messages or messages[-1].get("role") != "user" or not isinstance(messages[-1].get("content"), str):
+            return None
+
+        system = messages[0]["content"] if messages[0].get("role") == "system" else ""
+        user_content = self.normalize(messages[-1]["content"])
+        if not user_content or not isinstance(system, str):
+            return None
+
+        context = []
+        if not self.URL_PATTERN.search(user_content):
+            for message in messages[1:-1][-self.CONTEXT_MESSAGES:]:
+                if not isinstance(message.get("content"), str):
+                    return None
+                context.append([message["role"], re.sub(r"\s+", " ", message["content"]).strip()])
+
+        anchors = self.ANCHOR_PATTERN.findall(user_content)
+        scope = hashlib.sha256(json.dumps([model, system, context, anchors]).encode()).hexdigest()
+        key = hashlib.sha256(f"{scope}\n{user_content}".encode()).hexdigest()
+        simhash = None
+        if self.near_duplicates and len(user_content) >= self.NEAR_DUPLICATE_MIN_LENGTH:
+            simhash = self.simhash(user_content)
+        return {'key': key, 'scope': scope, 'simhash': simhash, 'content': user_content}
+
+    def category_for(self, user_content: str, categories) -> str:
+        """TTL category for a reply: the shortest-lived of the categories its tools map to, else link or general"""
+        categories = [category for category in categories if category in self.CATEGORY_TTLS]
+        if categories:
+            return min(categories, key=self.CATEGORY_TTLS.get)
+        return 'link' if self.URL_PATTERN.search(user_content) else 'general'
+
+    # SQLite tier
+
+    async def _get_db(self) -> Optional[aiosqlite.Connection]:
+        if not self.db_path:
+            return None
+        if self._db is None:
+            async with self._db_lock:
+                if self._db is None:
+                    try:
+                        directory = os.path.dirname(self.db_path)
+                        if directory:
+                            os.makedirs(directory, exist_ok=True)
+                        db = await aiosqlite.connect(self.db_path)
+                        await db.execute("PRAGMA journal_mode = WAL")
+                        await db.execute("PRAGMA synchronous = NORMAL")
+                        await db.execute('''
+                            CREATE TABLE IF NOT EXISTS response_cache (
+                                cache_key TEXT PRIMARY KEY,
+                                scope TEXT NOT NULL,
+                                simhash INTEGER,
+                                {band_columns}
+                                content TEXT,
+                                category TEXT NOT NULL,
+                                response TEXT NOT NULL,
+                                created_at REAL NOT NULL,
+                                expires_at REAL NOT NULL
+                            )
+                        '''.format(band_columns="".join(f"band{band} INTEGER, " for band in range(self.SIMHASH_BANDS))))
+                        cursor = await db.execute("PRAGMA table_info(response_cache)")
+                        if 'content' not in {row[1] for row in await cursor.fetchall()}:
+                            await db.execute("ALTER TABLE response_cache ADD COLUMN content TEXT")
+                        await db.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_expires ON response_cache(expires_at)")
+                        for band in range(self.SIMHASH_BANDS):
+                            await db.execute(f"CREATE INDEX IF NOT EXISTS idx_response_cache_band{band} "
+                                             f"ON response_cache(scope, band{band}) WHERE band{band} IS NOT NULL")
+                        await db.commit()
+                        self._db = db
+                        print(f"✅ Response cache database ready at {self.db_path}")
+                    except Exception as e:
+                        print(f"❌ Could not open response cache database, using memory only: {e}")
+                        self.db_path = None
+        return self._db
+
+    async def _purge_db(self, db: aiosqlite.Connection):
+        await db.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+        cursor = await db.execute("SELECT COUNT(*) FROM response_cache")
+        excess = (await cursor.fetchone())[0] - self.DB_MAX_ROWS
+        if excess > 0:
+            await db.execute('''
+                DELETE FROM response_cache WHERE cache_key IN (
+                    SELECT cache_key FROM response_cache ORDER BY expires_at LIMIT ?
+                )
+            ''', (excess,))
+
+    # Lookups
+
+    def _remember(self, key: dict, entry: dict):
+        self._entries[key['key']] = entry
+        self._entries.move_to_end(key['key'])
+        if entry['simhash'] is not None:
+            for band, value in enumerate(self._band_values(entry['simhash'])):
+                self._bands.setdefault((key['scope'], band, value), set()).add(key['key'])
+
+        while len(self._entries) > self.maxsize:
+            self._forget(next(iter(self._entries)))
+            self._stats['evictions'] += 1
+
+    def _forget(self, cache_key: str):
+        entry = self._entries.pop(cache_key, None)
+        if entry is not None and entry['simhash'] is not None:
+            for band, value in enumerate(self._band_values(entry['simhash'])):
+                keys = self._bands.get((entry['scope'], band, value))
+                if keys is not None:
+                    keys.discard(cache_key)
+                    if not keys:
+                        del self._bands[(entry['scope'], band, value)]
+
+    def _near_duplicate_in_memory(self, key: dict) -> Optional[dict]:
+        candidates = set()
+        for band, value in enumerate(self._band_values(key['simhash'])):
+            candidates |= self._bands.get((key['scope'], band, value), set())
+
+        now = time.time()
+        for cache_key in candidates:
+            entry = self._entries.get(cache_key)
+            if entry and entry['expires_at'] > now and \
+                    bin(entry['simhash'] ^ key['simhash']).count("1") <= self.NEAR_DUPLICATE_DISTANCE and \
+                    self.same_words(entry['content'], key['content']):
+                self._entries.move_to_end(cache_key)
+                return entry
+        return None
+
+    async def _lookup_db(self, key: dict) -> Optional[dict]:
+        db = await self._get_db()
+        if db is None:
+            return None
+
+        now = time.time()
+        cursor = await db.execute(
+            "SELECT scope, simhash, category, response, expires_at FROM response_cache WHERE cache_key = ? AND expires_at > ?",
+            (key['key'], now)
+        )
+        row = await cursor.fetchone()
+        near_duplicate = False
+
+        if row is None and key['simhash'] is not None:
+            bands = self._band_values(key['simhash'])
+            band_filter = " OR ".join(f"band{band} = ?" for band in range(self.SIMHASH_BANDS))
+            cursor = await db.execute(
+                "SELECT scope, simhash, category, response, expires_at, content FROM response_cache "
+                f"WHERE scope = ? AND expires_at > ? AND ({band_filter})",
+                (key['scope'], now, *bands)
+            )
+            for candidate in await cursor.fetchall():
+                if bin((candidate[1] % (1 << 64)) ^ key['simhash']).count("1") <= self.NEAR_DUPLICATE_DISTANCE and \
+                        candidate[5] is not None and self.same_words(candidate[5], key['content']):
+                    row = candidate[:5]
+                    near_duplicate = True
+                    break
+
+        if row is None:
+            return None
+
+        scope, simhash, category, response, expires_at = row
+        entry = {
+            'scope': scope,
+            'simhash': simhash % (1 << 64) if simhash is not None else None,
+            'category': category,
+            'response': response,
+            'expires_at': expires_at,
+        }
+        # Copy into memory under the requested key so the next lookup stays there
+        self._remember(key, dict(entry, simhash=key['simhash'], content=key['content']))
+        return dict(entry, near_duplicate=near_duplicate)
+
+    async def get(self, key: Optional[dict]) -> Optional[str]:
+        """The cached reply for a key from make_key, or None"""
+        if key is None:
+            return None
+        self._stats['lookups'] += 1
+
+        try:
+            entry = self._entries.get(key['key'])
+            if entry is not None and entry['expires_at'] <= time.time():
+                self._forget(key['key'])
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key['key'])
+            elif key['simhash'] is not None:
+                entry = self._near_duplicate_in_memory(key)
+                if entry is not None:
+                    self._stats['near_duplicate_hits'] += 1
+
+            if entry is not None:
+                self._stats['memory_hits'] += 1
+            else:
+                entry = await self._lookup_db(key)
+                if entry is not None:
+                    self._stats['db_hits'] += 1
+                    if entry['near_duplicate']:
+                        self._stats['near_duplicate_hits'] += 1
+        except Exception as e:
+            print(f"❌ Response cache lookup failed: {e}")
+            entry = None
+
+        if entry is None:
+            self._stats['misses'] += 1
+            return None
+
+        self._category_hits[entry['category']] = self._category_hits.get(entry['category'], 0) + 1
+        return entry['response']
+
+    async def set(self, key: Optional[dict], response: str, category: str):
+        """Store a finished reply under a key from make_key"""
+        if key is None or not response or not response.strip():
+            return
+
+        now = time.time()
+        entry = {
+            'scope': key['scope'],
+            'simhash': key['simhash'],
+            'content': key['content'],
+            'category': category,
+            'response': response,
+            'expires_at': now + self.CATEGORY_TTLS.get(category, self.CATEGORY_TTLS['general']),
+        }
+        self._remember(key, entry)
+        self._stats['stores'] += 1
+
+        try:
+            db = await self._get_db()
+            if db is None:
+                return
+
+            simhash = key['simhash']
+            bands = self._band_values(simhash) if simhash is not None else [None] * self.SIMHASH_BANDS
+            if simhash is not None and simhash >= 1 << 63:
+                simhash -= 1 << 64
+            band_columns = "".join(f"band{band}, " for band in range(self.SIMHASH_BANDS))
+            await db.execute(f'''
+                INSERT OR REPLACE INTO response_cache
+                    (cache_key, scope, simhash, {band_columns}content, category, response, created_at, expires_at)
+                VALUES ({"?, " * (self.SIMHASH_BANDS + 7)}?)
+            ''', (key['key'], key['scope'], simhash, *bands, key['content'], category, response, now, entry['expires_at']))
+
+            self._stores_since_purge += 1
+            if self._stores_since_purge >= self.DB_PURGE_EVERY:
+                self._stores_since_purge = 0
+                await self._purge_db(db)
+            await db.commit()
+        except Exception as e:
+            print(f"❌ Could not store response in cache database: {e}")
+
+    def record_bypass(self):
+        """Count a request that skipped the cache (personalized, NSFW or attachments)"""
+        self._stats['bypassed'] += 1
+
+    async def close(self):
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get lookup, hit and store counters, with hit rates over lookups and over all requests"""
+        stats = dict(self._stats)
+        hits = stats['memory_hits'] + stats['db_hits']
+        requests = stats['lookups'] + stats['bypassed']
+        stats['hits'] = hits
+        stats['hit_rate'] = hits / stats['lookups'] if stats['lookups'] else 0.0
+        stats['overall_hit_rate'] = hits / requests if requests else 0.0
+        stats['size'] = len(self._entries)
+        stats['maxsize'] = self.maxsize
+        stats['hits_by_category'] = dict(self._category_hits)
+        return stats
+
+
+def get_response_cache(bot) -> ResponseCache:
+    """Get the bot-wide AI response cache, creating it on first use.
+
+    RESPONSE_CACHE_SIZE bounds the memory tier, RESPONSE_CACHE_DB adds the
+    SQLite tier and RESPONSE_CACHE_NEAR_DUPLICATES turns on SimHash matching.
+    """
+    cache = getattr(bot, 'response_cache', None)
+    if cache is None:
+        cache = bot.response_cache = ResponseCache(
+            maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "2048")),
+            db_path=os.getenv("RESPONSE_CACHE_DB") or None,
+            near_duplicates=os.getenv("RESPONSE_CACHE_NEAR_DUPLICATES", "").lower() in ("1", "true", "yes", "on"),
+        )
+    return cache
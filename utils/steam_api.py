@@ -1,13 +1,16 @@
 import os
-import httpx
+import aiohttp
 from typing import Optional
 
-async def resolve_vanity_url(vanity_url: str) -> Optional[str]:
+from utils.http_client import HttpClient
+
+async def resolve_vanity_url(vanity_url: str, http: HttpClient) -> Optional[str]:
     """
     Resolves a Steam custom URL (vanity URL) to a 64-bit Steam ID.
 
     Args:
         vanity_url (str): The Steam custom URL (vanity URL).
+        http (HttpClient): The bot-wide HTTP client to send the request with.
 
     Returns:
         Optional[str]: The 64-bit Steam ID as a string if successful,
@@ -25,10 +28,10 @@ async def resolve_vanity_url(vanity_url: str) -> Optional[str]:
     }
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_url, params=params)
-            response.raise_for_status()  
-            data = response.json()
+        async with http.session() as session:
+            async with session.get(api_url, params=params) as response:
+                response.raise_for_status()
+                data = await response.json()
 
             if data and data.get("response", {}).get("success") == 1:
                 steam_id = str(data["response"]["steamid"])
@@ -36,11 +39,11 @@ async def resolve_vanity_url(vanity_url: str) -> Optional[str]:
             else:
                 print(f"Failed to resolve vanity URL '{vanity_url}': {data.get('response', {}).get('message', 'Unknown error')}")
                 return None
-    except httpx.RequestError as e:
-        print(f"An error occurred while requesting {e.request.url!r}: {e}")
+    except aiohttp.ClientResponseError as e:
+        print(f"Error response {e.status} while requesting {api_url!r}: {e}")
         return None
-    except httpx.HTTPStatusError as e:
-        print(f"Error response {e.response.status_code} while requesting {e.request.url!r}: {e}")
+    except aiohttp.ClientError as e:
+        print(f"An error occurred while requesting {api_url!r}: {e}")
         return None
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
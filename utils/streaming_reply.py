@@ -0,0 +1,95 @@
+import re
+import time
+from typing import Awaitable, Callable, Iterable, List, Optional, Tuple
+
+import discord
+
+
+class StreamingReply:
+    """A Discord reply that grows while the AI response streams in.
+
+    The first message is posted as soon as there is text to show and then edited
+    at most once per EDIT_INTERVAL_S. Text past MESSAGE_LIMIT rolls over into a
+    new message, split at the same 2000 character boundaries as a finished reply.
+    """
+
+    MESSAGE_LIMIT = 2000
+
+    # Discord allows 5 edits per 5 seconds in a channel; stay under that
+    EDIT_INTERVAL_S = 1.2
+
+    def __init__(self,
+                 send: Callable[[str], Awaitable[discord.Message]],
+                 prefix: str = "",
+                 hidden_pattern: Optional[re.Pattern] = None,
+                 hidden_markers: Iterable[str] = ()):
+        self.send = send
+        self.prefix = prefix
+        self.hidden_pattern = hidden_pattern
+        self.hidden_markers = [marker.upper() + ":" for marker in hidden_markers]
+        self.text = ""
+        self.messages: List[discord.Message] = []
+        self.contents: List[str] = []
+        self.last_edit = 0.0
+
+    def _visible(self) -> str:
+        """Streamed text without tool calls, or the start of one still arriving"""
+        text = self.text
+        if self.hidden_pattern is not None:
+            text = self.hidden_pattern.sub("", text)
+
+        tail = text.upper()
+        markers = self.hidden_markers
+        for length in range(min(len(tail), max((len(m) for m in markers), default=0)), 0, -1):
+            if any(marker.startswith(tail[-length:].lstrip("*")) for marker in markers):
+                text = text[:-length]
+                break
+
+        text = text.rstrip("* \n")
+        return self.prefix + text if text.strip() else ""
+
+    async def _sync(self, content: str):
+        """Make the sent messages show content, sending or editing only what changed"""
+        chunks = [content[i:i + self.MESSAGE_LIMIT] for i in range(0, len(content), self.MESSAGE_LIMIT)]
+
+        for index, chunk in enumerate(chunks):
+            if index < len(self.messages):
+                if self.contents[index] != chunk:
+                    await self.messages[index].edit(content=chunk)
+                    self.contents[index] = chunk
+            else:
+                self.messages.append(await self.send(chunk))
+                self.contents.append(chunk)
+
+        while len(self.messages) > len(chunks):
+            surplus = self.messages.pop()
+            self.contents.pop()
+            try:
+                await surplus.delete()
+            except discord.HTTPException as e:
+                print(f"⚠️ Could not delete surplus streamed message: {e}")
+
+        self.last_edit = time.monotonic()
+
+    async def feed(self, token: str):
+        """Add streamed text, updating Discord when the edit interval allows"""
+        self.text += token
+        content = self._visible()
+        if not content:
+            return
+        if self.messages and time.monotonic() - self.last_edit < self.EDIT_INTERVAL_S:
+            return
+        try:
+            await self._sync(content)
+        except discord.HTTPException as e:
+            # A failed edit is retried on the next token or in finish()
+            print(f"⚠️ Streaming edit failed: {e}")
+
+    def restart(self):
+        """Stream a new response into the messages already sent"""
+        self.text = ""
+
+    async def finish(self, final_text: str) -> List[Tuple[discord.Message, str]]:
+        """Show final_text exactly and return each sent message with its content"""
+        await self._sync(final_text)
+        return list(zip(self.messages, self.contents))
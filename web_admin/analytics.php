@@ -10,25 +10,24 @@ try {
     die('Database connection failed: ' . $e->getMessage());
 }
 
-// Get analytics data
+// Get analytics data from the rollups the bot maintains as it logs
 function getAnalytics($pdo) {
     $analytics = [];
     
     // Messages by day (last 30 days)
     $stmt = $pdo->query("
-        SELECT DATE(timestamp) as date, COUNT(*) as count 
-        FROM messages 
-        WHERE datetime(timestamp) > datetime('now', '-30 days')
-        GROUP BY DATE(timestamp) 
-        ORDER BY date DESC
+        SELECT bucket as date, message_count as count 
+        FROM message_rollups 
+        WHERE period = 'day' AND scope = 'global' AND scope_id = '' AND bucket >= date('now', '-30 days')
+        ORDER BY bucket DESC
     ");
     $analytics['messages_by_day'] = $stmt->fetchAll(PDO::FETCH_ASSOC);
     
     // Top users by message count
     $stmt = $pdo->query("
-        SELECT username, COUNT(*) as message_count 
-        FROM messages 
-        GROUP BY user_id, username 
+        SELECT COALESCE(label, scope_id) as username, message_count 
+        FROM message_rollups 
+        WHERE period = 'total' AND scope = 'user' 
         ORDER BY message_count DESC 
         LIMIT 10
     ");
@@ -36,33 +35,33 @@ function getAnalytics($pdo) {
     
     // Model usage statistics
     $stmt = $pdo->query("
-        SELECT model_used, COUNT(*) as usage_count, AVG(processing_time_ms) as avg_time
-        FROM responses 
-        WHERE model_used IS NOT NULL 
-        GROUP BY model_used 
-        ORDER BY usage_count DESC
+        SELECT scope_id as model_used, response_count as usage_count,
+               processing_ms_sum * 1.0 / NULLIF(processing_ms_count, 0) as avg_time
+        FROM message_rollups 
+        WHERE period = 'total' AND scope = 'model' 
+        ORDER BY response_count DESC
     ");
     $analytics['model_usage'] = $stmt->fetchAll(PDO::FETCH_ASSOC);
     
     // Processing time statistics
     $stmt = $pdo->query("
         SELECT 
-            AVG(processing_time_ms) as avg_time,
-            MIN(processing_time_ms) as min_time,
-            MAX(processing_time_ms) as max_time,
-            COUNT(*) as total_responses
-        FROM responses 
-        WHERE processing_time_ms IS NOT NULL
+            processing_ms_sum * 1.0 / NULLIF(processing_ms_count, 0) as avg_time,
+            processing_ms_min as min_time,
+            processing_ms_max as max_time,
+            processing_ms_count as total_responses
+        FROM message_rollups 
+        WHERE period = 'total' AND scope = 'global' AND scope_id = ''
     ");
-    $analytics['processing_stats'] = $stmt->fetch(PDO::FETCH_ASSOC);
+    $analytics['processing_stats'] = $stmt->fetch(PDO::FETCH_ASSOC) ?: ['total_responses' => 0];
     
     // Channel activity
     $stmt = $pdo->query("
         SELECT 
-            COALESCE(channel_name, 'Direct Message') as channel,
-            COUNT(*) as message_count 
-        FROM messages 
-        GROUP BY channel_id, channel_name 
+            COALESCE(label, 'Direct Message') as channel,
+            message_count 
+        FROM message_rollups 
+        WHERE period = 'total' AND scope = 'channel' 
         ORDER BY message_count DESC 
         LIMIT 10
     ");
@@ -17,4 +17,60 @@ function requireLogin() {
         exit;
     }
 }
+
+// Turn free text into an FTS5 query: every word must match, the last one as a prefix
+function ftsQuery($text) {
+    preg_match_all('/[\p{L}\p{N}_]+/u', $text, $matches);
+    $words = $matches[0];
+    if (!$words) {
+        return null;
+    }
+    $last = array_pop($words);
+    $terms = array_map(function ($word) { return '"' . $word . '"'; }, $words);
+    $terms[] = '"' . $last . '"*';
+    return implode(' ', $terms);
+}
+
+// Stored timestamps are epoch milliseconds in UTC
+function formatTimestamp($format, $timestamp) {
+    return gmdate($format, intdiv((int)$timestamp, 1000));
+}
+
+// Message and response bodies may be stored compressed: content_codec is the id of
+// the compression_dictionaries row they were deflated against, 0 for plain text.
+// The triggers that keep the search index current call content_text() too, so
+// every connection that reads bodies or deletes rows has to register it.
+function registerContentFunctions($pdo) {
+    $dictionaries = [];
+    $pdo->sqliteCreateFunction('content_text', function ($codec, $content) use ($pdo, &$dictionaries) {
+        if (!$codec || $content === null) {
+            return $content;
+        }
+        if (!isset($dictionaries[$codec])) {
+            $stmt = $pdo->prepare("SELECT dictionary FROM compression_dictionaries WHERE id = ?");
+            $stmt->execute([$codec]);
+            $dictionaries[$codec] = $stmt->fetchColumn();
+        }
+        $inflate = inflate_init(ZLIB_ENCODING_RAW, ['dictionary' => $dictionaries[$codec]]);
+        return inflate_add($inflate, $content, ZLIB_FINISH);
+    }, 2);
+}
+
+// Opaque page cursors over (timestamp, id), same format as MessageDatabase._encode_cursor
+function encodeCursor($timestamp, $id) {
+    return rtrim(strtr(base64_encode(json_encode([(int)$timestamp, (int)$id])), '+/', '-_'), '=');
+}
+
+function decodeCursor($cursor) {
+    if (!$cursor) {
+        return null;
+    }
+    $cursor = strtr($cursor, '-_', '+/');
+    $raw = base64_decode(str_pad($cursor, strlen($cursor) + (4 - strlen($cursor) % 4) % 4, '='), true);
+    $value = $raw === false ? null : json_decode($raw, true);
+    if (!is_array($value) || count($value) != 2) {
+        return null;
+    }
+    return [(int)$value[0], (int)$value[1]];
+}
 ?>
@@ -21,20 +21,19 @@ try {
 function getStats($pdo) {
     $stats = [];
     
-    // Total messages
-    $stmt = $pdo->query("SELECT COUNT(*) as count FROM messages");
-    $stats['total_messages'] = $stmt->fetch()['count'];
+    // Totals and unique users from the counters the bot maintains
+    $stmt = $pdo->query("SELECT message_count, response_count, user_count FROM message_counters WHERE scope = 'global' AND scope_id = ''");
+    $counters = $stmt->fetch() ?: ['message_count' => 0, 'response_count' => 0, 'user_count' => 0];
+    $stats['total_messages'] = $counters['message_count'];
+    $stats['total_responses'] = $counters['response_count'];
+    $stats['unique_users'] = $counters['user_count'];
     
-    // Total responses
-    $stmt = $pdo->query("SELECT COUNT(*) as count FROM responses");
-    $stats['total_responses'] = $stmt->fetch()['count'];
-    
-    // Unique users
-    $stmt = $pdo->query("SELECT COUNT(DISTINCT user_id) as count FROM messages");
-    $stats['unique_users'] = $stmt->fetch()['count'];
-    
-    // Recent activity (last 24 hours)
-    $stmt = $pdo->query("SELECT COUNT(*) as count FROM messages WHERE datetime(timestamp) > datetime('now', '-1 day')");
+    // Recent activity (last 24 hours, to the hour)
+    $stmt = $pdo->query("
+        SELECT COALESCE(SUM(message_count), 0) as count FROM message_rollups
+        WHERE period = 'hour' AND scope = 'global' AND scope_id = ''
+          AND bucket >= strftime('%Y-%m-%d %H:00', 'now', '-1 day')
+    ");
     $stats['recent_messages'] = $stmt->fetch()['count'];
     
     return $stats;
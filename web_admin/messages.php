@@ -6,6 +6,7 @@ requireLogin();
 try {
     $pdo = new PDO('sqlite:' . DB_PATH);
     $pdo->setAttribute(PDO::ATTR_ERRMODE, PDO::ERRMODE_EXCEPTION);
+    registerContentFunctions($pdo);
 } catch (PDOException $e) {
     die('Database connection failed: ' . $e->getMessage());
 }
@@ -15,7 +16,7 @@ if (isset($_POST['delete_message'])) {
     $message_id = $_POST['message_id'];
     try {
         // Delete responses first (foreign key constraint)
-        $stmt = $pdo->prepare("DELETE FROM responses WHERE original_message_id = ?");
+        $stmt = $pdo->prepare("DELETE FROM responses WHERE message_rowid = (SELECT id FROM messages WHERE message_id = ?)");
         $stmt->execute([$message_id]);
         
         // Delete the message
@@ -29,9 +30,9 @@ if (isset($_POST['delete_message'])) {
 }
 
 // Pagination and filtering
-$page = max(1, intval($_GET['page'] ?? 1));
 $per_page = 20;
-$offset = ($page - 1) * $per_page;
+$before = decodeCursor($_GET['before'] ?? '');
+$after = $before ? null : decodeCursor($_GET['after'] ?? '');
 
 $search = $_GET['search'] ?? '';
 $user_filter = $_GET['user'] ?? '';
@@ -40,10 +41,10 @@ $user_filter = $_GET['user'] ?? '';
 $where_conditions = [];
 $params = [];
 
-if ($search) {
-    $where_conditions[] = "(message_content LIKE ? OR username LIKE ?)";
-    $params[] = "%$search%";
-    $params[] = "%$search%";
+$fts_query = ftsQuery($search);
+if ($fts_query) {
+    $where_conditions[] = "id IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)";
+    $params[] = $fts_query;
 }
 
 if ($user_filter) {
@@ -53,25 +54,46 @@ if ($user_filter) {
 
 $where_clause = $where_conditions ? "WHERE " . implode(" AND ", $where_conditions) : "";
 
-// Get total count
-$count_query = "SELECT COUNT(*) as total FROM messages $where_clause";
-$stmt = $pdo->prepare($count_query);
-$stmt->execute($params);
-$total_messages = $stmt->fetch()['total'];
-$total_pages = ceil($total_messages / $per_page);
+// Get total count; unsearched listings read the maintained counters instead of COUNT(*)
+if ($fts_query) {
+    $stmt = $pdo->prepare("SELECT COUNT(*) as total FROM messages $where_clause");
+    $stmt->execute($params);
+} else {
+    $stmt = $pdo->prepare("SELECT message_count as total FROM message_counters WHERE scope = ? AND scope_id = ?");
+    $stmt->execute($user_filter ? ['user', $user_filter] : ['global', '']);
+}
+$total_messages = (int)($stmt->fetch()['total'] ?? 0);
+
+// Get messages, one page past the cursor by (timestamp, id) so deep pages cost the same as the first
+$page_conditions = $where_conditions;
+$page_params = $params;
+if ($before || $after) {
+    $page_conditions[] = $before ? "(m.timestamp, m.id) < (?, ?)" : "(m.timestamp, m.id) > (?, ?)";
+    $page_params = array_merge($page_params, $before ?: $after);
+}
+$page_where = $page_conditions ? "WHERE " . implode(" AND ", $page_conditions) : "";
+$direction = $after ? "ASC" : "DESC";
 
-// Get messages
-$query = "SELECT m.*, 
-                 (SELECT COUNT(*) FROM responses r WHERE r.original_message_id = m.message_id) as response_count
+$query = "SELECT m.*, content_text(m.content_codec, m.message_content) as message_content,
+                 (SELECT COUNT(*) FROM responses r WHERE r.message_rowid = m.id) as response_count
           FROM messages m 
-          $where_clause 
-          ORDER BY m.timestamp DESC 
-          LIMIT $per_page OFFSET $offset";
+          $page_where 
+          ORDER BY m.timestamp $direction, m.id $direction 
+          LIMIT " . ($per_page + 1);
 
 $stmt = $pdo->prepare($query);
-$stmt->execute($params);
+$stmt->execute($page_params);
 $messages = $stmt->fetchAll(PDO::FETCH_ASSOC);
 
+$has_more = count($messages) > $per_page;
+$messages = array_slice($messages, 0, $per_page);
+if ($after) {
+    $messages = array_reverse($messages);
+}
+$has_newer = $after ? $has_more : (bool)$before;
+$has_older = $after ? true : $has_more;
+$filter_query = "search=" . urlencode($search) . "&user=" . urlencode($user_filter);
+
 // Get unique users for filter
 $users_stmt = $pdo->query("SELECT DISTINCT user_id, username FROM messages ORDER BY username");
 $users = $users_stmt->fetchAll(PDO::FETCH_ASSOC);
@@ -344,8 +366,11 @@ $users = $users_stmt->fetchAll(PDO::FETCH_ASSOC);
         </div>
         
         <div class="stats">
-            Showing <?php echo number_format($total_messages); ?> messages 
-            (Page <?php echo $page; ?> of <?php echo $total_pages; ?>)
+            <?php echo number_format($total_messages); ?> messages
+            <?php if ($messages): ?>
+                (showing <?php echo formatTimestamp('Y-m-d H:i', end($messages)['timestamp']); ?>
+                to <?php echo formatTimestamp('Y-m-d H:i', reset($messages)['timestamp']); ?>)
+            <?php endif; ?>
         </div>
         
         <div class="messages-table">
@@ -381,7 +406,7 @@ $users = $users_stmt->fetchAll(PDO::FETCH_ASSOC);
                                 </div>
                             </td>
                             <td class="timestamp">
-                                <?php echo date('Y-m-d H:i:s', strtotime($message['timestamp'])); ?>
+                                <?php echo formatTimestamp('Y-m-d H:i:s', $message['timestamp']); ?>
                             </td>
                             <td>
                                 <?php echo $message['response_count']; ?> responses
@@ -399,22 +424,19 @@ $users = $users_stmt->fetchAll(PDO::FETCH_ASSOC);
             </table>
         </div>
         
-        <?php if ($total_pages > 1): ?>
+        <?php if ($has_newer || $has_older): ?>
             <div class="pagination">
-                <?php if ($page > 1): ?>
-                    <a href="?page=<?php echo $page - 1; ?>&search=<?php echo urlencode($search); ?>&user=<?php echo urlencode($user_filter); ?>">« Previous</a>
+                <?php if ($has_newer): ?>
+                    <a href="?<?php echo $filter_query; ?>">« Newest</a>
                 <?php endif; ?>
                 
-                <?php for ($i = max(1, $page - 2); $i <= min($total_pages, $page + 2); $i++): ?>
-                    <?php if ($i == $page): ?>
-                        <span class="current"><?php echo $i; ?></span>
-                    <?php else: ?>
-                        <a href="?page=<?php echo $i; ?>&search=<?php echo urlencode($search); ?>&user=<?php echo urlencode($user_filter); ?>"><?php echo $i; ?></a>
-                    <?php endif; ?>
-                <?php endfor; ?>
+                <?php if ($has_newer && $messages): ?>
+                    <a href="?after=<?php echo encodeCursor($messages[0]['timestamp'], $messages[0]['id']); ?>&<?php echo $filter_query; ?>">‹ Newer</a>
+                <?php endif; ?>
                 
-                <?php if ($page < $total_pages): ?>
-                    <a href="?page=<?php echo $page + 1; ?>&search=<?php echo urlencode($search); ?>&user=<?php echo urlencode($user_filter); ?>">Next »</a>
+                <?php if ($has_older && $messages): ?>
+                    <?php $last = end($messages); ?>
+                    <a href="?before=<?php echo encodeCursor($last['timestamp'], $last['id']); ?>&<?php echo $filter_query; ?>">Older ›</a>
                 <?php endif; ?>
             </div>
         <?php endif; ?>
@@ -6,6 +6,7 @@ requireLogin();
 try {
     $pdo = new PDO('sqlite:' . DB_PATH);
     $pdo->setAttribute(PDO::ATTR_ERRMODE, PDO::ERRMODE_EXCEPTION);
+    registerContentFunctions($pdo);
 } catch (PDOException $e) {
     die('Database connection failed: ' . $e->getMessage());
 }
@@ -23,9 +24,9 @@ if (isset($_POST['delete_response'])) {
 }
 
 // Pagination and filtering
-$page = max(1, intval($_GET['page'] ?? 1));
 $per_page = 20;
-$offset = ($page - 1) * $per_page;
+$before = decodeCursor($_GET['before'] ?? '');
+$after = $before ? null : decodeCursor($_GET['after'] ?? '');
 
 $search = $_GET['search'] ?? '';
 $model_filter = $_GET['model'] ?? '';
@@ -34,10 +35,12 @@ $model_filter = $_GET['model'] ?? '';
 $where_conditions = [];
 $params = [];
 
-if ($search) {
-    $where_conditions[] = "(r.response_content LIKE ? OR m.username LIKE ?)";
-    $params[] = "%$search%";
-    $params[] = "%$search%";
+$fts_query = ftsQuery($search);
+if ($fts_query) {
+    $where_conditions[] = "(r.id IN (SELECT rowid FROM responses_fts WHERE responses_fts MATCH ?)
+                            OR m.id IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?))";
+    $params[] = $fts_query;
+    $params[] = "username : ($fts_query)";
 }
 
 if ($model_filter) {
@@ -47,27 +50,52 @@ if ($model_filter) {
 
 $where_clause = $where_conditions ? "WHERE " . implode(" AND ", $where_conditions) : "";
 
-// Get total count
-$count_query = "SELECT COUNT(*) as total FROM responses r 
-                LEFT JOIN messages m ON r.original_message_id = m.message_id 
-                $where_clause";
-$stmt = $pdo->prepare($count_query);
-$stmt->execute($params);
-$total_responses = $stmt->fetch()['total'];
-$total_pages = ceil($total_responses / $per_page);
+// Get total count; the unfiltered listing reads the maintained counters, and a
+// model filter has no index to count from so it is shown without a total
+$total_responses = null;
+if ($fts_query) {
+    $count_query = "SELECT COUNT(*) as total FROM responses r 
+                    LEFT JOIN messages m ON m.id = r.message_rowid 
+                    $where_clause";
+    $stmt = $pdo->prepare($count_query);
+    $stmt->execute($params);
+    $total_responses = (int)$stmt->fetch()['total'];
+} elseif (!$model_filter) {
+    $stmt = $pdo->query("SELECT response_count as total FROM message_counters WHERE scope = 'global' AND scope_id = ''");
+    $total_responses = (int)($stmt->fetch()['total'] ?? 0);
+}
+
+// Get responses, one page past the cursor by (timestamp, id) so deep pages cost the same as the first
+$page_conditions = $where_conditions;
+$page_params = $params;
+if ($before || $after) {
+    $page_conditions[] = $before ? "(r.timestamp, r.id) < (?, ?)" : "(r.timestamp, r.id) > (?, ?)";
+    $page_params = array_merge($page_params, $before ?: $after);
+}
+$page_where = $page_conditions ? "WHERE " . implode(" AND ", $page_conditions) : "";
+$direction = $after ? "ASC" : "DESC";
 
-// Get responses
-$query = "SELECT r.*, m.username, m.user_display_name, m.message_content as original_message
+$query = "SELECT r.*, content_text(r.content_codec, r.response_content) as response_content,
+                 m.username, m.user_display_name, content_text(m.content_codec, m.message_content) as original_message
           FROM responses r 
-          LEFT JOIN messages m ON r.original_message_id = m.message_id 
-          $where_clause 
-          ORDER BY r.timestamp DESC 
-          LIMIT $per_page OFFSET $offset";
+          LEFT JOIN messages m ON m.id = r.message_rowid 
+          $page_where 
+          ORDER BY r.timestamp $direction, r.id $direction 
+          LIMIT " . ($per_page + 1);
 
 $stmt = $pdo->prepare($query);
-$stmt->execute($params);
+$stmt->execute($page_params);
 $responses = $stmt->fetchAll(PDO::FETCH_ASSOC);
 
+$has_more = count($responses) > $per_page;
+$responses = array_slice($responses, 0, $per_page);
+if ($after) {
+    $responses = array_reverse($responses);
+}
+$has_newer = $after ? $has_more : (bool)$before;
+$has_older = $after ? true : $has_more;
+$filter_query = "search=" . urlencode($search) . "&model=" . urlencode($model_filter);
+
 // Get unique models for filter
 $models_stmt = $pdo->query("SELECT DISTINCT model_used FROM responses WHERE model_used IS NOT NULL ORDER BY model_used");
 $models = $models_stmt->fetchAll(PDO::FETCH_COLUMN);
@@ -358,8 +386,11 @@ $models = $models_stmt->fetchAll(PDO::FETCH_COLUMN);
         </div>
 
         <div class="stats">
-            Showing <?php echo number_format($total_responses); ?> responses
-            (Page <?php echo $page; ?> of <?php echo $total_pages; ?>)
+            <?php echo $total_responses === null ? 'Matching' : number_format($total_responses); ?> responses
+            <?php if ($responses): ?>
+                (showing <?php echo formatTimestamp('Y-m-d H:i', end($responses)['timestamp']); ?>
+                to <?php echo formatTimestamp('Y-m-d H:i', reset($responses)['timestamp']); ?>)
+            <?php endif; ?>
         </div>
 
         <div class="responses-table">
@@ -408,7 +439,7 @@ $models = $models_stmt->fetchAll(PDO::FETCH_COLUMN);
                                 <?php endif; ?>
                             </td>
                             <td class="timestamp">
-                                <?php echo date('Y-m-d H:i:s', strtotime($response['timestamp'])); ?>
+                                <?php echo formatTimestamp('Y-m-d H:i:s', $response['timestamp']); ?>
                             </td>
                             <td>
                                 <form method="POST" style="display: inline;"
@@ -423,22 +454,19 @@ $models = $models_stmt->fetchAll(PDO::FETCH_COLUMN);
             </table>
         </div>
 
-        <?php if ($total_pages > 1): ?>
+        <?php if ($has_newer || $has_older): ?>
             <div class="pagination">
-                <?php if ($page > 1): ?>
-                    <a href="?page=<?php echo $page - 1; ?>&search=<?php echo urlencode($search); ?>&model=<?php echo urlencode($model_filter); ?>">« Previous</a>
+                <?php if ($has_newer): ?>
+                    <a href="?<?php echo $filter_query; ?>">« Newest</a>
                 <?php endif; ?>
 
-                <?php for ($i = max(1, $page - 2); $i <= min($total_pages, $page + 2); $i++): ?>
-                    <?php if ($i == $page): ?>
-                        <span class="current"><?php echo $i; ?></span>
-                    <?php else: ?>
-                        <a href="?page=<?php echo $i; ?>&search=<?php echo urlencode($search); ?>&model=<?php echo urlencode($model_filter); ?>"><?php echo $i; ?></a>
-                    <?php endif; ?>
-                <?php endfor; ?>
+                <?php if ($has_newer && $responses): ?>
+                    <a href="?after=<?php echo encodeCursor($responses[0]['timestamp'], $responses[0]['id']); ?>&<?php echo $filter_query; ?>">‹ Newer</a>
+                <?php endif; ?>
 
-                <?php if ($page < $total_pages): ?>
-                    <a href="?page=<?php echo $page + 1; ?>&search=<?php echo urlencode($search); ?>&model=<?php echo urlencode($model_filter); ?>">Next »</a>
+                <?php if ($has_older && $responses): ?>
+                    <?php $last = end($responses); ?>
+                    <a href="?before=<?php echo encodeCursor($last['timestamp'], $last['id']); ?>&<?php echo $filter_query; ?>">Older ›</a>
                 <?php endif; ?>
             </div>
         <?php endif; ?>
@@ -6,28 +6,28 @@ requireLogin();
 try {
     $pdo = new PDO('sqlite:' . DB_PATH);
     $pdo->setAttribute(PDO::ATTR_ERRMODE, PDO::ERRMODE_EXCEPTION);
+    registerContentFunctions($pdo);
 } catch (PDOException $e) {
     die('Database connection failed: ' . $e->getMessage());
 }
 
-// Get user statistics with settings
+// Get user statistics with settings from the per-user all-time rollups
 $query = "SELECT
-            m.user_id,
-            m.username,
-            m.user_display_name,
-            COUNT(DISTINCT m.id) as message_count,
-            COUNT(DISTINCT r.id) as response_count,
-            MIN(m.timestamp) as first_message,
-            MAX(m.timestamp) as last_message,
-            AVG(r.processing_time_ms) as avg_processing_time,
+            ru.scope_id as user_id,
+            COALESCE(ru.label, ru.scope_id) as username,
+            us.user_display_name,
+            ru.message_count,
+            ru.response_count,
+            ru.first_at as first_message,
+            ru.last_at as last_message,
+            ru.processing_ms_sum * 1.0 / NULLIF(ru.processing_ms_count, 0) as avg_processing_time,
             us.nsfw_mode,
             us.content_filter_level,
             us.updated_at as settings_updated
-          FROM messages m
-          LEFT JOIN responses r ON m.message_id = r.original_message_id
-          LEFT JOIN user_settings us ON m.user_id = us.user_id
-          GROUP BY m.user_id, m.username, m.user_display_name, us.nsfw_mode, us.content_filter_level, us.updated_at
-          ORDER BY message_count DESC";
+          FROM message_rollups ru
+          LEFT JOIN user_settings us ON ru.scope_id = us.user_id
+          WHERE ru.period = 'total' AND ru.scope = 'user'
+          ORDER BY ru.message_count DESC";
 
 $stmt = $pdo->query($query);
 $users = $stmt->fetchAll(PDO::FETCH_ASSOC);
@@ -39,13 +39,17 @@ if (isset($_POST['delete_user_data'])) {
         $pdo->beginTransaction();
         
         // Delete responses first
-        $stmt = $pdo->prepare("DELETE FROM responses WHERE original_message_id IN (SELECT message_id FROM messages WHERE user_id = ?)");
+        $stmt = $pdo->prepare("DELETE FROM responses WHERE message_rowid IN (SELECT id FROM messages WHERE user_id = ?)");
         $stmt->execute([$user_id]);
         
         // Delete messages
         $stmt = $pdo->prepare("DELETE FROM messages WHERE user_id = ?");
         $stmt->execute([$user_id]);
         
+        // Delete the user's analytics rollups
+        $stmt = $pdo->prepare("DELETE FROM message_rollups WHERE period IN ('hour', 'day', 'total') AND scope = 'user' AND scope_id = ?");
+        $stmt->execute([$user_id]);
+        
         $pdo->commit();
         $success = "User data deleted successfully";
         